@@ -1,17 +1,253 @@
 import random # Added for AI
+import time
 DEFAULT_BOARD_SIZE = 15
 
+class SearchStats:
+    """
+    Counters describing a single AI search. Only collected when an AI move is asked
+    for them (collect_stats=True); otherwise the search skips all of this bookkeeping.
+    """
+    def __init__(self):
+        self.nodes = 0 # Positions visited
+        self.leaves = 0 # Positions scored statically (depth limit, win/loss or full board)
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0 # Cutoffs caused by the first move tried
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.nodes_by_ply = {} # Ply from the root (0) -> positions visited at that ply
+        self.eval_time = 0.0 # Seconds spent in terminal checks and static evaluation
+        self.movegen_time = 0.0 # Seconds spent listing candidate moves
+        self.elapsed = 0.0 # Seconds for the whole search
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Share of cutoffs produced by the first move; close to 1.0 means good move ordering."""
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def effective_branching_factors(self):
+        """Nodes at each ply divided by nodes at the ply above, starting with ply 1."""
+        plies = sorted(self.nodes_by_ply)
+        return [self.nodes_by_ply[p] / self.nodes_by_ply[p - 1] for p in plies[1:]
+                if self.nodes_by_ply.get(p - 1)]
+
+    def as_dict(self):
+        return {
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "betaCutoffs": self.beta_cutoffs,
+            "firstMoveCutoffRate": self.first_move_cutoff_rate,
+            "ttProbes": self.tt_probes,
+            "ttHits": self.tt_hits,
+            "nodesByPly": [self.nodes_by_ply[p] for p in sorted(self.nodes_by_ply)],
+            "effectiveBranchingFactors": self.effective_branching_factors,
+            "evalTime": self.eval_time,
+            "movegenTime": self.movegen_time,
+            "elapsed": self.elapsed,
+        }
+
+WIN_SCORE = 100000 # Score of a won position, as returned by _get_terminal_score
+MATE_THRESHOLD = WIN_SCORE - 1000 # Scores beyond this are wins/losses at a distance
+
+_zobrist_tables = {}
+
+def zobrist_table(board_size):
+    """
+    Random 64-bit keys for hashing positions of one board size: keys[cell]['X'/'O'] per
+    cell index (row * board_size + col), plus keys for the side to move and for the player
+    whose point of view scores are given in. Seeded, so hashes are the same in every process.
+    """
+    table = _zobrist_tables.get(board_size)
+    if table is None:
+        rng = random.Random(f"gomoku-zobrist-{board_size}")
+        cells = [{'X': rng.getrandbits(64), 'O': rng.getrandbits(64)} for _ in range(board_size * board_size)]
+        to_move = {'X': rng.getrandbits(64), 'O': rng.getrandbits(64)}
+        perspective = {'X': rng.getrandbits(64), 'O': rng.getrandbits(64)}
+        table = _zobrist_tables[board_size] = (cells, to_move, perspective)
+    return table
+
+def board_hash(board):
+    """Zobrist hash of the stones on a board (side to move not included)."""
+    board_size = len(board)
+    cells = zobrist_table(board_size)[0]
+    h = 0
+    for r, row in enumerate(board):
+        for c, cell in enumerate(row):
+            if cell != ' ':
+                h ^= cells[r * board_size + c][cell]
+    return h
+
+def dihedral_transforms(board_size):
+    """
+    The 8 symmetries of a board_size board (rotations and reflections) as functions
+    (row, col) -> (row, col), the identity first.
+    """
+    n = board_size - 1
+    return (
+        lambda r, c: (r, c),
+        lambda r, c: (c, n - r), # Rotations by 90, 180 and 270 degrees
+        lambda r, c: (n - r, n - c),
+        lambda r, c: (n - c, r),
+        lambda r, c: (r, n - c), # Reflections: left-right, top-bottom and across both diagonals
+        lambda r, c: (n - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (n - c, n - r),
+    )
+
+def board_symmetries(board):
+    """The dihedral_transforms that map every stone of board onto a stone of the same player."""
+    stones = [(r, c, cell) for r, row in enumerate(board) for c, cell in enumerate(row) if cell != ' ']
+    symmetries = []
+    for transform in dihedral_transforms(len(board)):
+        if all(board[tr][tc] == cell for r, c, cell in stones for tr, tc in (transform(r, c),)):
+            symmetries.append(transform)
+    return symmetries
+
+_windows = {}
+
+def winning_windows(board_size, win_length=5):
+    """
+    Every run of win_length cells on a board_size board (rows, columns and both diagonals),
+    as tuples of (row, col). Cached per size; empty when the board is too small for a five.
+    """
+    windows = _windows.get((board_size, win_length))
+    if windows is None:
+        windows = []
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            for r in range(board_size):
+                for c in range(board_size):
+                    end_r, end_c = r + dr * (win_length - 1), c + dc * (win_length - 1)
+                    if 0 <= end_r < board_size and 0 <= end_c < board_size:
+                        windows.append(tuple((r + dr * i, c + dc * i) for i in range(win_length)))
+        windows = _windows[(board_size, win_length)] = tuple(windows)
+    return windows
+
+def is_live_window(board, window):
+    """True if a window can still become a five: it has an empty cell and stones of at most one player."""
+    cells = {board[r][c] for r, c in window}
+    return ' ' in cells and not ('X' in cells and 'O' in cells)
+
+class TranspositionTable:
+    """
+    Search results by position hash, kept between searches so that analysing the same
+    or a following position again reuses earlier work. Entries are
+    (depth, score, flag, best_move); the oldest entry is dropped once max_entries is reached.
+    """
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    MAX_ROOT_RESULTS = 1024
+
+    def __init__(self, max_entries=1000000):
+        self.max_entries = max_entries
+        self.probes = 0
+        self.hits = 0
+        self._entries = {}
+        self.root_results = {} # Root key -> (depth, k, [(move, score)]) of completed analyses
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        self.probes += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def put(self, key, depth, score, flag, move):
+        entries = self._entries
+        if key not in entries and len(entries) >= self.max_entries:
+            del entries[next(iter(entries))]
+        entries[key] = (depth, score, flag, move)
+
+    def peek(self, key):
+        """Like get, without counting as a probe."""
+        return self._entries.get(key)
+
+    def put_root_result(self, key, depth, k, lines):
+        if key not in self.root_results and len(self.root_results) >= self.MAX_ROOT_RESULTS:
+            del self.root_results[next(iter(self.root_results))]
+        self.root_results[key] = (depth, k, lines)
+
+    def clear(self):
+        self._entries.clear()
+        self.root_results.clear()
+
+class SearchBudgetExceeded(Exception):
+    """Raised inside a budgeted search when it runs out of nodes or time."""
+
+class Analysis:
+    """Result of GomokuGame.analyze: the best moves found, best first."""
+    def __init__(self, lines, depth, nodes, elapsed, complete, tt_probes, tt_hits):
+        self.lines = lines # [(move, score, principal variation as a list of moves starting with move)]
+        self.depth = depth # Deepest fully searched depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.complete = complete # False if the budget ran out before the requested depth
+        self.tt_probes = tt_probes
+        self.tt_hits = tt_hits
+
+    @property
+    def best_move(self):
+        return self.lines[0][0] if self.lines else None
+
+    def as_dict(self):
+        return {
+            "moves": [{"row": move[0], "col": move[1], "score": score, "pv": [list(m) for m in pv]}
+                      for move, score, pv in self.lines],
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "elapsed": self.elapsed,
+            "complete": self.complete,
+            "ttProbes": self.tt_probes,
+            "ttHits": self.tt_hits,
+        }
+
 class GomokuGame:
+    # gomoku_solvedb.SolvedPositions consulted first by the Normal and Hard AIs, and filled with
+    # the wins the threat solver proves for them while they play. Set by the app; None disables it.
+    solved_positions = None
+
     def __init__(self, board_size=None, game_mode=None, ai_difficulty=None):
         """Initializes the Gomoku game."""
         self.board_size_internal = board_size if board_size is not None else DEFAULT_BOARD_SIZE
+        self.version = 0 # Bumped on every state change; exposed to clients as an ETag
+        # Random tag of this game, kept by the store across saves. Part of the ETag too, so a
+        # game recreated under the same id (after an eviction or delete) cannot match old tags
+        self.nonce = '%08x' % random.getrandbits(32)
         self.board = self._create_board()
+        self.moves = [] # (row, col) of every move made through make_move, in order
+        self.undone_moves = [] # (row, col, player) taken back by undo_move, the latest last; redo_move replays them
         self.current_player = 'X'
         self.game_over = False
         self.game_mode = game_mode
         self.ai_difficulty = ai_difficulty
         self.WIN_LENGTH = 5 # Length needed to win
         self.SEARCH_DEPTH = 4 # Default search depth for Hard AI
+        self.ASPIRATION_WINDOW = 100 # Half-width of the Hard AI's window around the previous iteration's score
+        self.SOLVER_NODES = 2000 # Threat-solver nodes the Hard AI spends per move before searching (0 disables it)
+        self.nodes_searched = 0 # Positions examined by the last AI move; a plain int so counting stays cheap
+        self.last_move_choices = None # Moves the last AI move was picked from at random, all equally good
+        # Called every 64 nodes by the Hard search and analyze(); if it returns True, the
+        # search is abandoned by raising SearchBudgetExceeded (analyze() returns what it has)
+        self.should_stop = None
+        self._search_stats = None # SearchStats of the search in progress, if it collects them
+        self._search_tracer = None # gomoku_trace.SearchTracer of the Hard search in progress, if traced
+        self._root_depth = None # Depth of the Hard AI's current iterative-deepening iteration
+        self._search_windows = None # Windows live at the root of the Hard search in progress
+        self._search_cells = None # Empty cells in those windows: the only moves the search considers
+        self.transposition_table = None # Created by the first analyze() call that is not given one
+        self._analysis = None # State of the analyze() search in progress
+        self.threat_solver = None # gomoku_solver.ThreatSolver, created by the first solve() or Hard AI move
+
+    @property
+    def game_over(self):
+        return self._game_over
+
+    @game_over.setter
+    def game_over(self, value):
+        self._game_over = value
+        self.version += 1
 
     def _create_board(self):
         """Creates an empty game board based on internal board size."""
@@ -26,9 +262,46 @@ class GomokuGame:
            0 <= col < self.board_size_internal and \
            self.board[row][col] == ' ':
             self.board[row][col] = self.current_player
+            self.moves.append((row, col))
+            self.version += 1
+            self.undone_moves.clear() # A new move replaces the ones taken back
             return True
         return False
 
+    def undo_move(self):
+        """
+        Takes back the last move: its cell is emptied, the player who made it is to move
+        again and the game is no longer over. Returns the move, or None if there is none.
+        Nothing else needs rebuilding: searches derive their state from the board, and the
+        tables they keep are keyed by position, so what they learnt stays valid.
+        """
+        if not self.moves:
+            return None
+        row, col = self.moves.pop()
+        player = self.board[row][col]
+        self.board[row][col] = ' '
+        self.undone_moves.append((row, col, player))
+        self.current_player = player
+        if self.game_over:
+            self.game_over = False
+        self.version += 1
+        return row, col
+
+    def redo_move(self):
+        """
+        Replays the move undo_move took back last, for the player who made it, and returns
+        it; None if there is none (or a new move was made since). Like make_move, it leaves
+        checking for a win and switching player to the caller.
+        """
+        if not self.undone_moves:
+            return None
+        row, col, player = self.undone_moves.pop()
+        self.board[row][col] = player
+        self.moves.append((row, col))
+        self.current_player = player
+        self.version += 1
+        return row, col
+
     def check_win(self):
         """Checks if the current player has won (five in a row)."""
         player = self.current_player
@@ -58,12 +331,36 @@ class GomokuGame:
         return False
 
     def check_draw(self):
-        """Checks if the game is a draw (board is full)."""
-        for r in range(self.board_size_internal):
-            for c in range(self.board_size_internal):
-                if self.board[r][c] == ' ':
-                    return False  # Found an empty cell, not a draw
-        return True  # No empty cells found, it's a draw
+        """
+        Checks if the game is a draw: no window of WIN_LENGTH cells can still become a five
+        for either player, so the rest of the game cannot change the result. On a board too
+        small for a five, only once the board is full.
+        """
+        return not self._can_still_be_won(self.board)
+
+    def _can_still_be_won(self, board_state, windows=None):
+        """False once no window (of windows, by default all of the board's) is live."""
+        if windows is None:
+            windows = winning_windows(self.board_size_internal, self.WIN_LENGTH)
+        if not windows:
+            return any(' ' in row for row in board_state)
+        return any(is_live_window(board_state, window) for window in windows)
+
+    def live_cells(self, board_state=None):
+        """
+        Empty cells that lie in a live window, in board order. Every other empty cell is dead:
+        a stone there changes nothing for either player, so the AIs do not consider it. On a
+        board too small for a five, every empty cell.
+        """
+        board_state = self.board if board_state is None else board_state
+        windows = winning_windows(self.board_size_internal, self.WIN_LENGTH)
+        if not windows:
+            return [(r, c) for r, row in enumerate(board_state) for c, cell in enumerate(row) if cell == ' ']
+        live = set()
+        for window in windows:
+            if is_live_window(board_state, window):
+                live.update(cell for cell in window if board_state[cell[0]][cell[1]] == ' ')
+        return sorted(live)
 
     def switch_player(self):
         """Switches the current player."""
@@ -71,58 +368,83 @@ class GomokuGame:
             self.current_player = 'O'
         else:
             self.current_player = 'X'
+        self.version += 1
 
     def reset_game(self, game_mode=None, ai_difficulty=None):
         """Resets the game to its initial state."""
         self.board = self._create_board()
+        self.moves = []
+        self.undone_moves = []
         self.current_player = 'X'
         self.game_over = False
         self.game_mode = game_mode
         self.ai_difficulty = ai_difficulty
 
-    def make_ai_move_easy(self):
-        """Makes a move for the AI, preferring cells adjacent to existing stones."""
+    def make_ai_move_easy(self, collect_stats=False):
+        """
+        Makes a move for the AI, preferring cells adjacent to existing stones.
+        With collect_stats=True, returns (move_made, SearchStats) instead of move_made.
+        """
+        started = time.perf_counter()
+        stats = self._begin_search(collect_stats)
+        return self._end_search(stats, started, self._make_ai_move_easy())
+
+    def _make_ai_move_easy(self, cells=None):
+        """cells limits the move to those empty cells (by default, any empty cell)."""
         if self.game_over:
             return False
 
         priority_empty_cells = []
         all_empty_cells = []
 
-        for r in range(self.board_size_internal):
-            for c in range(self.board_size_internal):
-                if self.board[r][c] == ' ':
-                    all_empty_cells.append((r, c))
-                    is_priority = False
-                    # Check neighbors
-                    for dr in range(-1, 2):
-                        for dc in range(-1, 2):
-                            if dr == 0 and dc == 0:
-                                continue # Skip the cell itself
-                            
-                            nr, nc = r + dr, c + dc
-                            
-                            # Check bounds
-                            if 0 <= nr < self.board_size_internal and \
-                               0 <= nc < self.board_size_internal:
-                                if self.board[nr][nc] != ' ': # Neighbor has a stone
-                                    priority_empty_cells.append((r, c))
-                                    is_priority = True
-                                    break # Found a stone, (r,c) is priority
-                        if is_priority:
-                            break # Move to next empty cell
+        if cells is None:
+            cells = [(r, c) for r in range(self.board_size_internal) for c in range(self.board_size_internal)]
+        for r, c in cells:
+            if self.board[r][c] == ' ':
+                all_empty_cells.append((r, c))
+                is_priority = False
+                # Check neighbors
+                for dr in range(-1, 2):
+                    for dc in range(-1, 2):
+                        if dr == 0 and dc == 0:
+                            continue # Skip the cell itself
+                        
+                        nr, nc = r + dr, c + dc
+                        
+                        # Check bounds
+                        if 0 <= nr < self.board_size_internal and \
+                           0 <= nc < self.board_size_internal:
+                            if self.board[nr][nc] != ' ': # Neighbor has a stone
+                                priority_empty_cells.append((r, c))
+                                is_priority = True
+                                break # Found a stone, (r,c) is priority
+                    if is_priority:
+                        break # Move to next empty cell
         
-        chosen_move = None
         if priority_empty_cells:
-            chosen_move = random.choice(priority_empty_cells)
+            return self._play_choice(priority_empty_cells)
         elif all_empty_cells:
-            chosen_move = random.choice(all_empty_cells)
+            return self._play_choice(all_empty_cells)
         else:
             return False # No moves possible
 
-        if chosen_move:
-            row, col = chosen_move
-            return self.make_move(row, col)
-        return False # Should not be reached if all_empty_cells logic is correct
+    def _five_making_cells(self, cells, symbol):
+        """The cells among cells where a stone of symbol would complete a five."""
+        found = []
+        for r, c in cells:
+            self.nodes_searched += 1
+            self.board[r][c] = symbol # Temporarily place the stone
+            if any(self._evaluate_line_segment(line_coords, symbol)['player_stones'] == self.WIN_LENGTH
+                   for line_coords in self._get_lines_for_cell(r, c)):
+                found.append((r, c))
+            self.board[r][c] = ' ' # Revert
+        return found
+
+    def _play_choice(self, moves):
+        """Makes one of moves, equally good for the AI, at random; remembers them as last_move_choices."""
+        self.last_move_choices = list(moves)
+        row, col = random.choice(self.last_move_choices)
+        return self.make_move(row, col)
 
     def _get_opponent_symbol(self, player_symbol):
         """Returns the opponent's symbol."""
@@ -182,50 +504,43 @@ class GomokuGame:
         
         return counts
 
-    def make_ai_move_normal(self):
-        """Makes a move for the AI using a prioritized strategy."""
+    def make_ai_move_normal(self, collect_stats=False):
+        """
+        Makes a move for the AI using a prioritized strategy.
+        With collect_stats=True, returns (move_made, SearchStats) instead of move_made.
+        """
+        started = time.perf_counter()
+        stats = self._begin_search(collect_stats)
+        return self._end_search(stats, started, self._make_ai_move_normal())
+
+    def _make_ai_move_normal(self):
         if self.game_over:
             return False
 
         ai_symbol = self.current_player
         opponent_symbol = self._get_opponent_symbol(ai_symbol)
 
-        empty_cells = []
-        for r_idx in range(self.board_size_internal):
-            for c_idx in range(self.board_size_internal):
-                if self.board[r_idx][c_idx] == ' ':
-                    empty_cells.append((r_idx, c_idx))
-        
-        if not empty_cells:
-            return False # No moves possible
+        empty_cells = self.live_cells()
+        if not empty_cells: # Already drawn: any empty cell will do
+            return self._make_ai_move_easy()
 
-        # Priority 1: Check for AI Winning Move
-        shuffled_empty_cells_for_win_check = random.sample(empty_cells, len(empty_cells))
-        for r, c in shuffled_empty_cells_for_win_check:
-            self.board[r][c] = ai_symbol # Temporarily place AI stone
-            lines = self._get_lines_for_cell(r, c)
-            for line_coords in lines:
-                eval_info = self._evaluate_line_segment(line_coords, ai_symbol)
-                if eval_info['player_stones'] == self.WIN_LENGTH:
-                    self.board[r][c] = ' ' # Revert temporary placement
-                    return self.make_move(r, c) # Make the winning move
-            self.board[r][c] = ' ' # Revert if not a winning move
+        known = self._lookup_solved()
+        if known is not None and known[0] == "win":
+            return self._play_choice([known[1]])
+
+        # Priority 1: Check for AI Winning Move (every one, so the move cache keeps them all)
+        winning_moves = self._five_making_cells(empty_cells, ai_symbol)
+        if winning_moves:
+            return self._play_choice(winning_moves)
 
         # Priority 2: Block Opponent's Winning Move
-        shuffled_empty_cells_for_block_check = random.sample(empty_cells, len(empty_cells))
-        for r, c in shuffled_empty_cells_for_block_check:
-            self.board[r][c] = opponent_symbol # Temporarily place opponent's stone
-            lines = self._get_lines_for_cell(r, c)
-            for line_coords in lines:
-                # Evaluate from opponent's perspective
-                eval_info = self._evaluate_line_segment(line_coords, opponent_symbol)
-                if eval_info['player_stones'] == self.WIN_LENGTH:
-                    self.board[r][c] = ' ' # Revert temporary placement
-                    return self.make_move(r, c) # AI plays here to block
-            self.board[r][c] = ' ' # Revert
+        blocking_moves = self._five_making_cells(empty_cells, opponent_symbol)
+        if blocking_moves:
+            return self._play_choice(blocking_moves) # AI plays at one of them to block
 
         # Priority 3: Create an "Open Three" for AI
         ai_open_three_moves = []
+        self.nodes_searched += len(empty_cells)
         for r, c in empty_cells: # Iterate in natural order, then pick randomly
             self.board[r][c] = ai_symbol # Temporarily place AI stone
             lines = self._get_lines_for_cell(r, c)
@@ -237,11 +552,11 @@ class GomokuGame:
             self.board[r][c] = ' ' # Revert
         
         if ai_open_three_moves:
-            chosen_move = random.choice(ai_open_three_moves)
-            return self.make_move(chosen_move[0], chosen_move[1])
+            return self._play_choice(ai_open_three_moves)
 
         # Priority 4: Block Opponent's "Open Three"
         opponent_open_three_blocking_moves = []
+        self.nodes_searched += len(empty_cells)
         for r, c in empty_cells: # Iterate in natural order, then pick randomly
             self.board[r][c] = opponent_symbol # Temporarily place opponent's stone
             lines = self._get_lines_for_cell(r, c)
@@ -254,11 +569,10 @@ class GomokuGame:
             self.board[r][c] = ' ' # Revert
 
         if opponent_open_three_blocking_moves:
-            chosen_move = random.choice(opponent_open_three_blocking_moves)
-            return self.make_move(chosen_move[0], chosen_move[1])
+            return self._play_choice(opponent_open_three_blocking_moves)
             
-        # Priority 5: Fallback to "Easy" AI logic
-        return self.make_ai_move_easy()
+        # Priority 5: Fallback to "Easy" AI logic, among the live cells
+        return self._make_ai_move_easy(empty_cells)
 
     def _evaluate_line_segment_on_board(self, line_coords, player_symbol, board_state):
         """
@@ -441,25 +755,54 @@ class GomokuGame:
         return None # No win/loss found
 
     def _minimax(self, depth, is_maximizing_player, alpha, beta, board_state, ai_player_symbol):
+        self.nodes_searched += 1
+        if self.should_stop is not None and self.nodes_searched % 64 == 0 and self.should_stop():
+            raise SearchBudgetExceeded()
+        stats = self._search_stats
+        if stats is not None:
+            ply = self._root_depth - depth
+            stats.nodes_by_ply[ply] = stats.nodes_by_ply.get(ply, 0) + 1
+            started = time.perf_counter()
+
         terminal_score = self._get_terminal_score(board_state, ai_player_symbol)
         if terminal_score is not None:
+            if stats is not None:
+                stats.leaves += 1
+                stats.eval_time += time.perf_counter() - started
             # Adjust score by depth: prefer faster wins, slower losses
             return terminal_score + depth if terminal_score > 0 else terminal_score - depth
 
-        empty_cells_exist = any(' ' in row for row in board_state)
-        if not empty_cells_exist: # Draw
+        if not self._can_still_be_won(board_state, self._search_windows): # Draw
+            if stats is not None:
+                stats.leaves += 1
+                stats.eval_time += time.perf_counter() - started
             return 0 
         
         if depth == 0:
-            return self._evaluate_board_state(board_state, ai_player_symbol)
+            score = self._evaluate_board_state(board_state, ai_player_symbol)
+            if stats is not None:
+                stats.leaves += 1
+                stats.eval_time += time.perf_counter() - started
+            return score
+
+        if stats is not None:
+            stats.eval_time += time.perf_counter() - started
+            started = time.perf_counter()
 
         current_sim_player_symbol = ai_player_symbol if is_maximizing_player else self._get_opponent_symbol(ai_player_symbol)
+        tracer = self._search_tracer
         
-        empty_cells_coords = []
-        for r_idx in range(self.board_size_internal):
-            for c_idx in range(self.board_size_internal):
-                if board_state[r_idx][c_idx] == ' ':
-                    empty_cells_coords.append((r_idx, c_idx))
+        if self._search_cells is not None:
+            empty_cells_coords = [(r, c) for r, c in self._search_cells if board_state[r][c] == ' ']
+        else:
+            empty_cells_coords = []
+            for r_idx in range(self.board_size_internal):
+                for c_idx in range(self.board_size_internal):
+                    if board_state[r_idx][c_idx] == ' ':
+                        empty_cells_coords.append((r_idx, c_idx))
+
+        if stats is not None:
+            stats.movegen_time += time.perf_counter() - started
         
         # Consider shuffling empty_cells_coords for less predictable AI if desired,
         # but for testing, a fixed order might be better.
@@ -467,29 +810,91 @@ class GomokuGame:
 
         if is_maximizing_player:
             max_eval = -float('inf')
-            for r, c in empty_cells_coords:
+            for i, (r, c) in enumerate(empty_cells_coords):
                 temp_board = [row[:] for row in board_state] # Create a copy
                 temp_board[r][c] = current_sim_player_symbol
-                evaluation = self._minimax(depth - 1, False, alpha, beta, temp_board, ai_player_symbol)
+                traced = tracer is not None and tracer.open((r, c), current_sim_player_symbol, alpha, beta, self.nodes_searched)
+                if i == 0:
+                    evaluation = self._minimax(depth - 1, False, alpha, beta, temp_board, ai_player_symbol)
+                else: # Null window: only whether the move beats alpha; searched again if it does
+                    evaluation = self._minimax(depth - 1, False, alpha, alpha + 1, temp_board, ai_player_symbol)
+                    if alpha < evaluation < beta:
+                        evaluation = self._minimax(depth - 1, False, alpha, beta, temp_board, ai_player_symbol)
+                if traced:
+                    tracer.close(evaluation, self.nodes_searched)
                 max_eval = max(max_eval, evaluation)
                 alpha = max(alpha, evaluation)
                 if beta <= alpha:
+                    if stats is not None:
+                        self._record_cutoff(stats, i)
                     break # Prune
             return max_eval
         else: # Minimizing player
             min_eval = float('inf')
-            for r, c in empty_cells_coords:
+            for i, (r, c) in enumerate(empty_cells_coords):
                 temp_board = [row[:] for row in board_state] # Create a copy
                 temp_board[r][c] = current_sim_player_symbol
-                evaluation = self._minimax(depth - 1, True, alpha, beta, temp_board, ai_player_symbol)
+                traced = tracer is not None and tracer.open((r, c), current_sim_player_symbol, alpha, beta, self.nodes_searched)
+                if i == 0:
+                    evaluation = self._minimax(depth - 1, True, alpha, beta, temp_board, ai_player_symbol)
+                else:
+                    evaluation = self._minimax(depth - 1, True, beta - 1, beta, temp_board, ai_player_symbol)
+                    if alpha < evaluation < beta:
+                        evaluation = self._minimax(depth - 1, True, alpha, beta, temp_board, ai_player_symbol)
+                if traced:
+                    tracer.close(evaluation, self.nodes_searched)
                 min_eval = min(min_eval, evaluation)
                 beta = min(beta, evaluation)
                 if beta <= alpha:
+                    if stats is not None:
+                        self._record_cutoff(stats, i)
                     break # Prune
             return min_eval
 
-    def make_ai_move_hard(self):
-        """Makes a move for the AI using the Minimax algorithm."""
+    @staticmethod
+    def _record_cutoff(stats, move_index):
+        stats.beta_cutoffs += 1
+        if move_index == 0:
+            stats.first_move_cutoffs += 1
+
+    def _begin_search(self, collect_stats):
+        """Resets per-search counters; returns the SearchStats to fill, or None."""
+        self.nodes_searched = 0
+        self.last_move_choices = None
+        self._search_stats = SearchStats() if collect_stats else None
+        return self._search_stats
+
+    def _end_search(self, stats, started, result):
+        """Finishes a search started with _begin_search and shapes the entry point's return value."""
+        self._search_stats = None
+        if stats is None:
+            return result
+        stats.nodes = self.nodes_searched
+        stats.elapsed = time.perf_counter() - started
+        return result, stats
+
+    def make_ai_move_hard(self, collect_stats=False, tracer=None):
+        """
+        Makes a move for the AI using the Minimax algorithm.
+        With collect_stats=True, returns (move_made, SearchStats) instead of move_made.
+        A gomoku_trace.SearchTracer passed as tracer records the search tree. Raises
+        SearchBudgetExceeded, without moving, if should_stop asks the search to stop.
+        """
+        started = time.perf_counter()
+        stats = self._begin_search(collect_stats)
+        self._search_tracer = tracer
+        if tracer is not None:
+            tracer.begin()
+        try:
+            moved = self._make_ai_move_hard()
+        finally:
+            self._search_tracer = None
+            self._search_windows = self._search_cells = None
+            if tracer is not None:
+                tracer.end(self.nodes_searched)
+        return self._end_search(stats, started, moved)
+
+    def _make_ai_move_hard(self):
         if self.game_over:
             return False
 
@@ -498,36 +903,73 @@ class GomokuGame:
         best_score = -float('inf') # Initialize best_score to a very low value
         ai_player_symbol = self.current_player
 
-        empty_cells = []
-        for r_idx in range(self.board_size_internal):
-            for c_idx in range(self.board_size_internal):
-                if self.board[r_idx][c_idx] == ' ':
-                    empty_cells.append((r_idx, c_idx))
+        # Dead cells are left out here and at every node below: stones only ever kill windows
+        self._search_windows = [window for window in winning_windows(self.board_size_internal, self.WIN_LENGTH)
+                                if is_live_window(self.board, window)]
+        empty_cells = self._search_cells = self.live_cells()
+        if not empty_cells: # Already drawn: any empty cell will do
+            self._search_windows = self._search_cells = None
+            empty_cells = [(r, c) for r, row in enumerate(self.board) for c, cell in enumerate(row) if cell == ' ']
         
         if not empty_cells:
             return False # No moves possible
 
+        known = self._lookup_solved()
+        if known is not None and known[0] == "win":
+            return self._play_choice([known[1]])
+
+        if self.SOLVER_NODES and known is None:
+            # Forced wins are played at once; against a forced win of the opponent, only the
+            # moves the solver could not refute are searched
+            solver = self._get_threat_solver()
+            winning_move = solver.find_win(self.board, ai_player_symbol, node_budget=self.SOLVER_NODES)
+            if winning_move is not None:
+                self._record_solved("win", winning_move)
+                return self._play_choice([winning_move])
+            defences = solver.defences(self.board, ai_player_symbol, node_budget=self.SOLVER_NODES)
+            if defences: # Empty when every move near the threat loses: then search everything
+                empty_cells = defences
+
+        if self._search_stats is not None:
+            self._search_stats.nodes_by_ply[0] = 1
+
         # Shuffle empty_cells to add some unpredictability for equally scored moves
         # For performance testing or debugging, one might comment this out to get deterministic behavior.
         random.shuffle(empty_cells) 
 
-        for r, c in empty_cells:
-            temp_board = [row[:] for row in self.board] # Create a deep copy
-            temp_board[r][c] = ai_player_symbol # Simulate AI's move
-
-            # Call minimax for the opponent's turn (minimizing player)
-            # Depth is self.SEARCH_DEPTH - 1 because one ply (AI's current move) is already made.
-            move_score = self._minimax(self.SEARCH_DEPTH - 1, False, -float('inf'), float('inf'), temp_board, ai_player_symbol)
-            
-            # print(f"Move ({r},{c}) scored: {move_score}") # Optional debug
-
-            if best_move is None or move_score > best_score:
-                best_score = move_score
-                best_move = (r, c)
-            # Optional: if move_score == best_score and best_move is not None, add random chance to pick this move
-            # This part of the original comment is slightly confusing, shuffle handles multiple 'best' scores.
-            # If we wanted to prefer later equally good moves, we'd use 'move_score >= best_score'.
-            # The current `random.shuffle(empty_cells)` already helps break ties randomly.
+        # On a symmetric position, moves that a symmetry maps onto each other score the same:
+        # only the first of each class is searched, and the move played is drawn from its class
+        symmetries = board_symmetries(self.board)
+        equivalent_moves = {}
+        if len(symmetries) > 1:
+            for r, c in empty_cells:
+                equivalent_moves.setdefault(min(t(r, c) for t in symmetries), []).append((r, c))
+            empty_cells = [moves[0] for moves in equivalent_moves.values()]
+
+        # Iterative deepening: each iteration searches the previous best move first, in an
+        # aspiration window around the previous score that is widened if the score falls outside.
+        # Unless a forced result was found, the last one also finds the moves as good as the best,
+        # one of which is played at random (and all of which the move cache keeps)
+        ties = None
+        for iteration_depth in range(1, self.SEARCH_DEPTH + 1):
+            self._root_depth = iteration_depth
+            if best_move is None or abs(best_score) > MATE_THRESHOLD:
+                window = (-float('inf'), float('inf'))
+            else:
+                window = (best_score - self.ASPIRATION_WINDOW, best_score + self.ASPIRATION_WINDOW)
+            collect_ties = iteration_depth == self.SEARCH_DEPTH and (best_move is None or abs(best_score) <= MATE_THRESHOLD)
+            while True:
+                ties = [] if collect_ties else None
+                move, score = self._search_root(empty_cells, iteration_depth, window[0], window[1], ai_player_symbol, ties)
+                if score <= window[0] and window[0] > -float('inf'):
+                    window = (-float('inf'), window[1]) # Failed low: the true score is at most score
+                elif score >= window[1] and window[1] < float('inf'):
+                    window = (window[0], float('inf')) # Failed high
+                else:
+                    break
+            best_move, best_score = move, score
+            empty_cells.remove(best_move)
+            empty_cells.insert(0, best_move)
 
         # if best_move is not None: # Optional debug
         #    print(f"Hard AI chose: {best_move} with score {best_score}")
@@ -535,13 +977,330 @@ class GomokuGame:
         #    print("Hard AI found no best_move. This should ideally not happen with empty cells.")
 
         if best_move is not None: # Check if a best_move was found
-            return self.make_move(best_move[0], best_move[1])
+            if ties is None or abs(best_score) > MATE_THRESHOLD:
+                ties = [best_move] # Among forced results, the move the shallower iterations preferred
+            if equivalent_moves:
+                return self._play_choice([move for tie in ties for move in equivalent_moves[min(t(*tie) for t in symmetries)]])
+            return self._play_choice(ties)
         else:
             # Fallback if no move improves score or if all moves are losing (best_score remains -inf).
             # This ensures AI always makes a move if one is available.
             # or if all moves lead to immediate loss (best_score remains -inf, which is unlikely if minimax works)
             print("Hard AI: Minimax found no best move or error, falling back to Normal AI.")
-            return self.make_ai_move_normal()
+            return self._make_ai_move_normal()
+
+    def _search_root(self, moves, depth, alpha, beta, ai_player_symbol, ties=None):
+        """
+        Principal variation search over the root moves: the first gets the full window, the
+        rest only a null window at the best score so far, and are searched again if they beat
+        it. Returns (best move, its score); a score outside (alpha, beta) is only a bound.
+        Ties go to the earlier move. Given a list as ties, a move the null window leaves at exactly
+        the best score gets a second one just below it, telling a tie from a worse move, and ties
+        is left holding every move with the best score.
+        """
+        best_move, best_score = None, -float('inf')
+        tracer = self._search_tracer
+        for r, c in moves:
+            temp_board = [row[:] for row in self.board] # Create a deep copy
+            temp_board[r][c] = ai_player_symbol # Simulate AI's move
+            traced = tracer is not None and tracer.open((r, c), ai_player_symbol, alpha, beta, self.nodes_searched)
+            # Depth - 1 because one ply (AI's current move) is already made
+            if best_move is None:
+                move_score = self._minimax(depth - 1, False, alpha, beta, temp_board, ai_player_symbol)
+            else:
+                move_score = self._minimax(depth - 1, False, alpha, alpha + 1, temp_board, ai_player_symbol)
+                if ties is not None and move_score == alpha: # At most as good as the best: maybe just as good
+                    move_score = min(alpha, self._minimax(depth - 1, False, alpha - 1, alpha, temp_board, ai_player_symbol))
+                if alpha < move_score < beta:
+                    move_score = self._minimax(depth - 1, False, alpha, beta, temp_board, ai_player_symbol)
+            if traced:
+                tracer.close(move_score, self.nodes_searched)
+            if best_move is None or move_score > best_score:
+                best_move, best_score = (r, c), move_score
+                if ties is not None:
+                    ties[:] = [best_move]
+                alpha = max(alpha, move_score)
+                if alpha >= beta:
+                    break # Fails high: the caller widens the window
+            elif ties is not None and move_score == best_score:
+                ties.append((r, c))
+        return best_move, best_score
+
+    def solve(self, node_budget=None, time_budget=None, vcf_only=False):
+        """
+        Looks for a forced win or loss of the current player with the threat solver, without
+        changing the game. Returns a gomoku_solver.Solution whose result is "win", "loss" or
+        "unknown". vcf_only restricts attacks to fours.
+        """
+        import gomoku_solver # Imported here: gomoku_solver itself builds on this module
+        if vcf_only:
+            solver = gomoku_solver.ThreatSolver(vcf_only=True) # Its results differ, so it gets its own table
+        else:
+            solver = self._get_threat_solver()
+        # Not recorded in solved_positions: puzzles sent here are arbitrary positions, unlike the AIs' own
+        return solver.solve(self.board, self.current_player, node_budget, time_budget)
+
+    def _lookup_solved(self):
+        """(result, move) recorded in solved_positions for the current position, or None."""
+        if self.solved_positions is None:
+            return None
+        known = self.solved_positions.lookup(self.board, self.current_player)
+        if known is not None and known[0] == "win" and (known[1] is None or self.board[known[1][0]][known[1][1]] != ' '):
+            return None # No usable move (or a hash collision)
+        return known
+
+    def _record_solved(self, result, move):
+        if self.solved_positions is not None:
+            self.solved_positions.record(self.board, self.current_player, result, move)
+
+    def _get_threat_solver(self):
+        if self.threat_solver is None:
+            import gomoku_solver
+            self.threat_solver = gomoku_solver.ThreatSolver(table_entries=200000)
+        return self.threat_solver
+
+    def analyze(self, k=3, depth=None, node_budget=None, time_budget=None, tt=None):
+        """
+        Finds the k best moves for the current player without changing the game.
+        Searches with iterative deepening up to depth (default SEARCH_DEPTH) and stops
+        early when node_budget nodes or time_budget seconds are used up, returning the
+        deepest completed iteration (at depth 0, the moves scored before the budget ran
+        out, if it did within the first iteration). Scores use the Hard AI's evaluation, from the
+        current player's point of view.
+
+        tt is the TranspositionTable to use; by default the game keeps one in
+        self.transposition_table, so repeated analysis of a position is nearly free.
+        """
+        started = time.perf_counter()
+        if tt is None:
+            if self.transposition_table is None:
+                self.transposition_table = TranspositionTable()
+            tt = self.transposition_table
+        max_depth = depth or self.SEARCH_DEPTH
+        probes, hits = tt.probes, tt.hits
+
+        self._analysis = {
+            "board": [row[:] for row in self.board],
+            "hash": board_hash(self.board),
+            "empty": sum(row.count(' ') for row in self.board),
+            "windows": [window for window in winning_windows(self.board_size_internal, self.WIN_LENGTH)
+                        if is_live_window(self.board, window)],
+            # Moves are only ever searched in these cells (in every empty cell once the game is drawn)
+            "live": set(self.live_cells()) or {(r, c) for r, row in enumerate(self.board) for c, cell in enumerate(row) if cell == ' '},
+            "root": self.current_player,
+            "tt": tt,
+            "nodes": 0,
+            "node_budget": node_budget,
+            "deadline": started + time_budget if time_budget is not None else None,
+            "should_stop": self.should_stop,
+        }
+        _, to_move_keys, perspective_keys = zobrist_table(self.board_size_internal)
+        root_key = self._analysis["hash"] ^ to_move_keys[self.current_player] ^ perspective_keys[self.current_player]
+        cached = tt.root_results.get(root_key)
+        lines = []
+        completed = 0
+        try:
+            if cached is not None and cached[0] >= max_depth and cached[1] >= k:
+                completed, lines = cached[0], cached[2][:k] # Asked before: nothing to search
+            elif not self.game_over:
+                root_moves = self._analysis_moves(None)
+                if not root_moves:
+                    completed = max_depth # A full board: there is nothing to search
+                for iteration_depth in range(completed + 1, max_depth + 1):
+                    scored = self._analyze_root(root_moves, iteration_depth, k)
+                    completed = iteration_depth
+                    lines = scored[:k]
+                    root_moves = [move for move, _ in scored] # Best moves of this iteration are searched first next time
+                    if abs(scored[0][1]) > MATE_THRESHOLD:
+                        break # Forced win or loss found; deeper searches cannot change it
+        except SearchBudgetExceeded:
+            if completed == 0: # Out of budget within the first iteration: the moves scored so far are all there is
+                lines = sorted(self._analysis.get("scored", ()), key=lambda item: item[1], reverse=True)[:k]
+        finally:
+            nodes = self._analysis["nodes"]
+            self._analysis = None
+        self.nodes_searched = nodes
+        complete = completed >= max_depth or bool(lines and abs(lines[0][1]) > MATE_THRESHOLD)
+        if complete and nodes:
+            tt.put_root_result(root_key, max(completed, max_depth), k, lines)
+        lines = [(move, score, self._principal_variation(move, completed, tt)) for move, score in lines]
+        return Analysis(lines, completed, nodes, time.perf_counter() - started, complete,
+                        tt.probes - probes, tt.hits - hits)
+
+    def _analyze_root(self, root_moves, depth, k):
+        """Scores every root move at depth; returns [(move, score)], best first. The top k scores are exact."""
+        state = self._analysis
+        root = state["root"]
+        scored = self._analysis["scored"] = []
+        for move in root_moves:
+            # Moves that cannot reach the current k best only need a bound (fail low)
+            top = sorted((score for _, score in scored), reverse=True)
+            alpha = top[k - 1] if len(top) >= k else -float('inf')
+            self._analysis_place(move, root)
+            try:
+                score = self._analysis_search(depth - 1, 1, alpha, float('inf'), False, move)
+            finally:
+                self._analysis_remove(move, root)
+            scored.append((move, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored
+
+    def _analysis_search(self, depth, ply, alpha, beta, is_maximizing_player, last_move):
+        state = self._analysis
+        state["nodes"] += 1
+        self._check_analysis_budget(state)
+        board = state["board"]
+        root = state["root"]
+        mover = board[last_move[0]][last_move[1]]
+        if self._is_five_at(board, last_move):
+            return WIN_SCORE - ply if mover == root else -(WIN_SCORE - ply)
+        if state["empty"] == 0 or not self._can_still_be_won(board, state["windows"]):
+            return 0
+
+        to_move = root if is_maximizing_player else self._get_opponent_symbol(root)
+        _, to_move_keys, perspective_keys = zobrist_table(self.board_size_internal)
+        key = state["hash"] ^ to_move_keys[to_move] ^ perspective_keys[root]
+        tt = state["tt"]
+        entry = tt.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, flag, tt_move = entry
+            if entry_depth >= depth:
+                score = self._score_from_tt(entry_score, ply)
+                if flag == TranspositionTable.EXACT or \
+                   (flag == TranspositionTable.LOWER and score >= beta) or \
+                   (flag == TranspositionTable.UPPER and score <= alpha):
+                    return score
+        if depth == 0:
+            # Static evaluations are cached too: they dominate the cost of a search
+            score = self._evaluate_board_state(board, root)
+            tt.put(key, 0, score, TranspositionTable.EXACT, None)
+            return score
+
+        original_alpha, original_beta = alpha, beta
+        best_score = -float('inf') if is_maximizing_player else float('inf')
+        best_move = None
+        for move in self._analysis_moves(tt_move):
+            self._analysis_place(move, to_move)
+            try:
+                score = self._analysis_search(depth - 1, ply + 1, alpha, beta, not is_maximizing_player, move)
+            finally:
+                self._analysis_remove(move, to_move)
+            if is_maximizing_player:
+                if score > best_score:
+                    best_score, best_move = score, move
+                alpha = max(alpha, score)
+            else:
+                if score < best_score:
+                    best_score, best_move = score, move
+                beta = min(beta, score)
+            if beta <= alpha:
+                break
+
+        if best_score <= original_alpha:
+            flag = TranspositionTable.UPPER
+        elif best_score >= original_beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        tt.put(key, depth, self._score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    @staticmethod
+    def _check_analysis_budget(state):
+        if state["node_budget"] is not None and state["nodes"] > state["node_budget"]:
+            raise SearchBudgetExceeded()
+        if state["deadline"] is not None and state["nodes"] % 64 == 0 and time.perf_counter() > state["deadline"]:
+            raise SearchBudgetExceeded()
+        if state["should_stop"] is not None and state["nodes"] % 64 == 0 and state["should_stop"]():
+            raise SearchBudgetExceeded()
+
+    @staticmethod
+    def _score_to_tt(score, ply):
+        # Win scores count plies from the root; the table stores them counted from the node
+        if score > MATE_THRESHOLD:
+            return score + ply
+        if score < -MATE_THRESHOLD:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _score_from_tt(score, ply):
+        if score > MATE_THRESHOLD:
+            return score - ply
+        if score < -MATE_THRESHOLD:
+            return score + ply
+        return score
+
+    def _analysis_place(self, move, symbol):
+        state = self._analysis
+        state["board"][move[0]][move[1]] = symbol
+        state["hash"] ^= zobrist_table(self.board_size_internal)[0][move[0] * self.board_size_internal + move[1]][symbol]
+        state["empty"] -= 1
+
+    def _analysis_remove(self, move, symbol):
+        state = self._analysis
+        state["board"][move[0]][move[1]] = ' '
+        state["hash"] ^= zobrist_table(self.board_size_internal)[0][move[0] * self.board_size_internal + move[1]][symbol]
+        state["empty"] += 1
+
+    def _analysis_moves(self, first_move):
+        """Live cells of the analysis board: first_move, then cells within two of a stone, then the rest."""
+        board = self._analysis["board"]
+        live = self._analysis["live"]
+        size = self.board_size_internal
+        near = set()
+        for r in range(size):
+            for c in range(size):
+                if board[r][c] != ' ':
+                    for nr in range(max(0, r - 2), min(size, r + 3)):
+                        for nc in range(max(0, c - 2), min(size, c + 3)):
+                            if board[nr][nc] == ' ' and (nr, nc) in live:
+                                near.add((nr, nc))
+        near.discard(first_move)
+        far = [(r, c) for r in range(size) for c in range(size)
+               if board[r][c] == ' ' and (r, c) in live and (r, c) not in near and (r, c) != first_move]
+        if not near: # Empty board: start from the centre
+            center = (size - 1) / 2
+            far.sort(key=lambda cell: abs(cell[0] - center) + abs(cell[1] - center))
+        moves = sorted(near) + far
+        return [first_move] + moves if first_move is not None else moves
+
+    def _is_five_at(self, board, move):
+        """True if the stone at move is part of WIN_LENGTH or more in a row."""
+        r, c = move
+        symbol = board[r][c]
+        size = self.board_size_internal
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                nr, nc = r + sign * dr, c + sign * dc
+                while 0 <= nr < size and 0 <= nc < size and board[nr][nc] == symbol:
+                    count += 1
+                    nr += sign * dr
+                    nc += sign * dc
+            if count >= self.WIN_LENGTH:
+                return True
+        return False
+
+    def _principal_variation(self, move, depth, tt):
+        """Follows best moves stored in tt from the position after move, up to depth moves in total."""
+        board = [row[:] for row in self.board]
+        size = self.board_size_internal
+        _, to_move_keys, perspective_keys = zobrist_table(size)
+        root = self.current_player
+        symbol = root
+        pv = [move]
+        board[move[0]][move[1]] = symbol
+        while len(pv) < depth and not self._is_five_at(board, pv[-1]):
+            symbol = self._get_opponent_symbol(symbol)
+            entry = tt.peek(board_hash(board) ^ to_move_keys[symbol] ^ perspective_keys[root])
+            if entry is None or entry[3] is None or board[entry[3][0]][entry[3][1]] != ' ':
+                break
+            pv.append(entry[3])
+            board[entry[3][0]][entry[3][1]] = symbol
+        return pv
+
 
 # Functions below are for terminal interaction and will remain separate.
 # These functions can use the DEFAULT_BOARD_SIZE or take the size from the game instance.
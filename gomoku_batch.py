@@ -0,0 +1,216 @@
+"""Batch analysis of many positions across a pool of worker processes.
+
+A position is a dict in one of the compact encodings of gomoku_codec:
+  {"board": "....X..O..", ...}              - the compact board string; its length gives the size
+  {"moves": [112, 113], "board_size": 15}   - cell indices in play order, X moving first
+plus optional "id" (echoed back), "to_move" ('X' or 'O'; by default whoever has fewer
+stones, X on a tie) and per-item "k", "depth", "time_budget" and "node_budget", which
+override the batch defaults.
+
+Each result holds the static evaluation (_evaluate_board_state, for the player to move)
+and the best moves from GomokuGame.analyze. Results are produced as items finish, not in
+input order; "index" gives the item's position in the input.
+
+Usage:
+  python gomoku_batch.py positions.ndjson [--workers N] [--k 1] [--depth 2] [--time-budget 1.0]
+                                          [--node-budget N] > results.ndjson
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import gomoku_codec
+from gomoku import GomokuGame, TranspositionTable
+
+DEFAULTS = {"k": 1, "depth": 2, "time_budget": 1.0, "node_budget": None}
+MIN_BOARD_SIZE = 5 # A five must fit
+WORKER_TABLE_ENTRIES = 500000
+
+_worker_table = None # Hash table kept by each worker process across the items it analyses
+
+
+def build_position(item):
+    """Creates the GomokuGame for a position dict. Raises ValueError if it is malformed."""
+    if "board" in item:
+        text = item["board"]
+        board_size = math.isqrt(len(text))
+        if board_size * board_size != len(text):
+            raise ValueError(f"Board string of length {len(text)} is not square")
+        if board_size < MIN_BOARD_SIZE:
+            raise ValueError(f"Board must be at least {MIN_BOARD_SIZE}x{MIN_BOARD_SIZE}")
+        game = GomokuGame(board_size=board_size)
+        game.board = gomoku_codec.decode_board(text, board_size)
+    elif "moves" in item:
+        board_size = item.get("board_size", 15)
+        if not isinstance(board_size, int) or board_size < MIN_BOARD_SIZE:
+            raise ValueError(f"board_size must be an integer of at least {MIN_BOARD_SIZE}")
+        game = GomokuGame(board_size=board_size)
+        for row, col in gomoku_codec.decode_moves(item["moves"], board_size):
+            if not game.make_move(row, col):
+                raise ValueError(f"Illegal move ({row}, {col})")
+            game.switch_player()
+    else:
+        raise ValueError("Position needs a 'board' or 'moves' field")
+    stones = {'X': 0, 'O': 0}
+    for row in game.board:
+        for cell in row:
+            if cell != ' ':
+                stones[cell] += 1
+    to_move = item.get("to_move") or ('X' if stones['X'] <= stones['O'] else 'O')
+    if to_move not in ('X', 'O'):
+        raise ValueError(f"Invalid to_move {to_move!r}")
+    game.current_player = to_move
+    return game
+
+
+def analyze_position(index, item, defaults=None):
+    """
+    Analyses one position; returns its result dict (with "error" instead if it is malformed
+    or its analysis fails, so one bad item never ends a batch).
+    """
+    global _worker_table
+    options = dict(DEFAULTS, **(defaults or {}))
+    options.update({key: item[key] for key in DEFAULTS if key in item})
+    result = {"index": index}
+    if "id" in item:
+        result["id"] = item["id"]
+    try:
+        game = build_position(item)
+    except (ValueError, KeyError, TypeError) as e:
+        result["error"] = str(e)
+        return result
+    if _worker_table is None:
+        _worker_table = TranspositionTable(WORKER_TABLE_ENTRIES)
+    try:
+        analysis = game.analyze(k=options["k"], depth=options["depth"], node_budget=options["node_budget"],
+                                time_budget=options["time_budget"], tt=_worker_table)
+        evaluation = game._evaluate_board_state(game.board, game.current_player)
+    except Exception as e:
+        result["error"] = f"Analysis failed: {type(e).__name__}: {e}"
+        return result
+    result.update(toMove=game.current_player, eval=evaluation)
+    result.update(analysis.as_dict())
+    return result
+
+
+def error_result(index, item, error):
+    """The result of a position that could not be analysed at all."""
+    result = {"index": index, "error": str(error)}
+    if isinstance(item, dict) and "id" in item:
+        result["id"] = item["id"]
+    return result
+
+
+def make_pool(workers=None):
+    """A process pool for analyze_position. Workers are spawned, never forked, since the web app runs threads."""
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                                  mp_context=multiprocessing.get_context("spawn"))
+
+
+def analyze_batch(items, workers=None, pool=None, **defaults):
+    """Yields result dicts as positions finish. items may be any iterable, e.g. a file being read.
+
+    Uses pool (of workers processes) if given, else a new pool of workers processes;
+    workers=1 without a pool runs everything in this process. At most 2 * workers items
+    are in flight at a time, so large inputs are streamed rather than read up front.
+    """
+    workers = workers or os.cpu_count()
+    if pool is None and workers == 1:
+        for index, item in enumerate(items):
+            yield analyze_position(index, item, defaults)
+        return
+    own_pool = pool is None
+    if own_pool:
+        pool = make_pool(workers)
+    try:
+        max_in_flight = 2 * workers
+        pending = set()
+        for index, item in enumerate(items):
+            pending.add(pool.submit(analyze_position, index, item, defaults))
+            if len(pending) >= max_in_flight:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+    finally:
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+
+
+async def analyze_batch_async(items, pool, workers, admit=None, **defaults):
+    """Async version of analyze_batch for the web app: yields results as they finish without blocking the loop.
+
+    admit, if given, is called for each position and returns an async context manager held
+    while the position is analysed (the web app's scheduler slot). If entering it raises,
+    the position is not analysed and its result holds the exception's message as "error";
+    so does the result of a position whose worker failed.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def analyze(index, item):
+        async with contextlib.AsyncExitStack() as stack:
+            if admit is not None:
+                try:
+                    await stack.enter_async_context(admit())
+                except Exception as e: # Not admitted, e.g. the server is overloaded
+                    return error_result(index, item, e)
+            try:
+                return await loop.run_in_executor(pool, analyze_position, index, item, defaults)
+            except Exception as e: # E.g. the worker process died
+                return error_result(index, item, f"Analysis failed: {type(e).__name__}: {e}")
+
+    max_in_flight = 2 * workers
+    pending = set()
+    try:
+        for index, item in enumerate(items):
+            pending.add(asyncio.ensure_future(analyze(index, item)))
+            if len(pending) >= max_in_flight:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending: # The client went away: drop work that has not started
+            future.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("positions", help="NDJSON file with one position per line ('-' for stdin)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--k", type=int, default=DEFAULTS["k"])
+    parser.add_argument("--depth", type=int, default=DEFAULTS["depth"])
+    parser.add_argument("--time-budget", type=float, default=DEFAULTS["time_budget"], help="Seconds per position")
+    parser.add_argument("--node-budget", type=int, help="Nodes per position")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.positions == "-" else open(args.positions)
+    started = time.perf_counter()
+    count = 0
+    try:
+        items = (gomoku_codec.loads(line) for line in source if line.strip())
+        for result in analyze_batch(items, workers=args.workers, k=args.k, depth=args.depth,
+                                    time_budget=args.time_budget, node_budget=args.node_budget):
+            sys.stdout.write(gomoku_codec.dumps(result).decode() + "\n")
+            count += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    elapsed = time.perf_counter() - started
+    print(f"{count} positions in {elapsed:.1f} s ({count / elapsed if elapsed else 0:.1f}/s, "
+          f"{args.workers} workers)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""Speed benchmarks for the AI engines and check_win over a fixed corpus of positions.
+
+Usage:
+  python gomoku_bench.py run [--corpus bench_corpus.json] [--out results.json]
+                             [--engines hard,normal] [--positions id1,id2] [--repeat N]
+                             [--baseline baseline.json] [--threshold 0.1]
+  python gomoku_bench.py compare baseline.json results.json [--threshold 0.1]
+
+Results are JSON. compare (or run with --baseline) flags every (position, engine)
+whose time per move grew by more than the threshold and exits with status 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from gomoku import GomokuGame
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_corpus.json")
+RESULTS_FORMAT = 1
+DEFAULT_THRESHOLD = 0.10 # Relative slowdown that counts as a regression
+
+# Engine name -> function taking the prepared game; each runs the operation being timed
+ENGINES = {
+    "easy": GomokuGame.make_ai_move_easy,
+    "normal": GomokuGame.make_ai_move_normal,
+    "hard": GomokuGame.make_ai_move_hard,
+    "check_win": GomokuGame.check_win,
+}
+
+
+def load_corpus(path=DEFAULT_CORPUS):
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_game(position):
+    """Creates the GomokuGame described by a corpus position."""
+    board_size = position["board_size"]
+    game = GomokuGame(board_size=board_size, game_mode="1P")
+    if "rows" in position:
+        rows = position["rows"]
+        if len(rows) != board_size or any(len(row) != board_size for row in rows):
+            raise ValueError(f"Position {position['id']}: rows do not match board_size {board_size}")
+        game.board = [[' ' if ch == '.' else ch for ch in row] for row in rows]
+    for row, col in position.get("moves", ()):
+        if not game.make_move(row, col):
+            raise ValueError(f"Position {position['id']}: illegal move ({row}, {col})")
+        game.switch_player()
+    game.current_player = position.get("to_move", game.current_player)
+    return game
+
+
+def measure(position, engine, options, repeat):
+    """Times one engine on one position. Returns a result dict."""
+    func = ENGINES[engine]
+    repeat = options.get("repeat", repeat)
+    times = []
+    nodes = 0
+    for i in range(repeat):
+        game = build_game(position)
+        if "depth" in options:
+            game.SEARCH_DEPTH = options["depth"]
+        random.seed(i) # Same random tie-breaks on every run
+        started = time.perf_counter()
+        func(game)
+        times.append(time.perf_counter() - started)
+        nodes = game.nodes_searched
+
+    # Peak memory is measured on a separate run, since tracing slows everything down
+    game = build_game(position)
+    if "depth" in options:
+        game.SEARCH_DEPTH = options["depth"]
+    random.seed(0)
+    tracemalloc.start()
+    try:
+        func(game)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    time_per_move = statistics.median(times)
+    return {
+        "position": position["id"],
+        "category": position["category"],
+        "board_size": position["board_size"],
+        "engine": engine,
+        "repeat": repeat,
+        "time_per_move_s": time_per_move,
+        "min_time_s": min(times),
+        "nodes": nodes,
+        "nodes_per_sec": nodes / time_per_move if time_per_move > 0 else 0.0,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def run(corpus, engines=None, positions=None, repeat=3, progress=None):
+    results = []
+    for position in corpus["positions"]:
+        if positions and position["id"] not in positions:
+            continue
+        for engine, options in position["engines"].items():
+            if engines and engine not in engines:
+                continue
+            result = measure(position, engine, options, repeat)
+            results.append(result)
+            if progress:
+                progress(result)
+    return {
+        "format": RESULTS_FORMAT,
+        "corpus_version": corpus["version"],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Returns a list of comparison rows; a row's "regression" is True when it slowed down past threshold."""
+    if baseline.get("corpus_version") != current.get("corpus_version"):
+        raise ValueError(f"Corpus versions differ: {baseline.get('corpus_version')} vs {current.get('corpus_version')}")
+    base = {(r["position"], r["engine"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = base.get((result["position"], result["engine"]))
+        if before is None:
+            continue
+        ratio = result["time_per_move_s"] / before["time_per_move_s"] if before["time_per_move_s"] > 0 else 1.0
+        rows.append({
+            "position": result["position"],
+            "engine": result["engine"],
+            "baseline_s": before["time_per_move_s"],
+            "current_s": result["time_per_move_s"],
+            "ratio": ratio,
+            "baseline_nodes": before["nodes"],
+            "current_nodes": result["nodes"],
+            "regression": ratio > 1 + threshold,
+        })
+    return rows
+
+
+def format_result(result):
+    return (f"{result['position']:<28} {result['engine']:<10} {result['time_per_move_s'] * 1000:>10.2f} ms "
+            f"{result['nodes']:>9} nodes {result['nodes_per_sec']:>11.0f} nodes/s "
+            f"{result['peak_memory_bytes'] / 1024:>9.1f} KiB")
+
+
+def format_comparison(row):
+    flag = "REGRESSION" if row["regression"] else ""
+    return (f"{row['position']:<28} {row['engine']:<10} {row['baseline_s'] * 1000:>10.2f} ms -> "
+            f"{row['current_s'] * 1000:>10.2f} ms ({row['ratio']:.2f}x) {flag}")
+
+
+def report_comparison(rows, file=None):
+    for row in rows:
+        print(format_comparison(row), file=file)
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(regressions)} regression(s) in {len(rows)} comparison(s)", file=file)
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    run_parser.add_argument("--out", help="Write results JSON here (default: stdout)")
+    run_parser.add_argument("--engines", help="Comma-separated engines to run")
+    run_parser.add_argument("--positions", help="Comma-separated position ids to run")
+    run_parser.add_argument("--repeat", type=int, default=3, help="Timed runs per position unless the corpus says otherwise")
+    run_parser.add_argument("--baseline", help="Compare against these saved results")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        return report_comparison(compare(baseline, current, args.threshold))
+
+    corpus = load_corpus(args.corpus)
+    engines = set(args.engines.split(",")) if args.engines else None
+    positions = set(args.positions.split(",")) if args.positions else None
+    results = run(corpus, engines, positions, args.repeat,
+                  progress=lambda result: print(format_result(result), file=sys.stderr))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return report_comparison(compare(baseline, results, args.threshold), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Compact encodings of a GomokuGame for the web API and the game stores.
+
+Three board encodings are supported:
+  "full"    - the 2D list of cells (what the frontend has always used)
+  "compact" - a single string of board_size * board_size characters, row-major,
+              '.' for an empty cell and 'X' / 'O' for stones
+  "moves"   - the list of moves in play order, each as a cell index (row * board_size + col)
+"""
+import json
+from gomoku import GomokuGame
+
+try: # orjson is optional; it is several times faster than the stdlib encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+BOARD_ENCODINGS = ("full", "compact", "moves")
+
+EMPTY_CHAR = '.'
+_CELL_TO_CHAR = {' ': EMPTY_CHAR, 'X': 'X', 'O': 'O'}
+_CHAR_TO_CELL = {EMPTY_CHAR: ' ', 'X': 'X', 'O': 'O'}
+
+
+def encode_board(board):
+    """Encodes a 2D board as a single row-major string."""
+    return ''.join(_CELL_TO_CHAR[cell] for row in board for cell in row)
+
+
+def decode_board(text, board_size):
+    """Decodes a string produced by encode_board back into a 2D board."""
+    if len(text) != board_size * board_size:
+        raise ValueError(f"Expected {board_size * board_size} cells, got {len(text)}")
+    try:
+        cells = [_CHAR_TO_CELL[ch] for ch in text]
+    except KeyError as e:
+        raise ValueError(f"Invalid cell character {e.args[0]!r}") from None
+    return [cells[r * board_size:(r + 1) * board_size] for r in range(board_size)]
+
+
+def encode_moves(moves, board_size):
+    """Encodes a list of (row, col) moves as a list of cell indices."""
+    return [r * board_size + c for r, c in moves]
+
+
+def decode_moves(indices, board_size):
+    """Decodes a list of cell indices back into (row, col) moves."""
+    return [divmod(i, board_size) for i in indices]
+
+
+def pack_moves(moves, board_size):
+    """Packs (row, col) moves into bytes: one byte per move on boards up to 16x16, varints beyond."""
+    if board_size <= 16:
+        return bytes(r * board_size + c for r, c in moves)
+    out = bytearray()
+    for r, c in moves:
+        index = r * board_size + c
+        while index >= 0x80:
+            out.append((index & 0x7F) | 0x80)
+            index >>= 7
+        out.append(index)
+    return bytes(out)
+
+
+def unpack_moves(data, board_size):
+    """Inverse of pack_moves."""
+    if board_size <= 16:
+        return [divmod(index, board_size) for index in data]
+    moves = []
+    index = shift = 0
+    for byte in data:
+        index |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            moves.append(divmod(index, board_size))
+            index = shift = 0
+    if shift:
+        raise ValueError("Truncated varint at end of packed moves")
+    return moves
+
+
+def encode_board_field(game, encoding):
+    """Returns (key, value) holding the game's board in the requested encoding."""
+    if encoding == "full":
+        return "board", game.board
+    if encoding == "compact":
+        return "board", encode_board(game.board)
+    if encoding == "moves":
+        return "moves", encode_moves(game.moves, game.board_size_internal)
+    raise ValueError(f"Unknown board encoding: {encoding!r}")
+
+
+def dumps(obj):
+    """Serializes obj to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """Parses JSON bytes or text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def game_to_bytes(game):
+    """Serializes everything needed to restore a GomokuGame, using the compact encodings."""
+    return dumps({
+        "v": game.version,
+        "c": game.nonce,
+        "n": game.board_size_internal,
+        "b": encode_board(game.board),
+        "m": encode_moves(game.moves, game.board_size_internal),
+        # The redo stack: the moves taken back, and the player of each
+        "u": encode_moves([(row, col) for row, col, _ in game.undone_moves], game.board_size_internal),
+        "up": "".join(player for _, _, player in game.undone_moves),
+        "p": game.current_player,
+        "o": game.game_over,
+        "gm": game.game_mode,
+        "ad": game.ai_difficulty,
+    })
+
+
+def game_from_bytes(data):
+    """Restores a GomokuGame serialized by game_to_bytes."""
+    fields = loads(data)
+    board_size = fields["n"]
+    game = GomokuGame(board_size=board_size, game_mode=fields["gm"], ai_difficulty=fields["ad"])
+    game.board = decode_board(fields["b"], board_size)
+    game.moves = decode_moves(fields["m"], board_size)
+    game.undone_moves = [(row, col, player) for (row, col), player in zip(decode_moves(fields["u"], board_size), fields["up"])]
+    game.current_player = fields["p"]
+    game.game_over = fields["o"]
+    game.nonce = fields["c"]
+    game.version = fields["v"] # Last, since the setters above bump it
+    return game
@@ -0,0 +1,219 @@
+"""Headless engine speaking the Gomocup (Piskvork) brain protocol on stdin/stdout.
+
+Tournament managers such as Piskvork and Gomocup's piskvork/pbrain tools start the engine
+as a subprocess and exchange one command per line:
+  START size          -> OK (ERROR for a board too small or too large)
+  RESTART             -> OK, a new game on the same board
+  BEGIN               -> our first move, "x,y"
+  TURN x,y            -> the opponent's move; answered with ours
+  BOARD / x,y,who ... / DONE
+                      -> a whole position (who: 1 ours, 2 the opponent's); answered with our move
+  TAKEBACK x,y        -> OK, the stone is removed
+  INFO key value      -> settings, no answer; timeout_turn, timeout_match and time_left
+                         (milliseconds) set the time each move may take
+  ABOUT               -> name="...", version="...", ...
+  END                 -> exit
+x is the column and y the row, both from 0. Rules are freestyle: five or more in a row wins.
+
+Each move first looks for a forced win with the threat solver, then searches with
+GomokuGame.analyze under iterative deepening until the move's time is up, keeping one
+hash table for the whole game.
+
+Usage:
+  python gomoku_engine.py    (the tournament manager talks to it on stdin/stdout)
+"""
+import sys
+
+from gomoku import GomokuGame, TranspositionTable
+
+ABOUT = 'name="gomoku", version="1.0", author="gomoku", country="KR"'
+ME, OPPONENT = 'X', 'O' # Freestyle rules treat both colours alike, so ours is always X
+MIN_BOARD_SIZE, MAX_BOARD_SIZE = 5, 100
+MAX_DEPTH = 20 # Iterative deepening stops here if time is left
+SOLVER_SHARE = 0.2 # Part of a move's time spent looking for a forced win
+DEFAULT_TURN_SECONDS = 5.0 # Until the manager sends INFO timeout_turn
+MOVES_TO_GO = 25 # Moves the remaining match time is spread over
+SAFETY = 0.8 # Part of the allowed time actually used: the rest covers overhead and pipe latency
+# The search looks at the clock only every 64 nodes, which can take this long on a crowded board
+DEADLINE_OVERSHOOT = 0.15
+FASTEST_MOVE_SECONDS = 0.05 # Budget when the manager asks to play as fast as possible (timeout_turn 0)
+
+
+class GomocupEngine:
+    """Plays one game after another for a tournament manager; feed it lines with run()."""
+    def __init__(self, out=None, game_class=GomokuGame):
+        self.out = out or sys.stdout
+        self.game_class = game_class
+        self.game = None
+        self.table = TranspositionTable(500000)
+        self.timeout_turn = DEFAULT_TURN_SECONDS # Seconds; 0 asks for moves as fast as possible
+        self.timeout_match = 0.0 # Seconds for the whole match; 0 means unlimited
+        self.time_left = None # Seconds of the match left, as last reported by the manager
+
+    def run(self, lines):
+        """Answers each command in lines until END or the end of input."""
+        lines = iter(lines)
+        for line in lines:
+            if not self.handle(line, lines):
+                break
+
+    def handle(self, line, lines=()):
+        """Answers one command; BOARD reads its stones from lines. Returns False after END."""
+        command, _, argument = line.strip().partition(" ")
+        command = command.upper()
+        argument = argument.strip()
+        if not command:
+            return True
+        if command == "END":
+            return False
+        handler = getattr(self, f"_command_{command.lower()}", None)
+        if handler is None:
+            self._send(f"UNKNOWN command {command}")
+            return True
+        try:
+            if command == "BOARD":
+                self._command_board(lines)
+            else:
+                handler(argument)
+        except ValueError as e:
+            self._send(f"ERROR {e}")
+        return True
+
+    def move_time(self):
+        """Seconds the next move may search for."""
+        if self.timeout_turn <= 0:
+            return FASTEST_MOVE_SECONDS
+        budget = self.timeout_turn
+        if self.timeout_match > 0 and self.time_left is not None:
+            budget = min(budget, self.time_left / MOVES_TO_GO)
+        return max(budget * SAFETY - DEADLINE_OVERSHOOT, FASTEST_MOVE_SECONDS)
+
+    def _send(self, text):
+        self.out.write(text + "\n")
+        self.out.flush()
+
+    def _new_game(self, board_size):
+        self.game = self.game_class(board_size=board_size)
+        self.table.clear()
+
+    def _require_game(self):
+        if self.game is None:
+            raise ValueError("no game started, send START first")
+        return self.game
+
+    def _parse_cell(self, text):
+        """(row, col) of an "x,y" argument on the current board."""
+        game = self._require_game()
+        try:
+            x, y = (int(part) for part in text.split(","))
+        except ValueError:
+            raise ValueError(f"bad coordinates {text!r}") from None
+        if not (0 <= x < game.board_size_internal and 0 <= y < game.board_size_internal):
+            raise ValueError(f"coordinates {text} are off the board")
+        return y, x
+
+    def _place(self, row, col, symbol):
+        game = self._require_game()
+        if game.board[row][col] != ' ':
+            raise ValueError(f"cell {col},{row} is not empty")
+        game.current_player = symbol
+        game.make_move(row, col)
+
+    def _play(self):
+        """Chooses, makes and sends our move."""
+        game = self._require_game()
+        game.current_player = ME
+        move = self._choose_move(self.move_time())
+        if move is None:
+            raise ValueError("no empty cell left")
+        game.make_move(*move)
+        self._send(f"{move[1]},{move[0]}")
+
+    def _choose_move(self, seconds):
+        game = self.game
+        if not game.moves: # The first move needs no search
+            center = game.board_size_internal // 2
+            return center, center
+        solution = game.solve(time_budget=seconds * SOLVER_SHARE)
+        if solution.result == "win":
+            return solution.move
+        analysis = game.analyze(k=1, depth=MAX_DEPTH, time_budget=seconds * (1 - SOLVER_SHARE), tt=self.table)
+        if analysis.best_move is not None:
+            return analysis.best_move
+        return next(((r, c) for r, row in enumerate(game.board) for c, cell in enumerate(row) if cell == ' '), None)
+
+    def _command_start(self, argument):
+        try:
+            board_size = int(argument)
+        except ValueError:
+            raise ValueError(f"bad board size {argument!r}") from None
+        if not MIN_BOARD_SIZE <= board_size <= MAX_BOARD_SIZE:
+            raise ValueError(f"unsupported board size {board_size}")
+        self._new_game(board_size)
+        self._send("OK")
+
+    def _command_rectstart(self, argument):
+        raise ValueError("rectangular boards are not supported")
+
+    def _command_restart(self, argument):
+        self._new_game(self._require_game().board_size_internal)
+        self._send("OK")
+
+    def _command_begin(self, argument):
+        self._play()
+
+    def _command_turn(self, argument):
+        self._place(*self._parse_cell(argument), OPPONENT)
+        self._play()
+
+    def _command_board(self, lines):
+        stones = []
+        for line in lines: # Read up to DONE first, so a bad stone does not leave the rest to be taken for commands
+            line = line.strip()
+            if line.upper() == "DONE":
+                break
+            stones.append(line)
+        self._new_game(self._require_game().board_size_internal)
+        for stone in stones:
+            cell, _, who = stone.rpartition(",")
+            if who.strip() not in ("1", "2"):
+                raise ValueError(f"bad stone {stone!r}")
+            self._place(*self._parse_cell(cell), ME if who.strip() == "1" else OPPONENT)
+        self._play()
+
+    def _command_takeback(self, argument):
+        game = self._require_game()
+        row, col = self._parse_cell(argument)
+        if game.board[row][col] == ' ':
+            raise ValueError(f"cell {argument} is empty")
+        if game.moves[-1] == (row, col):
+            game.undo_move() # The usual case; the hash tables stay valid for when the game comes back here
+        else:
+            game.board[row][col] = ' '
+            game.moves.remove((row, col))
+            game.version += 1
+        self._send("OK")
+
+    def _command_info(self, argument):
+        key, _, value = argument.partition(" ")
+        key = key.lower()
+        if key in ("timeout_turn", "timeout_match", "time_left"):
+            try:
+                seconds = int(value) / 1000
+            except ValueError:
+                raise ValueError(f"bad value for {key}: {value!r}") from None
+            setattr(self, key, seconds)
+        # Other keys (max_memory, game_type, rule, folder, evaluate) do not change how we play
+
+    def _command_about(self, argument):
+        self._send(ABOUT)
+
+
+def main(argv=None):
+    sys.stdout.reconfigure(line_buffering=True)
+    GomocupEngine().run(iter(sys.stdin.readline, ""))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
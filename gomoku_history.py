@@ -0,0 +1,289 @@
+"""Append-only move log of every game, kept in SQLite (WAL mode).
+
+Request handlers only enqueue log entries; a background writer thread drains the
+queue and commits everything pending in one transaction, so no request ever waits
+on a disk sync. Moves are stored as packed chunks (one byte per move on boards up
+to 16x16, see gomoku_codec.pack_moves), one chunk per game per flush.
+
+A game id can be reset and played again, so each game played under an id gets its
+own record; the newest record of an id is the one that receives moves. Moves taken
+back are deleted from it (take_back), so the log always holds the moves of the game as
+it stands.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+import gomoku_codec
+from gomoku import GomokuGame
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    record_id INTEGER PRIMARY KEY,
+    game_id TEXT NOT NULL,
+    board_size INTEGER NOT NULL,
+    game_mode TEXT,
+    ai_difficulty TEXT,
+    started REAL NOT NULL,
+    finished REAL,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS records_by_game ON records (game_id, record_id);
+CREATE TABLE IF NOT EXISTS move_chunks (
+    record_id INTEGER NOT NULL,
+    first_ply INTEGER NOT NULL,
+    moves BLOB NOT NULL,
+    PRIMARY KEY (record_id, first_ply)
+) WITHOUT ROWID;
+"""
+
+_WAL_FRAME_HEADER = 24 # Bytes SQLite writes in front of every page in the WAL
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryStats:
+    """Counters for judging how much the log costs on disk.
+
+    write_amplification is bytes appended to the WAL per byte of packed moves; it
+    drops as more moves share each flush.
+    """
+    def __init__(self):
+        self.moves_logged = 0
+        self.payload_bytes = 0
+        self.transactions = 0
+        self.wal_frames = 0
+        self.wal_bytes = 0
+
+    @property
+    def write_amplification(self):
+        return self.wal_bytes / self.payload_bytes if self.payload_bytes else 0.0
+
+    def as_dict(self):
+        return {
+            "moves_logged": self.moves_logged,
+            "payload_bytes": self.payload_bytes,
+            "transactions": self.transactions,
+            "wal_frames": self.wal_frames,
+            "wal_bytes": self.wal_bytes,
+            "write_amplification": self.write_amplification,
+        }
+
+
+class GameHistory:
+    """Batched, asynchronous writer plus synchronous readers for the move log."""
+    def __init__(self, path, flush_interval=0.05, max_batch=1024):
+        self.path = path
+        self.flush_interval = flush_interval # Seconds the writer waits to gather a batch
+        self.max_batch = max_batch
+        self.stats = HistoryStats()
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="gomoku-history-writer", daemon=True)
+        self._writer.start()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Writing (called from request handlers; never blocks on disk)
+
+    def start_game(self, game_id, board_size, game_mode=None, ai_difficulty=None):
+        """Opens a new record for game_id; later moves for the id are appended to it."""
+        self._queue.put(("start", game_id, board_size, game_mode, ai_difficulty, time.time()))
+
+    def record_moves(self, game_id, first_ply, moves):
+        """Appends (row, col) moves, the first of which is ply number first_ply (0-based)."""
+        if moves:
+            self._queue.put(("moves", game_id, first_ply, list(moves)))
+
+    def take_back(self, game_id, ply):
+        """Drops the moves of game_id from ply number ply on, and reopens its record if it was finished."""
+        self._queue.put(("take_back", game_id, ply))
+
+    def finish_game(self, game_id, result):
+        """Marks the newest record of game_id finished; result is 'X', 'O' or 'draw'."""
+        self._queue.put(("finish", game_id, result, time.time()))
+
+    def flush(self, timeout=None):
+        """
+        Blocks until everything enqueued so far is committed (or its batch failed, which
+        is logged). Returns False if timeout seconds passed first.
+        """
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self):
+        """Commits pending entries and stops the writer."""
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = self._connection()
+        conn.execute("PRAGMA wal_autocheckpoint=0") # Checkpoints happen here, so WAL growth can be measured
+        self._wal_pending = 0
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            entries = [entry for entry in batch if entry is not None]
+            try:
+                self._write_batch(conn, entries)
+            except Exception: # The batch is lost, but the writer goes on with the next one
+                logger.exception("Writing %d entries to the game history %s failed", len(entries), self.path)
+            finally:
+                for entry in entries:
+                    if entry[0] == "flush":
+                        entry[1].set()
+            if stop:
+                return
+
+    def _write_batch(self, conn, batch):
+        waiters = []
+        records = {} # game_id -> record_id, for entries of this batch
+        chunks = {} # record_id -> [first_ply, moves, board_size]
+        with conn:
+            for entry in batch:
+                kind = entry[0]
+                if kind == "flush":
+                    waiters.append(entry[1])
+                elif kind == "start":
+                    _, game_id, board_size, game_mode, ai_difficulty, started = entry
+                    cursor = conn.execute(
+                        "INSERT INTO records (game_id, board_size, game_mode, ai_difficulty, started) VALUES (?, ?, ?, ?, ?)",
+                        (game_id, board_size, game_mode, ai_difficulty, started))
+                    records[game_id] = cursor.lastrowid
+                elif kind == "moves":
+                    _, game_id, first_ply, moves = entry
+                    record = self._current_record(conn, records, game_id)
+                    if record is None:
+                        continue # Moves of a game that was never started (e.g. logged before history existed)
+                    record_id, board_size = record
+                    chunk = chunks.get(record_id)
+                    if chunk is not None and chunk[0] + len(chunk[1]) == first_ply:
+                        chunk[1].extend(moves)
+                    else:
+                        if chunk is not None:
+                            self._insert_chunk(conn, record_id, *chunk)
+                        chunks[record_id] = [first_ply, moves, board_size]
+                elif kind == "take_back":
+                    _, game_id, ply = entry
+                    record = self._current_record(conn, records, game_id)
+                    if record is None:
+                        continue
+                    record_id = record[0]
+                    chunk = chunks.get(record_id)
+                    if chunk is not None: # Moves of this batch not inserted yet
+                        if chunk[0] >= ply:
+                            del chunks[record_id]
+                        else:
+                            chunk[1] = chunk[1][:ply - chunk[0]]
+                    self._truncate(conn, record_id, ply)
+                elif kind == "finish":
+                    _, game_id, result, finished = entry
+                    record = self._current_record(conn, records, game_id)
+                    if record is not None:
+                        conn.execute("UPDATE records SET finished = ?, result = ? WHERE record_id = ?",
+                                     (finished, result, record[0]))
+            for record_id, chunk in chunks.items():
+                self._insert_chunk(conn, record_id, *chunk)
+        if len(waiters) < len(batch):
+            self.stats.transactions += 1
+            self._measure_wal(conn)
+
+    def _current_record(self, conn, records, game_id):
+        record_id = records.get(game_id)
+        if record_id is None:
+            row = conn.execute("SELECT MAX(record_id) FROM records WHERE game_id = ?", (game_id,)).fetchone()
+            if row[0] is None:
+                return None
+            record_id = records[game_id] = row[0]
+        board_size = conn.execute("SELECT board_size FROM records WHERE record_id = ?", (record_id,)).fetchone()[0]
+        return record_id, board_size
+
+    def _insert_chunk(self, conn, record_id, first_ply, moves, board_size):
+        packed = gomoku_codec.pack_moves(moves, board_size)
+        conn.execute("INSERT OR REPLACE INTO move_chunks (record_id, first_ply, moves) VALUES (?, ?, ?)",
+                     (record_id, first_ply, packed))
+        self.stats.moves_logged += len(moves)
+        self.stats.payload_bytes += len(packed)
+
+    def _truncate(self, conn, record_id, ply):
+        conn.execute("DELETE FROM move_chunks WHERE record_id = ? AND first_ply >= ?", (record_id, ply))
+        board_size = conn.execute("SELECT board_size FROM records WHERE record_id = ?", (record_id,)).fetchone()[0]
+        for first_ply, packed in conn.execute("SELECT first_ply, moves FROM move_chunks WHERE record_id = ?",
+                                              (record_id,)).fetchall():
+            moves = gomoku_codec.unpack_moves(packed, board_size)
+            if first_ply + len(moves) > ply: # Runs past the takeback (chunks a retry logged twice can overlap)
+                conn.execute("UPDATE move_chunks SET moves = ? WHERE record_id = ? AND first_ply = ?",
+                             (gomoku_codec.pack_moves(moves[:ply - first_ply], board_size), record_id, first_ply))
+        conn.execute("UPDATE records SET finished = NULL, result = NULL WHERE record_id = ?", (record_id,))
+
+    def _measure_wal(self, conn):
+        # wal_checkpoint reports how many frames the WAL holds. After a complete
+        # checkpoint the next transaction starts writing at the beginning again.
+        _, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if log_frames < 0: # Not in WAL mode (e.g. an in-memory database)
+            return
+        new_frames = log_frames - self._wal_pending
+        self._wal_pending = 0 if checkpointed == log_frames else log_frames
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        self.stats.wal_frames += new_frames
+        self.stats.wal_bytes += new_frames * (page_size + _WAL_FRAME_HEADER)
+
+    # Reading
+
+    def records(self, game_id):
+        """All records of game_id, oldest first, as dicts."""
+        rows = self._connection().execute(
+            "SELECT record_id, board_size, game_mode, ai_difficulty, started, finished, result "
+            "FROM records WHERE game_id = ? ORDER BY record_id", (game_id,)).fetchall()
+        return [{"recordId": r[0], "boardSize": r[1], "gameMode": r[2], "aiDifficulty": r[3],
+                 "started": r[4], "finished": r[5], "result": r[6]} for r in rows]
+
+    def latest_record(self, game_id):
+        records = self.records(game_id)
+        return records[-1] if records else None
+
+    def iter_moves(self, record_id):
+        """Yields the (row, col) moves of a record in play order."""
+        conn = self._connection()
+        board_size = conn.execute("SELECT board_size FROM records WHERE record_id = ?", (record_id,)).fetchone()[0]
+        next_ply = 0
+        for first_ply, packed in conn.execute(
+                "SELECT first_ply, moves FROM move_chunks WHERE record_id = ? ORDER BY first_ply", (record_id,)):
+            moves = gomoku_codec.unpack_moves(packed, board_size)
+            yield from moves[next_ply - first_ply:] # Skips moves a retried write logged twice
+            next_ply = max(next_ply, first_ply + len(moves))
+
+
+def rebuild_game(record, moves):
+    """Replays a record's moves into a fresh GomokuGame, applying the usual win/draw rules."""
+    game = GomokuGame(board_size=record["boardSize"], game_mode=record["gameMode"],
+                      ai_difficulty=record["aiDifficulty"])
+    for row, col in moves:
+        if game.game_over or not game.make_move(row, col):
+            raise ValueError(f"Move ({row}, {col}) cannot be replayed")
+        if game.check_win() or game.check_draw():
+            game.game_over = True
+        else:
+            game.switch_player()
+    return game
@@ -0,0 +1,231 @@
+"""Load generator: N simulated players playing full games against the web API.
+
+Each player repeatedly starts a game (1P at some difficulty, or 2P) under its own game
+id and plays random moves with a think time between them until the game ends or
+--max-moves is reached. Players start spread over the ramp-up period.
+
+Usage:
+  python gomoku_loadtest.py [--url http://127.0.0.1:8000] [--players 20] [--duration 30]
+                            [--ramp-up 5] [--think-time 0.5] [--mix 1P-Easy=4,1P-Medium=2,2P=4]
+                            [--max-moves 40] [--json report.json]
+
+Without --url the app is driven in-process through httpx's ASGI transport, so no server
+is needed; with it, point it at a local uvicorn instance.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+DEFAULT_MIX = {"1P-Easy": 4, "1P-Medium": 2, "2P": 4} # Hard searches take seconds per move; opt in with --mix
+# After a failed request a player waits BACKOFF_BASE seconds, doubling per failure in a row up to
+# BACKOFF_MAX (with jitter), so an overloaded server answering 503 is not retried in a tight loop
+BACKOFF_BASE = 0.1
+BACKOFF_MAX = 5.0
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = defaultdict(int)
+        self.failures = 0 # Requests that raised (connection errors, timeouts)
+
+    @property
+    def requests(self):
+        return len(self.latencies) + self.failures
+
+    @property
+    def errors(self):
+        return self.failures + sum(count for status, count in self.statuses.items() if status >= 400)
+
+    def as_dict(self, elapsed):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "throughput": self.requests / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            "error_rate": self.errors / self.requests if self.requests else 0.0,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "failures": self.failures,
+        }
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def parse_mix(text):
+    """Parses "1P-Easy=4,2P=1" into {"1P-Easy": 4.0, "2P": 1.0}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name != "2P" and not (name.startswith("1P-") and name[3:] in ("Easy", "Medium", "Hard")):
+            raise ValueError(f"Unknown game type {name!r}; use 1P-Easy, 1P-Medium, 1P-Hard or 2P")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    def __init__(self, client, players=20, duration=30.0, ramp_up=5.0, think_time=0.5, mix=None,
+                 max_moves=40, seed=None):
+        self.client = client
+        self.players = players
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.think_time = think_time # Mean seconds between a player's moves
+        self.mix = mix or DEFAULT_MIX
+        self.max_moves = max_moves
+        self.random = random.Random(seed)
+        self.stats = defaultdict(EndpointStats) # endpoint path -> stats
+        self.games_started = 0
+        self.games_finished = 0
+
+    async def run(self):
+        started = time.perf_counter()
+        deadline = started + self.duration
+        await asyncio.gather(*(self._player(i, deadline) for i in range(self.players)))
+        return self.report(time.perf_counter() - started)
+
+    async def _request(self, path, payload, session):
+        stats = self.stats[path]
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=payload, headers={"X-Session-Id": session})
+        except httpx.HTTPError:
+            stats.failures += 1
+            return None
+        stats.latencies.append(time.perf_counter() - started)
+        stats.statuses[response.status_code] += 1
+        return response.json() if response.status_code == 200 else None
+
+    async def _player(self, index, deadline):
+        await asyncio.sleep(self.ramp_up * index / self.players)
+        session = f"load-{index}"
+        game_number = 0
+        kinds, weights = zip(*self.mix.items())
+        failures = 0 # Failed requests in a row
+        while time.perf_counter() < deadline:
+            game_id = f"load-{index}-{game_number}"
+            game_number += 1
+            kind = self.random.choices(kinds, weights)[0]
+            settings = {"game_id": game_id, "game_mode": "2P"} if kind == "2P" else \
+                {"game_id": game_id, "game_mode": "1P", "ai_difficulty": kind[3:]}
+            state = await self._request("/api/new_game", settings, session)
+            if state is None:
+                failures += 1
+                await self._back_off(failures)
+                continue
+            failures = 0
+            self.games_started += 1
+            for _ in range(self.max_moves):
+                await self._think()
+                if time.perf_counter() >= deadline:
+                    return
+                row, col = self._pick_move(state)
+                next_state = await self._request("/api/make_move", {"row": row, "col": col, "game_id": game_id}, session)
+                if next_state is None:
+                    failures += 1
+                    await self._back_off(failures)
+                else:
+                    failures = 0
+                    state = next_state
+                if state.get("gameOver"):
+                    self.games_finished += 1
+                    break
+
+    async def _think(self):
+        if self.think_time > 0:
+            await asyncio.sleep(self.random.uniform(0, 2 * self.think_time))
+
+    async def _back_off(self, failures):
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (failures - 1))
+        await asyncio.sleep(self.random.uniform(delay / 2, delay))
+
+    def _pick_move(self, state):
+        board = state["board"]
+        empty = [(r, c) for r, row in enumerate(board) for c, cell in enumerate(row) if cell == ' ']
+        return self.random.choice(empty)
+
+    def report(self, elapsed):
+        endpoints = {path: stats.as_dict(elapsed) for path, stats in sorted(self.stats.items())}
+        total = sum(stats.requests for stats in self.stats.values())
+        return {
+            "players": self.players,
+            "elapsed_s": elapsed,
+            "requests": total,
+            "throughput": total / elapsed if elapsed > 0 else 0.0,
+            "games_started": self.games_started,
+            "games_finished": self.games_finished,
+            "endpoints": endpoints,
+        }
+
+
+def format_report(report):
+    lines = [f"{report['players']} players, {report['elapsed_s']:.1f} s: {report['requests']} requests "
+             f"({report['throughput']:.1f}/s), {report['games_started']} games started, "
+             f"{report['games_finished']} finished"]
+    for path, stats in report["endpoints"].items():
+        lines.append(f"{path:<16} {stats['requests']:>7} req {stats['throughput']:>8.1f}/s  "
+                     f"p50 {stats['p50_ms']:>8.1f} ms  p95 {stats['p95_ms']:>8.1f} ms  p99 {stats['p99_ms']:>8.1f} ms  "
+                     f"errors {stats['error_rate']:.1%}")
+    return "\n".join(lines)
+
+
+def make_client(url=None, timeout=60.0):
+    """An httpx client for a server at url, or for the app in this process when url is None."""
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+    import gomoku_web_app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=gomoku_web_app.app), base_url="http://loadtest",
+                             timeout=timeout)
+
+
+async def run_load_test(url=None, **options):
+    async with make_client(url) as client:
+        return await LoadTest(client, **options).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running server (default: the app in-process)")
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which players start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean seconds between a player's moves")
+    parser.add_argument("--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                        help="Weighted game types, e.g. 1P-Easy=4,1P-Medium=2,1P-Hard=1,2P=4")
+    parser.add_argument("--max-moves", type=int, default=40, help="Moves per game before starting a new one")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="Also write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    report = asyncio.run(run_load_test(args.url, players=args.players, duration=args.duration,
+                                       ramp_up=args.ramp_up, think_time=args.think_time, mix=mix,
+                                       max_moves=args.max_moves, seed=args.seed))
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
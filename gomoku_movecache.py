@@ -0,0 +1,119 @@
+"""Cache of AI moves shared by every game a process serves.
+
+Players often reach the same positions, above all in the first moves against the same
+difficulty, and a Normal or Hard move there is the same computation each time. Entries
+are keyed by the position reduced by the board's symmetries (the smallest of its 8
+rotations and reflections, so mirrored games share an entry), the side to move, the
+difficulty and the AI's search budget. Each stores the moves the AI picked its move from
+at random, all equally good (GomokuGame.last_move_choices), and a hit picks one of them
+again, so cached play stays as varied as searched play.
+"""
+import random
+import sys
+import threading
+from collections import OrderedDict
+
+from gomoku import dihedral_transforms
+
+_permutations = {}
+
+
+def _symmetry_permutations(board_size):
+    """For each of the 8 board symmetries, (cell index -> transformed index, its inverse)."""
+    permutations = _permutations.get(board_size)
+    if permutations is None:
+        permutations = []
+        for transform in dihedral_transforms(board_size):
+            forward = [0] * (board_size * board_size)
+            inverse = [0] * (board_size * board_size)
+            for r in range(board_size):
+                for c in range(board_size):
+                    tr, tc = transform(r, c)
+                    forward[r * board_size + c] = tr * board_size + tc
+                    inverse[tr * board_size + tc] = r * board_size + c
+            permutations.append((forward, inverse))
+        permutations = _permutations[board_size] = permutations
+    return permutations
+
+
+def canonical_position(board):
+    """(smallest symmetric image of board as a string, cell index map into it, map back out of it)."""
+    cells = "".join("".join(row) for row in board)
+    best = None
+    for forward, inverse in _symmetry_permutations(len(board)):
+        image = "".join(cells[i] for i in inverse) # Cell j of the image is cell inverse[j] of the board
+        if best is None or image < best[0]:
+            best = (image, forward, inverse)
+    return best
+
+
+class Position:
+    """A game position as seen by the cache: its key, and how its moves map to the stored ones."""
+    __slots__ = ("key", "board_size", "_forward", "_inverse")
+
+    def __init__(self, board, to_move, difficulty, budget=()):
+        image, self._forward, self._inverse = canonical_position(board)
+        self.board_size = len(board)
+        self.key = (image, to_move, difficulty, tuple(budget))
+
+    def to_canonical(self, move):
+        index = self._forward[move[0] * self.board_size + move[1]]
+        return divmod(index, self.board_size)
+
+    def from_canonical(self, move):
+        return divmod(self._inverse[move[0] * self.board_size + move[1]], self.board_size)
+
+
+class MoveCache:
+    """LRU cache of AI move choices, safe to use from several threads."""
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.memory_bytes = 0 # Approximate size of the keys and values held
+        self._entries = OrderedDict() # key -> tuple of equally good moves, in canonical coordinates
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, position):
+        """One of the moves cached for position, picked at random, or None."""
+        with self._lock:
+            choices = self._entries.get(position.key)
+            if choices is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(position.key)
+            self.hits += 1
+        return position.from_canonical(random.choice(choices))
+
+    def put(self, position, moves):
+        """Caches the equally good moves the AI chose from in position."""
+        choices = tuple(sorted(position.to_canonical(move) for move in moves))
+        if not choices:
+            return
+        with self._lock:
+            previous = self._entries.pop(position.key, None)
+            if previous is not None:
+                self.memory_bytes -= _entry_bytes(position.key, previous)
+            self._entries[position.key] = choices
+            self.memory_bytes += _entry_bytes(position.key, choices)
+            while len(self._entries) > self.max_entries:
+                key, evicted = self._entries.popitem(last=False)
+                self.memory_bytes -= _entry_bytes(key, evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory_bytes = 0
+
+
+def _entry_bytes(key, choices):
+    return (sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) +
+            sys.getsizeof(choices) + len(choices) * sys.getsizeof((0, 0)))
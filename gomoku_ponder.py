@@ -0,0 +1,116 @@
+"""Pondering: searching the AI's replies while the human is still thinking.
+
+After the AI moves, start() hands a copy of the game to a background thread, which picks
+the human's likeliest replies (the best moves of a shallow analysis) and makes the AI's
+move after each of them, within time_budget seconds per game. When the human then plays
+one of those replies, take() returns the AI's answer and the request needs no search.
+
+Pondering only uses otherwise idle time: it stops as soon as busy() returns True (in the
+web app, whenever an AI request is running or waiting for a slot), when the same game is
+pondered again, and when cancel() is called for it. Results live in this process only.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import gomoku_codec
+from gomoku import SearchBudgetExceeded
+
+
+class Ponderer:
+    """Ponders the games passed to start(), one at a time, on a single background thread."""
+    def __init__(self, time_budget=5.0, replies=3, busy=None, max_games=1000):
+        self.time_budget = time_budget # Seconds of searching per pondered position
+        self.replies = replies # Human replies searched per position
+        self.busy = busy or (lambda: False)
+        self.max_games = max_games
+        self.hits = 0 # Moves answered from a pondered result
+        self.misses = 0 # Moves of pondered games that had to be searched
+        self.cancelled = 0 # Ponders stopped before searching every reply
+        self._lock = threading.Lock()
+        self._tokens = {} # game id -> token of its latest start(); older ponders of the game stop
+        self._results = OrderedDict() # game id -> {moves after the reply: AI move}, least recently pondered first
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gomoku-ponder")
+
+    def start(self, game_id, game, make_ai_move):
+        """Ponders the position of game (with the human to move), answering with make_ai_move(game)."""
+        snapshot = _copy_game(game)
+        token = object()
+        with self._lock:
+            self._tokens[game_id] = token
+            self._results.pop(game_id, None)
+        return self._executor.submit(self._ponder, game_id, token, snapshot, make_ai_move)
+
+    def take(self, game_id, moves):
+        """The AI move pondered for the game after moves (human reply included), or None."""
+        with self._lock:
+            results = self._results.get(game_id)
+            if results is None:
+                return None
+            move = results.get(tuple(moves))
+            if move is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return move
+
+    def cancel(self, game_id):
+        """Stops pondering the game and forgets its results (the game was reset or replaced)."""
+        with self._lock:
+            self._tokens.pop(game_id, None)
+            self._results.pop(game_id, None)
+
+    def wait_idle(self):
+        """Blocks until every position started so far has been pondered (or given up on)."""
+        self._executor.submit(lambda: None).result() # Runs after them on the single thread
+
+    def close(self):
+        with self._lock:
+            self._tokens.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _ponder(self, game_id, token, game, make_ai_move):
+        deadline = time.monotonic() + self.time_budget
+
+        def should_stop():
+            return self._tokens.get(game_id) is not token or time.monotonic() > deadline or self.busy()
+
+        try:
+            if should_stop():
+                raise SearchBudgetExceeded()
+            game.should_stop = should_stop
+            replies = [move for move, _, _ in game.analyze(k=self.replies, depth=1).lines]
+            for reply in replies:
+                position = _copy_game(game)
+                position.make_move(*reply)
+                if position.check_win() or position.check_draw():
+                    continue
+                position.switch_player()
+                position.should_stop = should_stop
+                if make_ai_move(position):
+                    self._store(game_id, token, position.moves)
+        except SearchBudgetExceeded:
+            with self._lock:
+                self.cancelled += 1
+        finally:
+            with self._lock:
+                if self._tokens.get(game_id) is token:
+                    del self._tokens[game_id]
+
+    def _store(self, game_id, token, moves):
+        with self._lock:
+            if self._tokens.get(game_id) is not token:
+                return # Cancelled or pondered again in the meantime
+            self._results.setdefault(game_id, {})[tuple(moves[:-1])] = moves[-1]
+            self._results.move_to_end(game_id)
+            while len(self._results) > self.max_games:
+                self._results.popitem(last=False)
+
+
+def _copy_game(game):
+    """A separate GomokuGame in the same state, with the same search settings."""
+    copy = gomoku_codec.game_from_bytes(gomoku_codec.game_to_bytes(game))
+    copy.SEARCH_DEPTH = game.SEARCH_DEPTH
+    copy.SOLVER_NODES = game.SOLVER_NODES
+    return copy
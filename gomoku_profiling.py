@@ -0,0 +1,144 @@
+"""On-demand cProfile profiling of individual web requests.
+
+A profiled request gets a RequestProfile in the current_profile context variable.
+asyncio.to_thread copies the context into the worker thread, so code running there
+(the AI search, analysis, solving) wraps itself in profile_thread() and is profiled
+in its own thread; cProfile only sees the thread that enabled it. Per-thread results
+are merged into one pstats.Stats when the request finishes.
+
+Only worker threads are profiled. A profiler on the event loop thread would also
+time every other request the loop serves meanwhile, and two profiled requests
+would switch each other's profilers on and off. Bodies of streaming responses are
+produced after the profile is recorded and are not in it.
+"""
+import contextvars
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls", "time")
+
+current_profile = contextvars.ContextVar("gomoku_current_profile", default=None)
+
+
+class RequestProfile:
+    """Profiles collected for one request, possibly from several threads."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profilers = []
+
+    @contextmanager
+    def profile(self):
+        """Profiles the calling thread for the duration of the with block."""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError: # Another profiler is active in this interpreter (Python 3.12+)
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._profilers.append(profiler)
+
+    def stats(self):
+        """Merges everything collected so far; None if nothing was profiled."""
+        with self._lock:
+            profilers = list(self._profilers)
+        if not profilers:
+            return None
+        return pstats.Stats(*profilers)
+
+
+def profile_thread():
+    """Context manager profiling the calling thread if the current request is being profiled."""
+    profile = current_profile.get()
+    return profile.profile() if profile is not None else nullcontext()
+
+
+def call_profiled(function, *args, **kwargs):
+    """Calls function inside profile_thread(); for handing to asyncio.to_thread."""
+    with profile_thread():
+        return function(*args, **kwargs)
+
+
+class ProfileRecord:
+    def __init__(self, profile_id, method, path, status, started, duration, stats):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.status = status
+        self.started = started
+        self.duration = duration
+        self.stats = stats
+
+    def as_dict(self):
+        return {
+            "profileId": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started": self.started,
+            "duration": self.duration,
+            "totalCalls": self.stats.total_calls if self.stats is not None else 0,
+        }
+
+    def pstats_bytes(self):
+        """The profile in the binary format written by pstats.Stats.dump_stats."""
+        return marshal.dumps(self.stats.stats if self.stats is not None else {})
+
+    def text(self, sort="cumulative", limit=40):
+        """A pstats text summary, sorted by sort and limited to limit functions."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort!r}")
+        out = io.StringIO()
+        if self.stats is None:
+            return "No profile data collected.\n"
+        stats = pstats.Stats(stream=out) # A copy, so concurrent downloads can sort independently
+        stats.add(self.stats)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class ProfileBuffer:
+    """Keeps the last capacity profiles."""
+    def __init__(self, capacity=20):
+        self._records = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, method, path, status, started, duration, stats):
+        with self._lock:
+            record = ProfileRecord(next(self._ids), method, path, status, started, duration, stats)
+            self._records.append(record)
+        return record
+
+    def get(self, profile_id):
+        with self._lock:
+            for record in self._records:
+                if record.profile_id == profile_id:
+                    return record
+        return None
+
+    def list(self):
+        """Records, newest first."""
+        with self._lock:
+            return list(reversed(self._records))
+
+
+@contextmanager
+def profiling_request():
+    """Makes profile_thread() in threads started inside (with a copied context) profile into a new RequestProfile."""
+    profile = RequestProfile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
@@ -0,0 +1,339 @@
+"""Compact game records: a binary file format for storage and a text format for people.
+
+Binary files start with the 8-byte header b"GMKR" + format version (1) + 3 reserved
+bytes, followed by records, each:
+
+  payload length  u32   bytes of tags + moves
+  board size      u8
+  result          u8    0 unknown/unfinished, 1 X won, 2 O won, 3 draw
+  tags length     u16
+  move count      u32
+  tags                  UTF-8 "key=value" lines joined by "\\n" (optional metadata)
+  moves                 gomoku_codec.pack_moves: one byte per move up to 16x16, varints beyond
+
+All integers are little endian. Files are append-only: a record torn by a crash can
+only be at the end, and readers stop before it.
+
+The text format is PGN-like: [Key "value"] tag lines (Size and Result first), then the
+moves as column letter + row number ("h8", with columns a..z, aa..), and a blank line
+between games.
+
+Usage:
+  python gomoku_records.py text GAMES.bin [--limit N]        # binary -> text on stdout
+  python gomoku_records.py pack GAMES.txt GAMES.bin          # text -> binary (appends)
+"""
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+
+import gomoku_codec
+
+MAGIC = b"GMKR"
+FORMAT_VERSION = 1
+FILE_HEADER = MAGIC + bytes([FORMAT_VERSION, 0, 0, 0])
+_RECORD_HEADER = struct.Struct("<IBBHI")
+
+RESULTS = (None, 'X', 'O', "draw")
+MAX_BOARD_SIZE = 255 # The header stores the size in one byte
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+class RecordFormatError(ValueError):
+    """Raised for data that is not a valid game record file or text."""
+
+
+class GameRecord:
+    """One game: board size, moves as (row, col) in play order, result ('X', 'O', 'draw' or None) and tags."""
+    __slots__ = ("board_size", "moves", "result", "tags")
+
+    def __init__(self, board_size, moves, result=None, tags=None):
+        if result not in RESULTS:
+            raise ValueError(f"Invalid result {result!r}")
+        self.board_size = board_size
+        self.moves = list(moves)
+        self.result = result
+        self.tags = dict(tags or {})
+
+    def __eq__(self, other):
+        return isinstance(other, GameRecord) and (self.board_size, self.moves, self.result, self.tags) == \
+            (other.board_size, other.moves, other.result, other.tags)
+
+    def __repr__(self):
+        return f"GameRecord(board_size={self.board_size}, moves={len(self.moves)}, result={self.result!r}, tags={self.tags!r})"
+
+    def to_bytes(self):
+        if not isinstance(self.board_size, int) or not 1 <= self.board_size <= MAX_BOARD_SIZE:
+            raise ValueError(f"Board size {self.board_size!r} cannot be stored (1 to {MAX_BOARD_SIZE})")
+        for row, col in self.moves:
+            if not (0 <= row < self.board_size and 0 <= col < self.board_size):
+                raise ValueError(f"Move ({row}, {col}) is off the {self.board_size}x{self.board_size} board")
+        for key, value in self.tags.items():
+            if not key or "=" in key or "\n" in key or "\n" in str(value):
+                raise ValueError(f"Tag {key!r} cannot be stored")
+        tags = "\n".join(f"{key}={value}" for key, value in self.tags.items()).encode("utf-8")
+        moves = gomoku_codec.pack_moves(self.moves, self.board_size)
+        return _RECORD_HEADER.pack(len(tags) + len(moves), self.board_size, RESULTS.index(self.result),
+                                   len(tags), len(self.moves)) + tags + moves
+
+    @classmethod
+    def from_buffer(cls, data, offset=0):
+        """Decodes the record at offset. Returns (record, offset after it), or (None, offset) if it is incomplete."""
+        if offset + _RECORD_HEADER.size > len(data):
+            return None, offset
+        payload_length, board_size, result, tags_length, move_count = _RECORD_HEADER.unpack_from(data, offset)
+        start = offset + _RECORD_HEADER.size
+        end = start + payload_length
+        if end > len(data):
+            return None, offset
+        if result >= len(RESULTS) or tags_length > payload_length or board_size == 0:
+            raise RecordFormatError(f"Corrupt record at offset {offset}")
+        tags = {}
+        try:
+            if tags_length:
+                for line in bytes(data[start:start + tags_length]).decode("utf-8").split("\n"):
+                    key, _, value = line.partition("=")
+                    tags[key] = value
+            moves = gomoku_codec.unpack_moves(bytes(data[start + tags_length:end]), board_size)
+        except ValueError as e: # Undecodable tags or a truncated varint
+            raise RecordFormatError(f"Corrupt record at offset {offset}: {e}") from None
+        if any(row >= board_size for row, _ in moves):
+            raise RecordFormatError(f"Record at offset {offset} has moves off its {board_size}x{board_size} board")
+        if len(moves) != move_count:
+            raise RecordFormatError(f"Record at offset {offset} should have {move_count} moves, has {len(moves)}")
+        return cls(board_size, moves, RESULTS[result], tags), end
+
+
+class RecordWriter:
+    """Appends records to a binary file through a write buffer.
+
+    Use as a context manager or call close(); flush() pushes buffered records to the OS
+    and sync() also makes them durable.
+    """
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self._file = open(path, "ab", buffering=buffer_size)
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER)
+        self.offset = self._file.tell() # Where the next record goes; also the committed length after sync()
+
+    def write(self, record):
+        """Appends record; returns the offset it was written at."""
+        offset = self.offset
+        data = record.to_bytes()
+        self._file.write(data)
+        self.offset += len(data)
+        return offset
+
+    def flush(self):
+        self._file.flush()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordReader:
+    """Iterates the records of a binary file through a memory map, one record at a time.
+
+    Only the pages holding the records being decoded are read, so files far larger than
+    memory can be streamed. length limits reading to the first length bytes (e.g. the
+    committed length kept by an index).
+    """
+    def __init__(self, path, length=None):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.length = size if length is None else min(length, size)
+        if self.length == 0:
+            self._map = b""
+        else:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if 0 < self.length < len(FILE_HEADER):
+                raise RecordFormatError(f"{path} is shorter than the file header")
+            if self.length and self._map[:len(MAGIC)] != MAGIC:
+                raise RecordFormatError(f"{path} is not a game record file")
+            if self.length and self._map[len(MAGIC)] != FORMAT_VERSION:
+                raise RecordFormatError(f"{path} has unsupported format version {self._map[len(MAGIC)]}")
+        except RecordFormatError:
+            self.close()
+            raise
+
+    def iter_with_offsets(self):
+        """Yields (offset, record); stops quietly at a torn record at the end."""
+        data = memoryview(self._map)[:self.length] if self.length else b""
+        offset = len(FILE_HEADER)
+        try:
+            while True:
+                record, end = GameRecord.from_buffer(data, offset)
+                if record is None:
+                    return
+                yield offset, record
+                offset = end
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
+
+    def __iter__(self):
+        for _, record in self.iter_with_offsets():
+            yield record
+
+    def read_at(self, offset):
+        """The record starting at offset (as returned by RecordWriter.write)."""
+        record, _ = GameRecord.from_buffer(self._map[:self.length], offset)
+        if record is None:
+            raise RecordFormatError(f"No complete record at offset {offset}")
+        return record
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(path, length=None):
+    """Yields every record of a binary file."""
+    with RecordReader(path, length) as reader:
+        yield from reader
+
+
+# Text format
+
+def column_name(col):
+    """0 -> "a", 25 -> "z", 26 -> "aa"."""
+    name = ""
+    col += 1
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        name = chr(ord('a') + remainder) + name
+    return name
+
+
+def column_index(name):
+    col = 0
+    for ch in name:
+        col = col * 26 + ord(ch) - ord('a') + 1
+    return col - 1
+
+
+_MOVE_TEXT = re.compile(r"^([a-z]+)([0-9]+)$")
+_TAG_TEXT = re.compile(r'^\[(\w+) "((?:[^"\\]|\\.)*)"\]$')
+
+
+def format_text(record):
+    """The record in the text format (ending with a newline)."""
+    tags = {"Size": str(record.board_size), "Result": record.result or "*"}
+    tags.update(record.tags)
+    lines = [f'[{key} "{_escape(value)}"]' for key, value in tags.items()]
+    moves = [f"{column_name(col)}{row + 1}" for row, col in record.moves]
+    for start in range(0, len(moves), 20):
+        lines.append(" ".join(moves[start:start + 20]))
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def parse_text(text):
+    """Parses games in the text format; returns a list of GameRecords."""
+    return list(iter_text(text.splitlines()))
+
+
+def iter_text(lines):
+    """Yields GameRecords from lines of the text format (e.g. an open file)."""
+    tags, moves = {}, []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            if tags or moves:
+                yield _record_from_text(tags, moves, number)
+                tags, moves = {}, []
+            continue
+        if line.startswith("["):
+            if moves: # Tags after moves start the next game even without a blank line
+                yield _record_from_text(tags, moves, number)
+                tags, moves = {}, []
+            match = _TAG_TEXT.match(line)
+            if match is None:
+                raise RecordFormatError(f"Line {number}: malformed tag {line!r}")
+            tags[match.group(1)] = re.sub(r"\\(.)", r"\1", match.group(2))
+            continue
+        for token in line.split():
+            match = _MOVE_TEXT.match(token)
+            if match is None:
+                raise RecordFormatError(f"Line {number}: malformed move {token!r}")
+            moves.append((int(match.group(2)) - 1, column_index(match.group(1))))
+    if tags or moves:
+        yield _record_from_text(tags, moves, None)
+
+
+def _record_from_text(tags, moves, number):
+    where = f"Game ending at line {number}" if number else "Last game"
+    try:
+        board_size = int(tags.pop("Size"))
+    except (KeyError, ValueError):
+        raise RecordFormatError(f"{where}: missing or invalid Size tag") from None
+    result = tags.pop("Result", "*")
+    if result not in ('X', 'O', "draw", "*"):
+        raise RecordFormatError(f"{where}: invalid Result {result!r}")
+    for row, col in moves:
+        if not (0 <= row < board_size and 0 <= col < board_size):
+            raise RecordFormatError(f"{where}: move {column_name(col)}{row + 1} is off the board")
+    return GameRecord(board_size, moves, None if result == "*" else result, tags)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    text = commands.add_parser("text", help="Print a binary record file in the text format")
+    text.add_argument("source")
+    text.add_argument("--limit", type=int, help="Stop after this many games")
+    pack = commands.add_parser("pack", help="Append games in the text format to a binary record file")
+    pack.add_argument("source", help="Text file ('-' for stdin)")
+    pack.add_argument("destination")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "text":
+            for count, record in enumerate(read_records(args.source)):
+                if args.limit is not None and count >= args.limit:
+                    break
+                sys.stdout.write(("\n" if count else "") + format_text(record))
+        else:
+            source = sys.stdin if args.source == "-" else open(args.source)
+            try:
+                count = 0
+                with RecordWriter(args.destination) as writer:
+                    for record in iter_text(source):
+                        writer.write(record)
+                        count += 1
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            print(f"{count} games written to {args.destination}", file=sys.stderr)
+    except RecordFormatError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
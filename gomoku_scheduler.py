@@ -0,0 +1,172 @@
+"""Admission control for AI move requests.
+
+Every AI difficulty is a tier with its own concurrency limit and bounded wait queue.
+Requests that cannot get a slot before their queue deadline (or that find the queue
+full) are either rejected with a retry hint or moved down to a cheaper tier,
+depending on the tier's policy. Waiting requests are served round-robin across
+sessions so one client submitting a burst of moves cannot starve everybody else.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+REJECT = "reject"
+FALLBACK = "fallback"
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when an AI request cannot be admitted to any allowed tier."""
+    def __init__(self, difficulty, retry_after):
+        super().__init__(f"AI tier {difficulty!r} is overloaded, retry in {retry_after}s")
+        self.difficulty = difficulty
+        self.retry_after = retry_after
+
+
+class TierPolicy:
+    """Limits and overload behaviour for one AI difficulty."""
+    def __init__(self, max_concurrent, max_queue, queue_timeout, on_overload=REJECT, fallback=None):
+        if on_overload not in (REJECT, FALLBACK):
+            raise ValueError(f"on_overload must be {REJECT!r} or {FALLBACK!r}")
+        if on_overload == FALLBACK and fallback is None:
+            raise ValueError("A fallback tier is required when on_overload is 'fallback'")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout # Seconds a request may wait for a slot
+        self.on_overload = on_overload
+        self.fallback = fallback
+
+
+def default_tiers(cpu_count=None):
+    """Tier policies sized for the current machine."""
+    cpus = cpu_count or os.cpu_count() or 1
+    return {
+        "Hard": TierPolicy(max_concurrent=max(1, cpus // 2), max_queue=4 * cpus, queue_timeout=5.0,
+                           on_overload=FALLBACK, fallback="Medium"),
+        "Medium": TierPolicy(max_concurrent=cpus, max_queue=16 * cpus, queue_timeout=2.0,
+                             on_overload=FALLBACK, fallback="Easy"),
+        "Easy": TierPolicy(max_concurrent=2 * cpus, max_queue=64 * cpus, queue_timeout=1.0),
+        # Positions of /api/analyze_batch, each holding a slot while a pool process analyses it;
+        # they wait behind the rest of their own batch, hence the long queue timeout
+        "Batch": TierPolicy(max_concurrent=max(1, cpus // 2), max_queue=4 * cpus, queue_timeout=30.0),
+    }
+
+
+class _Tier:
+    def __init__(self, name, policy):
+        self.name = name
+        self.policy = policy
+        self.active = 0
+        self.queued = 0
+        self.waiting = OrderedDict() # session -> deque of futures; order is the round-robin order
+        self.avg_service_time = 0.0 # Exponentially weighted, seconds
+
+    def retry_after(self):
+        """Rough number of seconds until a new request would be served."""
+        backlog = (self.queued + 1) / max(1, self.policy.max_concurrent)
+        return max(1, math.ceil(self.avg_service_time * backlog))
+
+
+class AIScheduler:
+    """Bounds the number of concurrently running AI searches per difficulty."""
+    def __init__(self, tiers=None):
+        tiers = default_tiers() if tiers is None else tiers
+        for name, policy in tiers.items():
+            if policy.on_overload == FALLBACK and policy.fallback not in tiers:
+                raise ValueError(f"Tier {name!r} falls back to unknown tier {policy.fallback!r}")
+        self._tiers = {name: _Tier(name, policy) for name, policy in tiers.items()}
+
+    def tier_names(self):
+        return list(self._tiers)
+
+    def queue_depth(self, difficulty=None):
+        """Number of requests waiting for a slot, for one tier or all of them."""
+        if difficulty is not None:
+            return self._tiers[difficulty].queued
+        return sum(tier.queued for tier in self._tiers.values())
+
+    def active(self, difficulty=None):
+        """Number of requests currently holding a slot, for one tier or all of them."""
+        if difficulty is not None:
+            return self._tiers[difficulty].active
+        return sum(tier.active for tier in self._tiers.values())
+
+    @asynccontextmanager
+    async def admit(self, difficulty, session):
+        """Holds an AI slot for the duration of the block.
+
+        Yields the difficulty that was actually granted, which differs from the requested
+        one when the requested tier was overloaded and its policy is to fall back.
+        Raises SchedulerOverloaded when no tier on the fallback chain can take the request.
+        """
+        if difficulty not in self._tiers: # Unscheduled difficulties run without limits
+            yield difficulty
+            return
+        tier = await self._acquire_any(self._tiers[difficulty], session)
+        started = time.monotonic()
+        try:
+            yield tier.name
+        finally:
+            elapsed = time.monotonic() - started
+            tier.avg_service_time = elapsed if tier.avg_service_time == 0 else 0.8 * tier.avg_service_time + 0.2 * elapsed
+            self._release(tier)
+
+    async def _acquire_any(self, tier, session):
+        visited = set()
+        while True:
+            visited.add(tier.name)
+            if await self._acquire(tier, session):
+                return tier
+            policy = tier.policy
+            if policy.on_overload == REJECT or policy.fallback in visited:
+                raise SchedulerOverloaded(tier.name, tier.retry_after())
+            tier = self._tiers[policy.fallback]
+
+    async def _acquire(self, tier, session):
+        """Takes a slot in tier, waiting up to its queue timeout. Returns False if overloaded."""
+        policy = tier.policy
+        if tier.active < policy.max_concurrent and tier.queued == 0:
+            tier.active += 1
+            return True
+        if tier.queued >= policy.max_queue:
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        tier.waiting.setdefault(session, deque()).append(future)
+        tier.queued += 1
+        try:
+            await asyncio.wait_for(future, policy.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._forget(tier, session, future)
+            return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled(): # Granted just as we were cancelled
+                self._release(tier)
+            else:
+                self._forget(tier, session, future)
+            raise
+
+    def _forget(self, tier, session, future):
+        queue = tier.waiting.get(session)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            tier.queued -= 1
+            if not queue:
+                del tier.waiting[session]
+
+    def _release(self, tier):
+        tier.active -= 1
+        while tier.waiting and tier.active < tier.policy.max_concurrent:
+            session, queue = next(iter(tier.waiting.items()))
+            future = queue.popleft()
+            tier.queued -= 1
+            if queue:
+                tier.waiting.move_to_end(session) # Next grant goes to the next session in line
+            else:
+                del tier.waiting[session]
+            if not future.done():
+                tier.active += 1
+                future.set_result(True)
@@ -0,0 +1,265 @@
+"""Self-play data generator: engine vs. engine games across worker processes.
+
+Every game gets its own seed derived from the run's seed and the game's number, so a
+game plays out the same whichever worker runs it, and a run can be repeated exactly.
+Games start from a few random stones near the centre so that runs are varied.
+
+Finished games stream to the parent process, which is the only writer: they are
+appended as gomoku_records game records to shard-NNNNN.bin files, a new shard starting
+once one exceeds --shard-bytes.
+index.json lists the shards with their game counts and committed byte lengths; it is
+rewritten (atomically) every --index-every games and whenever a shard is closed.
+Re-running with the same output directory resumes: shard bytes beyond the index are
+discarded and only games missing from the shards are played.
+
+Each record carries the game number, seed and both engines as its "game", "seed",
+"black" and "white" tags; a game stopped by the move limit has no result.
+
+Usage:
+  python gomoku_selfplay.py OUT_DIR [--games 1000] [--workers N] [--black normal] [--white normal]
+                            [--board-size 15] [--hard-depth 2] [--opening-stones 2] [--seed 1]
+                            [--shard-bytes 67108864]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from gomoku import GomokuGame
+from gomoku_records import GameRecord, RecordReader, RecordWriter
+
+ENGINES = ("easy", "normal", "hard")
+_ENGINE_MOVES = {
+    "easy": GomokuGame.make_ai_move_easy,
+    "normal": GomokuGame.make_ai_move_normal,
+    "hard": GomokuGame.make_ai_move_hard,
+}
+RESULT_DRAW, RESULT_X, RESULT_O, RESULT_UNFINISHED = 0, 1, 2, 3
+_RECORD_RESULTS = {RESULT_DRAW: "draw", RESULT_X: 'X', RESULT_O: 'O', RESULT_UNFINISHED: None}
+
+INDEX_FILE = "index.json"
+INDEX_FORMAT = 2 # 1 was the ad-hoc record layout used before gomoku_records
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+OPENING_SPREAD = 2 # Opening stones go at most this many cells from the centre in each direction
+
+
+def game_seed(run_seed, game_number):
+    """The seed of one game; depends only on the run's seed and the game's number."""
+    return random.Random(f"{run_seed}-{game_number}").getrandbits(32)
+
+
+def opening_range(board_size):
+    """(lowest, highest) row and column of the cells opening stones are placed in."""
+    center = board_size // 2
+    return max(0, center - OPENING_SPREAD), min(board_size - 1, center + OPENING_SPREAD)
+
+
+def play_game(task):
+    """Plays one game. task is (game_number, seed, black, white, board_size, hard_depth, opening_stones)."""
+    game_number, seed, black, white, board_size, hard_depth, opening_stones = task
+    random.seed(seed) # The engines break ties with the random module
+    game = GomokuGame(board_size=board_size)
+    game.SEARCH_DEPTH = hard_depth
+    low, high = opening_range(board_size)
+    while len(game.moves) < opening_stones:
+        row, col = random.randint(low, high), random.randint(low, high)
+        if game.make_move(row, col):
+            game.switch_player()
+
+    result = RESULT_UNFINISHED
+    max_moves = board_size * board_size
+    while len(game.moves) < max_moves:
+        engine = black if game.current_player == 'X' else white
+        if not _ENGINE_MOVES[engine](game):
+            break
+        if game.check_win():
+            result = RESULT_X if game.current_player == 'X' else RESULT_O
+            break
+        if game.check_draw():
+            result = RESULT_DRAW
+            break
+        game.switch_player()
+    return game_number, seed, board_size, result, black, white, game.moves
+
+
+def to_record(game_number, seed, board_size, result, black, white, moves):
+    """The GameRecord stored for a game tuple returned by play_game."""
+    return GameRecord(board_size, moves, _RECORD_RESULTS[result],
+                      {"game": game_number, "seed": seed, "black": black, "white": white})
+
+
+def from_record(record):
+    """Inverse of to_record."""
+    result = next(code for code, value in _RECORD_RESULTS.items() if value == record.result)
+    tags = record.tags
+    return (int(tags["game"]), int(tags["seed"]), record.board_size, result, tags["black"], tags["white"],
+            record.moves)
+
+
+def iter_games(out_dir):
+    """Yields every committed game record of a self-play directory."""
+    for shard in load_index(out_dir)["shards"]:
+        with RecordReader(os.path.join(out_dir, shard["file"]), shard["bytes"]) as reader:
+            for record in reader:
+                yield from_record(record)
+
+
+def load_index(out_dir):
+    path = os.path.join(out_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {"format": INDEX_FORMAT, "shards": []}
+    with open(path) as f:
+        index = json.load(f)
+    if index.get("format") != INDEX_FORMAT:
+        raise ValueError(f"{out_dir} uses self-play format {index.get('format')}, expected {INDEX_FORMAT}")
+    return index
+
+
+class ShardWriter:
+    """Appends records to size-rotated shards and keeps index.json in step with them."""
+    def __init__(self, out_dir, config, shard_bytes=DEFAULT_SHARD_BYTES, index_every=100):
+        self.out_dir = out_dir
+        self.shard_bytes = shard_bytes
+        self.index_every = index_every
+        os.makedirs(out_dir, exist_ok=True)
+        self.index = load_index(out_dir)
+        if self.index["shards"] and self.index.get("config", config) != config:
+            raise ValueError(f"{out_dir} holds games generated with different settings: {self.index['config']}")
+        self.index["config"] = config
+        self.completed = self._recover()
+        self._writer = None
+        self._unindexed = 0
+
+    def _recover(self):
+        """Drops bytes written after the last index update; returns the game numbers already stored."""
+        completed = set()
+        for shard in self.index["shards"]:
+            path = os.path.join(self.out_dir, shard["file"])
+            with open(path, "r+b") as f:
+                f.truncate(shard["bytes"])
+            with RecordReader(path) as reader:
+                completed.update(int(record.tags["game"]) for record in reader)
+        return completed
+
+    def write(self, record):
+        if self._writer is None or self._current()["bytes"] >= self.shard_bytes:
+            self._open_shard()
+        self._writer.write(to_record(*record))
+        shard = self._current()
+        shard["bytes"] = self._writer.offset
+        shard["games"] += 1
+        self.completed.add(record[0])
+        self._unindexed += 1
+        if self._unindexed >= self.index_every:
+            self.commit()
+
+    def _current(self):
+        return self.index["shards"][-1]
+
+    def _open_shard(self):
+        if self._writer is not None:
+            self.commit()
+            self._writer.close()
+        shards = self.index["shards"]
+        if shards and shards[-1]["bytes"] < self.shard_bytes:
+            shard = shards[-1] # Resume appending to the last shard
+        else:
+            shard = {"file": f"shard-{len(shards):05d}.bin", "games": 0, "bytes": 0}
+            shards.append(shard)
+            path = os.path.join(self.out_dir, shard["file"])
+            if os.path.exists(path): # Left by an interrupted run before it was indexed
+                os.remove(path)
+        self._writer = RecordWriter(os.path.join(self.out_dir, shard["file"]))
+        shard["bytes"] = self._writer.offset
+
+    def commit(self):
+        """Makes everything written so far durable and indexed."""
+        if self._writer is not None:
+            self._writer.sync()
+        path = os.path.join(self.out_dir, INDEX_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(path + ".tmp", path)
+        self._unindexed = 0
+
+    def close(self):
+        self.commit()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def generate(out_dir, games, workers=None, black="normal", white="normal", board_size=15, hard_depth=2,
+             opening_stones=2, seed=1, shard_bytes=DEFAULT_SHARD_BYTES, index_every=100, progress=None):
+    """Plays games until out_dir holds games 0..games-1. Returns a summary dict."""
+    low, high = opening_range(board_size)
+    if not 0 <= opening_stones <= (high - low + 1) ** 2: # More would never all be placed
+        raise ValueError(f"{opening_stones} opening stones do not fit near the centre of a {board_size}x{board_size} board")
+    workers = workers or os.cpu_count()
+    config = {"black": black, "white": white, "board_size": board_size, "hard_depth": hard_depth,
+              "opening_stones": opening_stones, "seed": seed}
+    writer = ShardWriter(out_dir, config, shard_bytes, index_every)
+    tasks = [(n, game_seed(seed, n), black, white, board_size, hard_depth, opening_stones)
+             for n in range(games) if n not in writer.completed]
+    resumed = games - len(tasks)
+    started = time.perf_counter()
+    played = 0
+    processes = min(workers, len(tasks)) if workers > 1 and len(tasks) > 1 else 1 # Playing at the same time
+    pool = multiprocessing.get_context("spawn").Pool(processes) if processes > 1 else None
+    try:
+        results = pool.imap_unordered(play_game, tasks) if pool is not None else map(play_game, tasks)
+        for record in results:
+            writer.write(record)
+            played += 1
+            if progress:
+                progress(played, len(tasks))
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.terminate()
+    elapsed = time.perf_counter() - started
+    games_per_second = played / elapsed if elapsed > 0 else 0.0
+    return {
+        "played": played,
+        "resumed": resumed,
+        "elapsed_s": elapsed,
+        "games_per_second": games_per_second,
+        "games_per_second_per_core": games_per_second / processes,
+        "workers": processes,
+        "shards": len(writer.index["shards"]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--games", type=int, default=1000, help="Total games the directory should hold")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--black", choices=ENGINES, default="normal")
+    parser.add_argument("--white", choices=ENGINES, default="normal")
+    parser.add_argument("--board-size", type=int, default=15)
+    parser.add_argument("--hard-depth", type=int, default=2, help="Search depth of the hard engine")
+    parser.add_argument("--opening-stones", type=int, default=2, help="Random stones placed before the engines play")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--shard-bytes", type=int, default=DEFAULT_SHARD_BYTES)
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"{done}/{total} games", file=sys.stderr)
+
+    try:
+        summary = generate(args.out_dir, args.games, args.workers, args.black, args.white, args.board_size,
+                           args.hard_depth, args.opening_stones, args.seed, args.shard_bytes, progress=progress)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{summary['played']} games played ({summary['resumed']} already done) in {summary['elapsed_s']:.1f} s: "
+          f"{summary['games_per_second']:.2f} games/s, {summary['games_per_second_per_core']:.2f} games/s/core")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""On-disk table of solved positions, shared by every worker process on a machine.
+
+path holds the compacted table: a header, then fixed-size entries sorted by key, which
+readers memory-map and binary-search, so looking a position up reads a few pages and
+needs no memory of its own. path + ".log" holds the entries added since the last
+compaction, in the same layout after a header of its own.
+
+Only one process writes the table and the log: the first to open the database with
+writable=True takes an exclusive lock on path + ".lock" and becomes the writer. Other
+processes opened with writable=True append their entries to a pending file of their own,
+path + ".pending.<pid>-<id>", under an exclusive lock on it; every refresh_interval seconds a
+thread of the writer moves the pending entries into the log. Once the log holds
+compact_every entries, the same thread merges it into a new table, atomically replaces
+path with it and starts a new log, so no request waits for a compaction. Readers pick up
+both on their next refresh, at most every refresh_interval seconds.
+
+Entry layout (little endian): key u64 (Zobrist hash of the stones and the side to move),
+board size u8, result u8 (for the side to move: 1 win, 2 loss, 3 draw), best move u16
+(cell index; 0xFFFF for none). Both headers hold a magic, the format version and a
+generation number that changes with every compaction, so a reader never pairs a log
+with the table it was not written for.
+"""
+import fcntl
+import glob
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+import gomoku
+
+MAGIC_TABLE = b"GMKS"
+MAGIC_LOG = b"GMKL"
+FORMAT_VERSION = 1
+_TABLE_HEADER = struct.Struct("<4sIIQ") # magic, format, generation, entry count
+_LOG_HEADER = struct.Struct("<4sII") # magic, format, generation
+_ENTRY = struct.Struct("<QBBH")
+NO_MOVE = 0xFFFF
+
+RESULTS = {"win": 1, "loss": 2, "draw": 3}
+_RESULT_NAMES = {code: name for name, code in RESULTS.items()}
+
+logger = logging.getLogger(__name__)
+
+
+def position_key(board, to_move):
+    """Key of a position: the Zobrist hash of its stones and the side to move."""
+    return gomoku.board_hash(board) ^ gomoku.zobrist_table(len(board))[1][to_move]
+
+
+class SolvedPositions:
+    """
+    The solved-position database at path. lookup() works in every process; record() in
+    those opened with writable=True, of which one is the writer (self.writer). Safe to use
+    from several threads.
+    """
+    def __init__(self, path, writable=False, compact_every=10000, refresh_interval=1.0):
+        self.path = path
+        self.log_path = path + ".log"
+        self.compact_every = compact_every
+        self.refresh_interval = refresh_interval
+        self.writable = writable
+        self.writer = False
+        self._lock = threading.Lock()
+        self._compaction_lock = threading.Lock() # Held for a whole compaction, which only briefly takes _lock
+        self._lock_file = None
+        self._log_file = None
+        self._pending_file = None # Where a process that is not the writer appends its entries
+        self._maintenance = None
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._map = None
+        self._table_stat = None
+        self._generation = None
+        self._count = 0
+        self._log = {} # (key, board size) -> (result, move) of the log entries read so far
+        self._log_offset = 0
+        self._refreshed = 0.0
+        if writable:
+            self._become_writer()
+            if not self.writer:
+                self._pending_file = open(f"{path}.pending.{os.getpid()}-{id(self):x}", "ab", buffering=0)
+        with self._lock:
+            self._refresh()
+        if self.writer:
+            self._maintenance = threading.Thread(target=self._maintain, name="solvedb-maintenance", daemon=True)
+            self._maintenance.start()
+
+    # Reading
+
+    def lookup(self, board, to_move):
+        """("win" | "loss" | "draw", best move or None) for to_move on board, or None if it is not recorded."""
+        key = position_key(board, to_move)
+        size = len(board)
+        with self._lock:
+            if not self.writer and time.monotonic() - self._refreshed >= self.refresh_interval:
+                self._refresh()
+            entry = self._log.get((key, size))
+            if entry is None:
+                entry = self._search_table(key, size)
+        if entry is None:
+            return None
+        result, move = entry
+        return _RESULT_NAMES[result], (divmod(move, size) if move != NO_MOVE else None)
+
+    def __len__(self):
+        """Entries recorded (a position in both the table and the log counts twice)."""
+        with self._lock:
+            return self._count + len(self._log)
+
+    def _search_table(self, key, size):
+        lo, hi = 0, self._count
+        target = (key, size)
+        while lo < hi: # Binary search over the memory-mapped entries
+            mid = (lo + hi) // 2
+            entry_key, entry_size, result, move = _ENTRY.unpack_from(self._map, _TABLE_HEADER.size + mid * _ENTRY.size)
+            if (entry_key, entry_size) < target:
+                lo = mid + 1
+            elif (entry_key, entry_size) > target:
+                hi = mid
+            else:
+                return result, move
+        return None
+
+    def refresh(self):
+        """Picks up entries and compactions written by the writer since the last refresh."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        self._refreshed = time.monotonic()
+        try:
+            table_stat = os.stat(self.path)
+        except FileNotFoundError:
+            return # Nothing written yet
+        if self._table_stat is None or (table_stat.st_ino, table_stat.st_mtime_ns) != self._table_stat:
+            self._open_table(table_stat)
+        self._read_log()
+
+    def _open_table(self, table_stat):
+        with open(self.path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, generation, count = _TABLE_HEADER.unpack_from(data)
+        if magic != MAGIC_TABLE or version != FORMAT_VERSION:
+            data.close()
+            raise ValueError(f"{self.path} is not a solved-position table of format {FORMAT_VERSION}")
+        if self._map is not None:
+            self._map.close()
+        self._map, self._count, self._table_stat = data, count, (table_stat.st_ino, table_stat.st_mtime_ns)
+        if generation != self._generation:
+            self._generation = generation
+            self._log, self._log_offset = {}, 0 # Entries of the old log are in the new table
+
+    def _read_log(self):
+        try:
+            with open(self.log_path, "rb") as f:
+                header = f.read(_LOG_HEADER.size)
+                if len(header) < _LOG_HEADER.size:
+                    return
+                magic, version, generation = _LOG_HEADER.unpack(header)
+                if magic != MAGIC_LOG or version != FORMAT_VERSION or generation != self._generation:
+                    return # Written for a table this process has not seen yet: wait for the next refresh
+                f.seek(max(self._log_offset, _LOG_HEADER.size))
+                data = f.read()
+        except FileNotFoundError:
+            return
+        whole = len(data) - len(data) % _ENTRY.size # A record being written is read next time
+        for offset in range(0, whole, _ENTRY.size):
+            key, size, result, move = _ENTRY.unpack_from(data, offset)
+            self._log[(key, size)] = (result, move)
+        self._log_offset = max(self._log_offset, _LOG_HEADER.size) + whole
+
+    # Writing
+
+    def _become_writer(self):
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close() # Another process is the writer
+            return
+        self._lock_file = lock_file
+        self.writer = True
+        if not os.path.exists(self.path):
+            self._write_table([], 1)
+        with open(self.path, "rb") as f:
+            generation = _TABLE_HEADER.unpack(f.read(_TABLE_HEADER.size))[2]
+        try:
+            with open(self.log_path, "r+b") as f:
+                magic, version, log_generation = _LOG_HEADER.unpack(f.read(_LOG_HEADER.size).ljust(_LOG_HEADER.size, b"\0"))
+                if (magic, version, log_generation) == (MAGIC_LOG, FORMAT_VERSION, generation):
+                    size = os.fstat(f.fileno()).st_size
+                    f.truncate(size - (size - _LOG_HEADER.size) % _ENTRY.size) # Drop a record torn by a crash
+        except FileNotFoundError:
+            log_generation = None
+        if log_generation != generation: # Missing, or left from before an interrupted compaction
+            self._write_log(generation)
+        self._log_file = open(self.log_path, "ab")
+
+    def record(self, board, to_move, result, move=None):
+        """
+        Stores a proven result ("win", "loss" or "draw") for to_move; returns False if the
+        database was opened read-only. Outside the writer, the entry is found by lookups
+        once the writer has moved it into the log.
+        """
+        if not self.writable:
+            return False
+        key = position_key(board, to_move)
+        size = len(board)
+        value = (RESULTS[result], move[0] * size + move[1] if move is not None else NO_MOVE)
+        with self._lock:
+            if self._log.get((key, size)) == value or self._search_table(key, size) == value:
+                return True
+            if self._log_file is not None:
+                self._append(key, size, value)
+            elif self._pending_file is not None:
+                fcntl.flock(self._pending_file, fcntl.LOCK_EX) # Against the writer emptying the file meanwhile
+                try:
+                    self._pending_file.write(_ENTRY.pack(key, size, *value))
+                finally:
+                    fcntl.flock(self._pending_file, fcntl.LOCK_UN)
+        return True
+
+    def _append(self, key, size, value):
+        self._log_file.write(_ENTRY.pack(key, size, *value))
+        self._log_file.flush()
+        self._log[(key, size)] = value
+        self._log_offset += _ENTRY.size
+        if len(self._log) >= self.compact_every:
+            self._wake.set()
+
+    def compact(self):
+        """Moves pending entries into the log and merges it into the table (writer only)."""
+        if not self.writer:
+            raise PermissionError(f"This process is not the writer of {self.path}")
+        self._merge_pending()
+        self._compact()
+
+    def _maintain(self):
+        """The writer's thread: moves pending entries into the log and compacts it when it is full."""
+        while not self._closed.is_set():
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            if self._closed.is_set():
+                return
+            try:
+                self._merge_pending()
+                with self._lock:
+                    full = len(self._log) >= self.compact_every
+                if full:
+                    self._compact()
+            except Exception:
+                logger.exception("Maintenance of the solved-position database %s failed", self.path)
+
+    def _merge_pending(self):
+        for name in glob.glob(glob.escape(self.path) + ".pending.*"):
+            try:
+                pending = open(name, "r+b")
+            except FileNotFoundError:
+                continue # Removed by its process as it closed
+            with pending:
+                fcntl.flock(pending, fcntl.LOCK_EX) # Released when the file is closed
+                data = pending.read()
+                whole = len(data) - len(data) % _ENTRY.size # A torn entry can only be left by a crash
+                with self._lock:
+                    if self._log_file is None:
+                        return # Closed meanwhile
+                    for offset in range(0, whole, _ENTRY.size):
+                        key, size, result, move = _ENTRY.unpack_from(data, offset)
+                        if self._log.get((key, size)) != (result, move):
+                            self._append(key, size, (result, move))
+                pending.truncate(0)
+                if not _process_alive(name.rpartition(".")[2].partition("-")[0]):
+                    os.unlink(name) # Left by a process that crashed
+
+    def _compact(self):
+        with self._compaction_lock:
+            with self._lock:
+                if self._log_file is None:
+                    return # Closed meanwhile
+                snapshot = dict(self._log)
+                generation = self._generation + 1
+            # The table is rewritten without _lock, so lookups and record() go on meanwhile; the
+            # map stays valid since only this method replaces the table
+            self._write_table(self._merge(snapshot), generation)
+            with self._lock:
+                late = [key + value for key, value in self._log.items() if snapshot.get(key) != value]
+                self._log_file.close()
+                self._write_log(generation, late)
+                self._log_file = open(self.log_path, "ab")
+                self._refresh()
+
+    def _merge(self, log):
+        """The entries of the table with those of log, sorted by key; log's win over the table's."""
+        log = sorted(log.items())
+        merged = []
+        index = 0
+        for position in range(self._count):
+            entry = _ENTRY.unpack_from(self._map, _TABLE_HEADER.size + position * _ENTRY.size)
+            while index < len(log) and log[index][0] < entry[:2]:
+                merged.append(log[index][0] + log[index][1])
+                index += 1
+            if index < len(log) and log[index][0] == entry[:2]:
+                continue # Superseded by the log's entry, added next
+            merged.append(entry)
+        merged.extend(key + value for key, value in log[index:])
+        return merged
+
+    def _write_table(self, entries, generation):
+        with open(self.path + ".tmp", "wb") as f:
+            f.write(_TABLE_HEADER.pack(MAGIC_TABLE, FORMAT_VERSION, generation, len(entries)))
+            for entry in entries:
+                f.write(_ENTRY.pack(*entry))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + ".tmp", self.path)
+
+    def _write_log(self, generation, entries=()):
+        with open(self.log_path + ".tmp", "wb") as f:
+            f.write(_LOG_HEADER.pack(MAGIC_LOG, FORMAT_VERSION, generation))
+            for entry in entries:
+                f.write(_ENTRY.pack(*entry))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.log_path + ".tmp", self.log_path)
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        if self._maintenance is not None:
+            self._maintenance.join()
+            self._maintenance = None
+        with self._compaction_lock, self._lock:
+            if self._pending_file is not None:
+                fcntl.flock(self._pending_file, fcntl.LOCK_EX)
+                if os.fstat(self._pending_file.fileno()).st_size == 0:
+                    os.unlink(self._pending_file.name) # Otherwise the writer merges and removes it
+                self._pending_file.close()
+                self._pending_file = None
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+            if self._lock_file is not None:
+                self._lock_file.close() # Releases the writer lock
+                self._lock_file = None
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+                self._count = 0
+            self.writable = self.writer = False
+
+
+def _process_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        return True # Not a pid of ours to judge, or alive under another user
+    return True
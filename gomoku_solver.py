@@ -0,0 +1,480 @@
+"""Proof-number search for forced wins by continuous threats.
+
+The attacker may only play threats: fours (a move after which one more stone makes five)
+and, unless vcf_only, open threes (a move after which one more stone makes an open four).
+The defender's replies are exactly the moves that can stop the threat: blocking the five,
+or a cell that leaves no open four on any threatened line, or a four of their own. Within
+those rules a proof is a real forced win; a position whose threats all fail is only
+"not winnable by threats", so the answers are "win", "loss" or "unknown".
+
+Nodes are expanded best-first by proof and disproof numbers. Solved positions are kept in
+a table keyed by Zobrist hash (with the side to move and the attacker), and solved
+subtrees are freed at once, so the tree in memory only holds the unsolved frontier; a
+search that needs more than max_nodes of it gives up with "unknown".
+"""
+import functools
+import time
+
+import gomoku
+from gomoku import SearchBudgetExceeded
+
+WIN, LOSS, UNKNOWN = "win", "loss", "unknown"
+INF = float('inf')
+_NO_THREATS = ((), (), (), ())
+
+
+def _five_points(s, p):
+    """Empty positions of line s where p would complete five (or more) in a row."""
+    points = set()
+    for w in range(len(s) - 4):
+        window = s[w:w + 5]
+        if window.count(p) == 4 and ' ' in window:
+            points.add(w + window.index(' '))
+    return points
+
+
+def _open_four_cells(s, p):
+    """Empty positions of line s where p would get two or more five points (an open four)."""
+    cells = []
+    for i in _window_cells(s, p, 3):
+        if len(_five_points(s[:i] + p + s[i + 1:], p)) >= 2:
+            cells.append(i)
+    return cells
+
+
+def _window_cells(s, p, stones):
+    """Empty positions in five-cell windows of s holding exactly stones of p and nothing of the opponent."""
+    cells = set()
+    for w in range(len(s) - 4):
+        window = s[w:w + 5]
+        if window.count(p) == stones and window.count(' ') == 5 - stones:
+            cells.update(w + i for i, ch in enumerate(window) if ch == ' ')
+    return sorted(cells)
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def _line_threats(s, p):
+    """(five points, four moves, open four moves, open three moves) of p on line s, as positions."""
+    if s.count(p) < 2:
+        return _NO_THREATS
+    fours = _window_cells(s, p, 3)
+    open_fours = [i for i in fours if len(_five_points(s[:i] + p + s[i + 1:], p)) >= 2]
+    threes = [i for i in _window_cells(s, p, 2) if i not in fours and _open_four_cells(s[:i] + p + s[i + 1:], p)]
+    return tuple(sorted(_five_points(s, p))), tuple(fours), tuple(open_fours), tuple(threes)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _line_defences(s, p):
+    """Empty positions of line s where the opponent's stone leaves p no open four on the line."""
+    q = 'O' if p == 'X' else 'X'
+    return tuple(k for k, ch in enumerate(s) if ch == ' ' and not _open_four_cells(s[:k] + q + s[k + 1:], p))
+
+
+class _Threats:
+    __slots__ = ("fives", "fours", "open_fours", "threes", "lines")
+
+    def __init__(self):
+        self.fives, self.fours, self.open_fours, self.threes = set(), set(), set(), set()
+        self.lines = [] # Ids of lines where an open four can be made
+
+
+class _Node:
+    __slots__ = ("move", "pn", "dn", "children")
+
+    def __init__(self, move):
+        self.move = move # Cell index of the move leading here
+        self.pn = 1 # Proof number: leaves that still need proving for the attacker to win
+        self.dn = 1 # Disproof number
+        self.children = None
+
+
+class Solution:
+    """Result of ThreatSolver.solve, for the player to move."""
+    def __init__(self, result, move, pv, nodes, elapsed, complete):
+        self.result = result # WIN, LOSS or UNKNOWN
+        self.move = move # Winning move, or a move the solver could not refute; None if there is none
+        self.pv = pv # For a win, one line of the proof starting with move
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.complete = complete # False if the budget ran out before the answer was definite
+
+    def as_dict(self):
+        return {
+            "result": self.result,
+            "move": {"row": self.move[0], "col": self.move[1]} if self.move is not None else None,
+            "pv": [list(move) for move in self.pv],
+            "nodes": self.nodes,
+            "elapsed": self.elapsed,
+            "complete": self.complete,
+        }
+
+
+class ThreatSolver:
+    """
+    Proves or disproves forced wins on a GomokuGame board. Keeps its table of solved
+    positions between calls, so it can be reused for positions of the same game.
+    """
+    def __init__(self, max_nodes=200000, table_entries=1000000, vcf_only=False):
+        self.max_nodes = max_nodes # Unsolved nodes held in memory at most
+        self.table_entries = table_entries
+        self.vcf_only = vcf_only # Attack with fours only (victory by continuous fours)
+        self._table = {} # Key -> (attacker wins, winning move or None)
+        self.nodes = 0 # Nodes expanded by the last call
+
+    # Public entry points
+
+    def solve(self, board, to_move, node_budget=None, time_budget=None):
+        """
+        Solves the position for to_move: WIN if they can force five by threats, LOSS if
+        the opponent can and no move stops it, else UNKNOWN.
+        """
+        started = time.perf_counter()
+        self._begin(board, node_budget, time_budget)
+        opponent = 'O' if to_move == 'X' else 'X'
+        result, move, complete = UNKNOWN, None, True
+        try:
+            if self._prove(to_move):
+                result, move = WIN, self._table[self._key(to_move, to_move)][1]
+            elif self._prove(opponent):
+                candidates = self._defence_candidates(to_move, opponent)
+                refuted = {cell for cell in candidates if self._refutes(cell, to_move, opponent)}
+                defences = [cell for cell in candidates if cell not in refuted]
+                if not defences:
+                    # Moves away from the attack should lose to it too, but that has to be shown
+                    rest = [i for i, cell in enumerate(self._board) if cell == ' ' and i not in refuted]
+                    defences = [cell for cell in rest if not self._refutes(cell, to_move, opponent)]
+                if defences:
+                    move = defences[0]
+                else:
+                    result = LOSS
+        except SearchBudgetExceeded:
+            complete = False
+        pv = self._principal_variation(to_move) if result == WIN else []
+        if move is not None:
+            move = divmod(move, self._size)
+        return Solution(result, move, pv, self.nodes, time.perf_counter() - started, complete)
+
+    def find_win(self, board, to_move, node_budget=None, time_budget=None):
+        """The first move of a forced win for to_move, or None if none was proven within the budget."""
+        self._begin(board, node_budget, time_budget)
+        try:
+            if self._prove(to_move):
+                return divmod(self._table[self._key(to_move, to_move)][1], self._size)
+        except SearchBudgetExceeded:
+            pass
+        return None
+
+    def defences(self, board, to_move, node_budget=None, time_budget=None):
+        """
+        None unless the opponent is proven to have a forced win if to_move passes. Otherwise
+        the moves near the attack (or counter-threats) that are not proven to lose: an empty
+        list means every such move loses. Moves not examined for lack of budget are included.
+        """
+        self._begin(board, node_budget, time_budget)
+        opponent = 'O' if to_move == 'X' else 'X'
+        try:
+            if not self._prove(opponent):
+                return None
+        except SearchBudgetExceeded:
+            return None
+        candidates = self._defence_candidates(to_move, opponent)
+        surviving = []
+        for index, cell in enumerate(candidates):
+            try:
+                if not self._refutes(cell, to_move, opponent):
+                    surviving.append(cell)
+            except SearchBudgetExceeded:
+                surviving.extend(candidates[index:])
+                break
+        return [divmod(cell, self._size) for cell in surviving]
+
+    def clear(self):
+        self._table.clear()
+
+    # Board state
+
+    def _begin(self, board, node_budget, time_budget):
+        size = len(board)
+        if getattr(self, "_size", None) != size:
+            self._size = size
+            self._line_cells = _lines(size)
+            self._cell_lines = [[] for _ in range(size * size)]
+            for line_id, cells in enumerate(self._line_cells):
+                for position, cell in enumerate(cells):
+                    self._cell_lines[cell].append((line_id, position))
+            self._keys = gomoku.zobrist_table(size)
+        self._board = [cell for row in board for cell in row]
+        self._lines = ["".join(self._board[cell] for cell in cells) for cells in self._line_cells]
+        self._hash = gomoku.board_hash(board)
+        self.nodes = 0
+        self._node_budget = node_budget
+        self._deadline = time.perf_counter() + time_budget if time_budget is not None else None
+
+    def _place(self, cell, symbol):
+        self._set(cell, symbol)
+        self._hash ^= self._keys[0][cell][symbol]
+
+    def _remove(self, cell, symbol):
+        self._set(cell, ' ')
+        self._hash ^= self._keys[0][cell][symbol]
+
+    def _set(self, cell, symbol):
+        self._board[cell] = symbol
+        lines = self._lines
+        for line_id, position in self._cell_lines[cell]:
+            s = lines[line_id]
+            lines[line_id] = s[:position] + symbol + s[position + 1:]
+
+    def _key(self, to_move, attacker):
+        _, to_move_keys, perspective_keys = self._keys
+        return self._hash ^ to_move_keys[to_move] ^ perspective_keys[attacker]
+
+    def _threats(self, p):
+        threats = _Threats()
+        for line_id, s in enumerate(self._lines):
+            line = _line_threats(s, p)
+            if line is _NO_THREATS:
+                continue
+            cells = self._line_cells[line_id]
+            fives, fours, open_fours, threes = line
+            threats.fives.update(cells[i] for i in fives)
+            threats.fours.update(cells[i] for i in fours)
+            threats.threes.update(cells[i] for i in threes)
+            if open_fours:
+                threats.open_fours.update(cells[i] for i in open_fours)
+                threats.lines.append(line_id)
+        return threats
+
+    # Move generation. Each returns (result, moves, relevant): result is True/False when the
+    # position is solved without search; relevant are the cells the outcome depends on.
+
+    def _attacker_moves(self, attacker, defender):
+        a = self._threats(attacker)
+        if a.fives:
+            return True, [min(a.fives)], a.fives
+        d = self._threats(defender)
+        if len(d.fives) >= 2:
+            return False, [], ()
+        if d.fives:
+            return None, list(d.fives), d.fives # Must block first
+        if a.open_fours:
+            move = min(a.open_fours)
+            self._place(move, attacker)
+            fives = self._threats(attacker).fives
+            self._remove(move, attacker)
+            return True, [move], fives | {move}
+        moves = sorted(a.fours) + ([] if self.vcf_only else sorted(a.threes - a.fours))
+        if not moves:
+            return False, [], ()
+        return None, moves, ()
+
+    def _defender_moves(self, attacker, defender):
+        d = self._threats(defender)
+        if d.fives:
+            return False, [], ()
+        a = self._threats(attacker)
+        if len(a.fives) >= 2:
+            return True, [], a.fives
+        if a.fives:
+            return None, list(a.fives), a.fives
+        if not a.lines:
+            return False, [], () # No threat left: the attack has run out
+        relevant = set()
+        blocks = None
+        for line_id in a.lines:
+            cells = self._line_cells[line_id]
+            line_blocks = {cells[k] for k in _line_defences(self._lines[line_id], attacker)}
+            relevant |= line_blocks
+            blocks = line_blocks if blocks is None else blocks & line_blocks
+        moves = sorted(blocks) + sorted(d.fours - blocks)
+        if not moves:
+            return True, [], relevant
+        return None, moves, relevant | set(moves)
+
+    # Proof-number search
+
+    def _prove(self, attacker):
+        """True/False if attacker, to move on the current board, can/cannot force a win by threats."""
+        defender = 'O' if attacker == 'X' else 'X'
+        entry = self._table.get(self._key(attacker, attacker))
+        if entry is not None:
+            return entry[0]
+        root = _Node(None)
+        self._stored = 1
+        while root.pn and root.dn:
+            path = []
+            node, or_node = root, True
+            while node.children is not None: # Descend to the most-proving node
+                if or_node:
+                    child = min(node.children, key=lambda n: n.pn)
+                else:
+                    child = min(node.children, key=lambda n: n.dn)
+                self._place(child.move, attacker if or_node else defender)
+                path.append((node, or_node))
+                node, or_node = child, not or_node
+            self._expand(node, or_node, attacker, defender)
+            while path:
+                parent, parent_or = path.pop()
+                self._remove(node.move, attacker if parent_or else defender)
+                self._update(parent, parent_or, attacker)
+                node = parent
+        return root.pn == 0
+
+    def _expand(self, node, or_node, attacker, defender):
+        self.nodes += 1
+        if self._node_budget is not None and self.nodes > self._node_budget:
+            raise SearchBudgetExceeded()
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchBudgetExceeded()
+        to_move = attacker if or_node else defender
+        key = self._key(to_move, attacker)
+        entry = self._table.get(key)
+        if entry is not None:
+            node.pn, node.dn = (0, INF) if entry[0] else (INF, 0)
+            return
+        if or_node:
+            result, moves, _ = self._attacker_moves(attacker, defender)
+        else:
+            result, moves, _ = self._defender_moves(attacker, defender)
+        if result is not None:
+            node.pn, node.dn = (0, INF) if result else (INF, 0)
+            self._store(key, result, moves[0] if or_node and result else None)
+            return
+        node.children = []
+        for move in moves:
+            child = _Node(move)
+            self._place(move, to_move)
+            entry = self._table.get(self._key(defender if or_node else attacker, attacker))
+            self._remove(move, to_move)
+            if entry is not None:
+                child.pn, child.dn = (0, INF) if entry[0] else (INF, 0)
+            node.children.append(child)
+        self._stored += len(moves)
+        if self._stored > self.max_nodes:
+            raise SearchBudgetExceeded()
+        self._update(node, or_node, attacker)
+
+    def _update(self, node, or_node, attacker):
+        children = node.children
+        if or_node:
+            node.pn = min(child.pn for child in children)
+            node.dn = sum(child.dn for child in children)
+        else:
+            node.pn = sum(child.pn for child in children)
+            node.dn = min(child.dn for child in children)
+        if node.pn == 0 or node.dn == 0:
+            move = None
+            if or_node and node.pn == 0:
+                move = next(child.move for child in children if child.pn == 0)
+            to_move = attacker if or_node else ('O' if attacker == 'X' else 'X')
+            self._store(self._key(to_move, attacker), node.pn == 0, move)
+            self._stored -= _subtree_size(node) - 1
+            node.children = None # Solved: the table has the result
+
+    def _store(self, key, proven, move):
+        table = self._table
+        if key not in table and len(table) >= self.table_entries:
+            del table[next(iter(table))]
+        table[key] = (proven, move)
+
+    def _refutes(self, cell, to_move, opponent):
+        """True if the opponent still has a forced win after to_move plays cell."""
+        self._place(cell, to_move)
+        try:
+            return self._prove(opponent)
+        finally:
+            self._remove(cell, to_move)
+
+    def _defence_candidates(self, to_move, opponent):
+        """Cells of the opponent's proof plus to_move's own fours and threes, nearest threats first."""
+        relevant = []
+        self._proof_cells(opponent, True, relevant, set())
+        own = self._threats(to_move)
+        candidates = []
+        for cell in relevant + sorted(own.fours) + sorted(own.threes):
+            if self._board[cell] == ' ' and cell not in candidates:
+                candidates.append(cell)
+        return candidates
+
+    def _proof_cells(self, attacker, or_node, cells, seen):
+        """Collects the cells a proof (as stored in the table) depends on."""
+        defender = 'O' if attacker == 'X' else 'X'
+        key = self._key(attacker if or_node else defender, attacker)
+        if key in seen:
+            return
+        seen.add(key)
+        if or_node:
+            result, moves, relevant = self._attacker_moves(attacker, defender)
+            entry = self._table.get(key)
+            moves = [entry[1]] if result is None and entry is not None and entry[1] is not None else []
+        else:
+            result, moves, relevant = self._defender_moves(attacker, defender)
+        cells.extend(cell for cell in relevant if cell not in cells)
+        if result is not None:
+            return
+        for move in moves:
+            if move not in cells:
+                cells.append(move)
+            self._place(move, attacker if or_node else defender)
+            try:
+                self._proof_cells(attacker, not or_node, cells, seen)
+            finally:
+                self._remove(move, attacker if or_node else defender)
+
+    def _principal_variation(self, attacker):
+        """One line of the proven win: the attacker's winning moves and the defender's first replies, up to five."""
+        defender = 'O' if attacker == 'X' else 'X'
+        played = []
+        or_node = True
+        while len(played) < len(self._board):
+            if or_node:
+                entry = self._table.get(self._key(attacker, attacker))
+                if entry is None or entry[1] is None:
+                    break
+                move = entry[1]
+            else:
+                result, moves, relevant = self._defender_moves(attacker, defender)
+                if not moves and not relevant:
+                    break
+                move = moves[0] if moves else min(relevant) # Lost anyway: block one of the five points
+            symbol = attacker if or_node else defender
+            self._place(move, symbol)
+            played.append((move, symbol))
+            if self._is_five(move, symbol):
+                break
+            if not or_node and self._table.get(self._key(attacker, attacker)) is None:
+                result, moves, _ = self._attacker_moves(attacker, defender)
+                if result: # Solved without search, so its move was not stored
+                    self._store(self._key(attacker, attacker), True, moves[0])
+            or_node = not or_node
+        for move, symbol in reversed(played):
+            self._remove(move, symbol)
+        return [divmod(move, self._size) for move, _ in played]
+
+    def _is_five(self, cell, symbol):
+        return any(symbol * 5 in self._lines[line_id] for line_id, _ in self._cell_lines[cell])
+
+
+def _subtree_size(node):
+    size, stack = 0, [node]
+    while stack:
+        node = stack.pop()
+        size += 1
+        if node.children:
+            stack.extend(node.children)
+    return size
+
+
+@functools.lru_cache(maxsize=None)
+def _lines(size):
+    """Cell indices of every row, column and diagonal of a board that is long enough for five."""
+    lines = []
+    for r in range(size):
+        lines.append(tuple(r * size + c for c in range(size)))
+    for c in range(size):
+        lines.append(tuple(r * size + c for r in range(size)))
+    for d in range(-(size - 5), size - 4): # c - r = d
+        lines.append(tuple(r * size + r + d for r in range(size) if 0 <= r + d < size))
+    for s in range(4, 2 * size - 5): # r + c = s
+        lines.append(tuple(r * size + s - r for r in range(size) if 0 <= s - r < size))
+    return lines
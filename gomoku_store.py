@@ -0,0 +1,305 @@
+"""Pluggable storage for game state, so any worker process can serve any game.
+
+Games are stored in the compact codec format together with their version number.
+Writers pass the version they loaded to save(); if another writer got there first
+the save fails with VersionConflict instead of silently overwriting its move
+(optimistic concurrency).
+
+Backends:
+  MemoryGameStore - a dict in this process (single worker only)
+  SQLiteGameStore - a SQLite database in WAL mode, shared by workers on one machine
+  RedisGameStore  - a Redis server, shared by workers on many machines
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import gomoku_codec
+
+try: # redis is only needed for RedisGameStore.from_url
+    import redis
+except ImportError:
+    redis = None
+
+
+class GameNotFound(KeyError):
+    """Raised when a game id is not in the store."""
+
+
+class GameExists(Exception):
+    """Raised when creating a game under an id that is already taken."""
+
+
+class VersionConflict(Exception):
+    """Raised when a game was changed by someone else since it was loaded."""
+    def __init__(self, game_id, expected_version):
+        super().__init__(f"Game {game_id!r} is no longer at version {expected_version}")
+        self.game_id = game_id
+        self.expected_version = expected_version
+
+
+class GameStore:
+    """Interface shared by all backends.
+
+    epoch identifies the store's lifetime; it is part of the ETags handed to clients,
+    so versions restarting with a fresh store cannot produce false 304s.
+    """
+    epoch = None
+
+    def create(self, game, game_id=None):
+        """Stores a new game and returns its id (a fresh one unless game_id is given)."""
+        game_id = game_id or uuid.uuid4().hex
+        self._insert(game_id, game.version, gomoku_codec.game_to_bytes(game))
+        return game_id
+
+    def load(self, game_id):
+        """Returns the stored game; its version attribute is the stored version."""
+        return gomoku_codec.game_from_bytes(self._get(game_id))
+
+    def save(self, game_id, game, expected_version):
+        """Replaces a game, provided it is still at expected_version."""
+        self._compare_and_set(game_id, expected_version, game.version, gomoku_codec.game_to_bytes(game))
+
+    def delete(self, game_id):
+        raise NotImplementedError
+
+    def count(self):
+        """Number of games in the store."""
+        raise NotImplementedError
+
+    def _insert(self, game_id, version, data):
+        raise NotImplementedError
+
+    def _get(self, game_id):
+        raise NotImplementedError
+
+    def _compare_and_set(self, game_id, expected_version, version, data):
+        raise NotImplementedError
+
+
+class MemoryGameStore(GameStore):
+    """Keeps games in this process, evicting the least recently used beyond max_games."""
+    def __init__(self, max_games=10000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.max_games = max_games
+        self.evictions = 0
+        self._games = OrderedDict() # game_id -> (version, data)
+        self._lock = threading.Lock()
+
+    def _insert(self, game_id, version, data):
+        with self._lock:
+            if game_id in self._games:
+                raise GameExists(game_id)
+            self._games[game_id] = (version, data)
+            while len(self._games) > self.max_games:
+                self._games.popitem(last=False)
+                self.evictions += 1
+
+    def _get(self, game_id):
+        with self._lock:
+            try:
+                _, data = self._games[game_id]
+            except KeyError:
+                raise GameNotFound(game_id) from None
+            self._games.move_to_end(game_id)
+            return data
+
+    def _compare_and_set(self, game_id, expected_version, version, data):
+        with self._lock:
+            current = self._games.get(game_id)
+            if current is None:
+                raise GameNotFound(game_id)
+            if current[0] != expected_version:
+                raise VersionConflict(game_id, expected_version)
+            self._games[game_id] = (version, data)
+            self._games.move_to_end(game_id)
+
+    def delete(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def count(self):
+        return len(self._games)
+
+
+class SQLiteGameStore(GameStore):
+    """Keeps games in a SQLite database in WAL mode.
+
+    WAL lets readers in other worker processes proceed while one process writes.
+    Connections are per thread, since requests are served from several threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS games ("
+                         "id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL, updated REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+        self.epoch = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # Durable at checkpoints; a crash loses at most the last moves
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, game_id, version, data):
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute("INSERT INTO games (id, version, data, updated) VALUES (?, ?, ?, ?)",
+                             (game_id, version, data, time.time()))
+        except sqlite3.IntegrityError:
+            raise GameExists(game_id) from None
+
+    def _get(self, game_id):
+        row = self._connection().execute("SELECT data FROM games WHERE id = ?", (game_id,)).fetchone()
+        if row is None:
+            raise GameNotFound(game_id)
+        return row[0]
+
+    def _compare_and_set(self, game_id, expected_version, version, data):
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("UPDATE games SET version = ?, data = ?, updated = ? WHERE id = ? AND version = ?",
+                                  (version, data, time.time(), game_id, expected_version))
+        if cursor.rowcount == 0:
+            if conn.execute("SELECT 1 FROM games WHERE id = ?", (game_id,)).fetchone() is None:
+                raise GameNotFound(game_id)
+            raise VersionConflict(game_id, expected_version)
+
+    def delete(self, game_id):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM games WHERE id = ?", (game_id,))
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+
+# Values are b"<version>:<payload>". The script makes the version check and the write atomic.
+CAS_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then return -1 end
+if string.match(current, '^(%d+):') ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class RedisGameStore(GameStore):
+    """Keeps games in Redis, one key per game.
+
+    client is anything with the redis-py get/set/delete/eval/scan_iter methods:
+    a redis.Redis instance in production, LocalRedis in tests.
+    """
+    def __init__(self, client, prefix="gomoku:"):
+        self._client = client
+        self._prefix = prefix
+        client.set(prefix + "epoch", uuid.uuid4().hex[:8], nx=True)
+        epoch = client.get(prefix + "epoch")
+        self.epoch = epoch.decode() if isinstance(epoch, bytes) else epoch
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        if redis is None:
+            raise RuntimeError("The redis package is required for the Redis game store (pip install redis)")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, game_id):
+        return f"{self._prefix}game:{game_id}"
+
+    def _insert(self, game_id, version, data):
+        if not self._client.set(self._key(game_id), b"%d:" % version + data, nx=True):
+            raise GameExists(game_id)
+
+    def _get(self, game_id):
+        value = self._client.get(self._key(game_id))
+        if value is None:
+            raise GameNotFound(game_id)
+        return value.split(b":", 1)[1]
+
+    def _compare_and_set(self, game_id, expected_version, version, data):
+        result = self._client.eval(CAS_SCRIPT, 1, self._key(game_id), str(expected_version), b"%d:" % version + data)
+        if result == -1:
+            raise GameNotFound(game_id)
+        if result == 0:
+            raise VersionConflict(game_id, expected_version)
+
+    def delete(self, game_id):
+        self._client.delete(self._key(game_id))
+
+    def count(self):
+        return sum(1 for _ in self._client.scan_iter(match=self._key("*")))
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of redis.Redis that RedisGameStore uses.
+
+    eval only understands CAS_SCRIPT. Meant for tests and single-process development.
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bytes(value):
+        return value.encode() if isinstance(value, str) else value
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, nx=False):
+        with self._lock:
+            if nx and key in self._data:
+                return None
+            self._data[key] = self._bytes(value)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match=None):
+        prefix = match[:-1] if match and match.endswith("*") else match
+        with self._lock:
+            keys = list(self._data)
+        return (key for key in keys if prefix is None or key.startswith(prefix))
+
+    def eval(self, script, numkeys, *args):
+        if script != CAS_SCRIPT:
+            raise NotImplementedError("LocalRedis only supports the game store's CAS script")
+        key, expected_version, value = args
+        with self._lock:
+            current = self._data.get(key)
+            if current is None:
+                return -1
+            if current.split(b":", 1)[0].decode() != expected_version:
+                return 0
+            self._data[key] = self._bytes(value)
+            return 1
+
+
+def store_from_url(url):
+    """Builds a store from a URL such as "memory://", "sqlite:///gomoku.db" or "redis://localhost:6379/0"."""
+    if url is None or url == "memory://":
+        return MemoryGameStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteGameStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisGameStore.from_url(url)
+    raise ValueError(f"Unsupported game store URL: {url!r}")
+
+
+def store_from_env():
+    """Builds the store configured by the GOMOKU_STORE environment variable (default: in memory)."""
+    return store_from_url(os.environ.get("GOMOKU_STORE"))
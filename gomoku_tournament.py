@@ -0,0 +1,325 @@
+"""Engine-vs-engine matches with SPRT early stopping.
+
+Two engine configurations play paired games: each random opening is played twice with
+colours swapped, so neither side profits from a lucky opening. Games run in parallel
+worker processes. After every game a sequential probability ratio test (trinomial
+GSPRT, as used by chess engine testing frameworks) compares "A is elo0 stronger" with
+"A is elo1 stronger"; the match stops as soon as either is accepted at the requested
+error rates, or after --max-games.
+
+An engine spec is KIND[:option=value,...]:
+  easy, normal        - make_ai_move_easy / make_ai_move_normal
+  hard:depth=2        - make_ai_move_hard at the given depth
+  analyze:time=0.2    - best move of GomokuGame.analyze under a time (seconds), nodes or depth budget;
+                        give both engines the same time for a fair strength-per-time comparison
+Any spec may add class=module:Class, a GomokuGame subclass (e.g. with different
+_evaluate_board_state weights) that the engine searches with.
+
+Both engines must have the same budget (time, nodes and depth): by default only two
+analyze specs with equal options are accepted. --unequal-budgets allows any pairing,
+e.g. easy against normal, when strength per unit of time is not what is measured.
+
+Usage:
+  python gomoku_tournament.py ENGINE_A ENGINE_B [--max-games 1000] [--workers N] [--board-size 15]
+                              [--opening-stones 4] [--elo0 0] [--elo1 10] [--alpha 0.05] [--beta 0.05] [--seed 1]
+                              [--unequal-budgets]
+"""
+import argparse
+import importlib
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from gomoku import GomokuGame, TranspositionTable
+
+ENGINE_KINDS = ("easy", "normal", "hard", "analyze")
+
+
+def parse_engine(spec):
+    """Parses an engine spec into a dict of its kind and options."""
+    kind, _, option_text = spec.partition(":")
+    if kind not in ENGINE_KINDS:
+        raise ValueError(f"Unknown engine kind {kind!r} in {spec!r}; expected one of {', '.join(ENGINE_KINDS)}")
+    engine = {"spec": spec, "kind": kind, "depth": None, "time": None, "nodes": None, "class": None}
+    for item in filter(None, option_text.split(",")):
+        key, _, value = item.partition("=")
+        if key not in ("depth", "time", "nodes", "class"):
+            raise ValueError(f"Unknown option {key!r} in {spec!r}")
+        engine[key] = value if key == "class" else (float(value) if key == "time" else int(value))
+    if kind == "analyze" and not (engine["time"] or engine["nodes"] or engine["depth"]):
+        raise ValueError(f"{spec!r} needs a time, nodes or depth budget")
+    return engine
+
+
+def check_budgets(engine_a, engine_b):
+    """Raises ValueError unless both engines search under the same budget."""
+    for engine in (engine_a, engine_b):
+        if engine["kind"] != "analyze" or not engine["time"]:
+            raise ValueError(f"{engine['spec']!r} has no time budget; use analyze:time=... for both engines "
+                             f"(or allow unequal budgets)")
+    budgets = [(engine["time"], engine["nodes"], engine["depth"]) for engine in (engine_a, engine_b)]
+    if budgets[0] != budgets[1]:
+        raise ValueError(f"Budgets differ: {engine_a['spec']!r} vs {engine_b['spec']!r} (or allow unequal budgets)")
+
+
+def engine_class(engine):
+    if engine["class"] is None:
+        return GomokuGame
+    module_name, _, class_name = engine["class"].partition(":")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(cls, type) and issubclass(cls, GomokuGame)):
+        raise ValueError(f"{engine['class']} is not a GomokuGame subclass")
+    return cls
+
+
+def choose_move(game, engine, table):
+    """Makes engine's move on game; returns False if it could not move."""
+    kind = engine["kind"]
+    if kind == "easy":
+        return game.make_ai_move_easy()
+    if kind == "normal":
+        return game.make_ai_move_normal()
+    if kind == "hard":
+        if engine["depth"]:
+            game.SEARCH_DEPTH = engine["depth"]
+        return game.make_ai_move_hard()
+    analysis = game.analyze(k=1, depth=engine["depth"] or 10, node_budget=engine["nodes"],
+                            time_budget=engine["time"], tt=table)
+    if analysis.best_move is None:
+        return False
+    return game.make_move(*analysis.best_move)
+
+
+def opening(seed, pair, board_size, stones):
+    """The random opening of a pair: alternating stones within 3 cells of the centre (and on the board)."""
+    rng = random.Random(f"{seed}-opening-{pair}")
+    center = board_size // 2
+    low, high = max(0, center - 3), min(board_size - 1, center + 3)
+    if stones > (high - low + 1) ** 2:
+        raise ValueError(f"{stones} opening stones do not fit near the centre of a {board_size}x{board_size} board")
+    cells = set()
+    moves = []
+    while len(moves) < stones:
+        cell = (rng.randint(low, high), rng.randint(low, high))
+        if cell not in cells:
+            cells.add(cell)
+            moves.append(cell)
+    return moves
+
+
+def play_match_game(task):
+    """Plays one game; task is (pair, a_is_black, engine_a, engine_b, board_size, opening_stones, seed).
+
+    Returns (pair, a_is_black, score of A (1, 0.5 or 0), A's think seconds, A's moves, B's think seconds, B's moves).
+    """
+    pair, a_is_black, engine_a, engine_b, board_size, opening_stones, seed = task
+    random.seed(f"{seed}-{pair}-{a_is_black}") # The engines break ties with the random module
+    # Each engine has its own copy of the game, of its own class, and its own hash table
+    games = {"A": engine_class(engine_a)(board_size=board_size), "B": engine_class(engine_b)(board_size=board_size)}
+    tables = {"A": TranspositionTable(200000), "B": TranspositionTable(200000)}
+    engines = {"A": engine_a, "B": engine_b}
+    colours = {'X': "A" if a_is_black else "B", 'O': "B" if a_is_black else "A"}
+    think = {"A": 0.0, "B": 0.0}
+    moves_made = {"A": 0, "B": 0}
+
+    def play(row, col, games=games.values()):
+        for game in games:
+            if not game.make_move(row, col): # The engines' games would no longer be the same game
+                raise RuntimeError(f"Move ({row}, {col}) is illegal in game {pair} (A black: {a_is_black})")
+
+    def won(side):
+        return games[side].check_win()
+
+    def switch():
+        for game in games.values():
+            game.switch_player()
+
+    for row, col in opening(seed, pair, board_size, opening_stones):
+        play(row, col)
+        switch()
+
+    score = 0.5
+    reference = games["A"]
+    while not reference.check_draw():
+        player = reference.current_player
+        side = colours[player]
+        started = time.perf_counter()
+        moved = choose_move(games[side], engines[side], tables[side])
+        think[side] += time.perf_counter() - started
+        moves_made[side] += 1
+        if not moved:
+            break
+        row, col = games[side].moves[-1]
+        other = "B" if side == "A" else "A"
+        play(row, col, [games[other]])
+        if won(side):
+            score = 1.0 if side == "A" else 0.0
+            break
+        switch()
+    return pair, a_is_black, score, think["A"], moves_made["A"], think["B"], moves_made["B"]
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+class SPRT:
+    """Trinomial GSPRT on game results from A's point of view."""
+    def __init__(self, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05):
+        self.elo0, self.elo1 = elo0, elo1
+        self.lower = math.log(beta / (1 - alpha)) # Accept H0 (A is not elo1 stronger) below this
+        self.upper = math.log((1 - beta) / alpha) # Accept H1 above this
+        self.wins = self.draws = self.losses = 0
+
+    def add(self, score):
+        if score == 1.0:
+            self.wins += 1
+        elif score == 0.0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def _mean_and_variance(self):
+        # Half a game of each result is added so that early one-sided results (all wins,
+        # zero variance) still give finite LLR and Elo margins; it vanishes as games add up.
+        wins, draws, losses = self.wins + 0.5, self.draws + 0.5, self.losses + 0.5
+        n = wins + draws + losses
+        mean = (wins + 0.5 * draws) / n
+        variance = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2) / n
+        return mean, variance
+
+    def llr(self):
+        """Log-likelihood ratio of H1 against H0 so far."""
+        if self.games == 0:
+            return 0.0
+        mean, variance = self._mean_and_variance()
+        s0, s1 = expected_score(self.elo0), expected_score(self.elo1)
+        return self.games * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+    def decision(self):
+        """"H1", "H0" or None while undecided."""
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def elo(self):
+        """(Elo difference of A over B, half-width of its 95% confidence interval)."""
+        if self.games == 0:
+            return 0.0, math.inf
+        mean, variance = self._mean_and_variance()
+        margin = 1.96 * math.sqrt(variance / self.games)
+        low, high = elo_from_score(mean - margin), elo_from_score(mean + margin)
+        return elo_from_score(mean), (high - low) / 2
+
+
+def run_match(engine_a, engine_b, max_games=1000, workers=None, board_size=15, opening_stones=4,
+              elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05, seed=1, progress=None, unequal_budgets=False):
+    """Plays until the SPRT decides or max_games games are played. Returns a summary dict."""
+    engine_a, engine_b = parse_engine(engine_a), parse_engine(engine_b)
+    if not unequal_budgets:
+        check_budgets(engine_a, engine_b)
+    opening(seed, 0, board_size, opening_stones) # Fail here rather than in a worker on a board too small
+    for engine in (engine_a, engine_b):
+        engine_class(engine) # Fail here rather than in a worker on a bad class
+    workers = workers or os.cpu_count()
+    tasks = [(pair, a_is_black, engine_a, engine_b, board_size, opening_stones, seed)
+             for pair in range((max_games + 1) // 2) for a_is_black in (True, False)][:max_games]
+    sprt = SPRT(elo0, elo1, alpha, beta)
+    think = {"A": [0.0, 0], "B": [0.0, 0]}
+    started = time.perf_counter()
+    pool = multiprocessing.get_context("spawn").Pool(workers) if workers > 1 else None
+    decision = None
+    try:
+        results = pool.imap_unordered(play_match_game, tasks) if pool is not None else map(play_match_game, tasks)
+        for _, _, score, a_time, a_moves, b_time, b_moves in results:
+            sprt.add(score)
+            think["A"][0] += a_time
+            think["A"][1] += a_moves
+            think["B"][0] += b_time
+            think["B"][1] += b_moves
+            decision = sprt.decision()
+            if progress:
+                progress(sprt)
+            if decision is not None:
+                break
+    finally:
+        if pool is not None:
+            pool.terminate() # Drops games still running once the test is decided
+    elo, margin = sprt.elo()
+    return {
+        "engine_a": engine_a["spec"],
+        "engine_b": engine_b["spec"],
+        "games": sprt.games,
+        "wins": sprt.wins,
+        "draws": sprt.draws,
+        "losses": sprt.losses,
+        "elo": elo,
+        "elo_margin": margin,
+        "llr": sprt.llr(),
+        "llr_bounds": (sprt.lower, sprt.upper),
+        "decision": decision,
+        "avg_think_ms_a": 1000 * think["A"][0] / think["A"][1] if think["A"][1] else 0.0,
+        "avg_think_ms_b": 1000 * think["B"][0] / think["B"][1] if think["B"][1] else 0.0,
+        "elapsed_s": time.perf_counter() - started,
+    }
+
+
+def format_summary(summary):
+    verdict = {"H1": "A is stronger (H1 accepted)", "H0": "A is not stronger (H0 accepted)",
+               None: "undecided (game limit reached)"}[summary["decision"]]
+    return (f"{summary['engine_a']} vs {summary['engine_b']}: {summary['games']} games "
+            f"+{summary['wins']} ={summary['draws']} -{summary['losses']}\n"
+            f"Elo {summary['elo']:+.1f} +/- {summary['elo_margin']:.1f} (95%), LLR {summary['llr']:.2f} "
+            f"[{summary['llr_bounds'][0]:.2f}, {summary['llr_bounds'][1]:.2f}]: {verdict}\n"
+            f"Average think time: A {summary['avg_think_ms_a']:.1f} ms, B {summary['avg_think_ms_b']:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("engine_a")
+    parser.add_argument("engine_b")
+    parser.add_argument("--max-games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--board-size", type=int, default=15)
+    parser.add_argument("--opening-stones", type=int, default=4)
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--unequal-budgets", action="store_true", help="Allow engines with different or no time budgets")
+    args = parser.parse_args(argv)
+
+    def progress(sprt):
+        if sprt.games % 20 == 0:
+            elo, margin = sprt.elo()
+            print(f"{sprt.games} games: +{sprt.wins} ={sprt.draws} -{sprt.losses}, "
+                  f"Elo {elo:+.1f} +/- {margin:.1f}, LLR {sprt.llr():.2f}", file=sys.stderr)
+
+    try:
+        summary = run_match(args.engine_a, args.engine_b, args.max_games, args.workers, args.board_size,
+                            args.opening_stones, args.elo0, args.elo1, args.alpha, args.beta, args.seed, progress,
+                            args.unequal_budgets)
+    except ValueError as e:
+        parser.error(str(e))
+    print(format_summary(summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Search tree tracing for the Hard AI, exported for Chrome's trace viewer or flamegraphs.
+
+A SearchTracer passed to GomokuGame.make_ai_move_hard(tracer=...) records every subtree
+down to max_depth plies below the root: the move, the alpha/beta window it was searched
+with, its score, how many nodes it took and how long. Deeper nodes are only counted.
+
+  chrome_trace()     - trace-event JSON for chrome://tracing or https://ui.perfetto.dev
+  collapsed_stacks() - "root;X(7,7);O(7,8) 1234" lines for flamegraph.pl / speedscope
+
+Usage:
+  python gomoku_trace.py POSITION_ID [--corpus bench_corpus.json] [--depth 3] [--trace-depth 2]
+                         [--chrome trace.json] [--stacks search.folded] [--weight time|nodes]
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+import gomoku_bench
+
+
+class Span:
+    """One traced subtree of the search."""
+    __slots__ = ("move", "player", "alpha", "beta", "score", "nodes", "start", "duration", "children")
+
+    def __init__(self, move, player, alpha, beta, start):
+        self.move = move
+        self.player = player
+        self.alpha = alpha
+        self.beta = beta
+        self.score = None
+        self.nodes = 0
+        self.start = start
+        self.duration = 0.0
+        self.children = []
+
+    @property
+    def name(self):
+        if self.move is None:
+            return "root"
+        return f"{self.player}({self.move[0]},{self.move[1]})"
+
+
+class SearchTracer:
+    """Collects the search tree of one search, down to max_depth plies below the root."""
+    def __init__(self, max_depth=2):
+        self.max_depth = max_depth
+        self.root = None
+        self._stack = []
+        self._nodes_at_open = []
+
+    def begin(self, nodes_searched=0):
+        self.root = Span(None, None, -math.inf, math.inf, time.perf_counter())
+        self._stack = [self.root]
+        self._nodes_at_open = [nodes_searched]
+
+    def open(self, move, player, alpha, beta, nodes_searched):
+        """Starts a subtree; returns False (and records nothing) below max_depth."""
+        if len(self._stack) > self.max_depth:
+            return False
+        span = Span(move, player, alpha, beta, time.perf_counter())
+        self._stack[-1].children.append(span)
+        self._stack.append(span)
+        self._nodes_at_open.append(nodes_searched)
+        return True
+
+    def close(self, score, nodes_searched):
+        """Ends the subtree opened last."""
+        span = self._stack.pop()
+        span.score = score
+        span.nodes = nodes_searched - self._nodes_at_open.pop()
+        span.duration = time.perf_counter() - span.start
+
+    def end(self, nodes_searched):
+        """Ends the trace, closing the root and any subtree a stopped search left open (its score stays None)."""
+        while self._stack:
+            self.close(None, nodes_searched)
+
+    def spans(self):
+        """Yields (path, span) for every span, parents first; path is the list of names from the root."""
+        if self.root is None:
+            return
+        pending = [([self.root.name], self.root)]
+        while pending:
+            path, span = pending.pop()
+            yield path, span
+            for child in reversed(span.children):
+                pending.append((path + [child.name], child))
+
+    def chrome_trace(self):
+        """Returns the tree as a Chrome trace-event document (complete "X" events, microseconds)."""
+        events = []
+        for _, span in self.spans():
+            events.append({
+                "name": span.name,
+                "cat": "search",
+                "ph": "X",
+                "ts": (span.start - self.root.start) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": 1,
+                "tid": 1,
+                "args": {
+                    "alpha": _json_number(span.alpha),
+                    "beta": _json_number(span.beta),
+                    "score": _json_number(span.score),
+                    "nodes": span.nodes,
+                },
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def collapsed_stacks(self, weight="time"):
+        """Returns flamegraph input: one "frame;frame;frame value" line per span.
+
+        Values are self costs (the span minus its traced children), in microseconds for
+        weight="time" or in nodes for weight="nodes".
+        """
+        if weight not in ("time", "nodes"):
+            raise ValueError(f"Unknown weight: {weight!r}")
+        lines = []
+        for path, span in self.spans():
+            if weight == "time":
+                value = round((span.duration - sum(child.duration for child in span.children)) * 1e6)
+            else:
+                value = span.nodes - sum(child.nodes for child in span.children)
+            if value > 0:
+                lines.append(f"{';'.join(path)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _json_number(value):
+    # JSON has no infinity; the open window bounds are written as strings
+    if isinstance(value, float) and math.isinf(value):
+        return "inf" if value > 0 else "-inf"
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("position", help="Id of a position in the benchmark corpus")
+    parser.add_argument("--corpus", default=gomoku_bench.DEFAULT_CORPUS)
+    parser.add_argument("--depth", type=int, help="Search depth (default: the corpus's hard depth, else the engine's)")
+    parser.add_argument("--trace-depth", type=int, default=2, help="Plies below the root to record")
+    parser.add_argument("--chrome", help="Write Chrome trace-event JSON here")
+    parser.add_argument("--stacks", help="Write collapsed stacks here (default: stdout)")
+    parser.add_argument("--weight", choices=("time", "nodes"), default="time")
+    args = parser.parse_args(argv)
+
+    corpus = gomoku_bench.load_corpus(args.corpus)
+    position = next((p for p in corpus["positions"] if p["id"] == args.position), None)
+    if position is None:
+        parser.error(f"No position {args.position!r} in {args.corpus}")
+    game = gomoku_bench.build_game(position)
+    depth = args.depth or position["engines"].get("hard", {}).get("depth")
+    if depth:
+        game.SEARCH_DEPTH = depth
+
+    tracer = SearchTracer(args.trace_depth)
+    random.seed(0)
+    game.make_ai_move_hard(tracer=tracer)
+    print(f"{game.nodes_searched} nodes in {tracer.root.duration:.3f} s", file=sys.stderr)
+
+    if args.chrome:
+        with open(args.chrome, "w") as f:
+            json.dump(tracer.chrome_trace(), f)
+    stacks = tracer.collapsed_stacks(args.weight)
+    if args.stacks:
+        with open(args.stacks, "w") as f:
+            f.write(stacks)
+    else:
+        sys.stdout.write(stacks)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,33 +1,330 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+import asyncio
+import hmac
+import logging
+import os
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Query, Response, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles # Added for static file serving
-from pydantic import BaseModel # Added for request model
-from gomoku import GomokuGame # Assuming gomoku.py is in the same directory
+from pydantic import BaseModel, Field # Added for request model
+from gomoku import GomokuGame, TranspositionTable # Assuming gomoku.py is in the same directory
+import gomoku_codec
+from gomoku_scheduler import AIScheduler, SchedulerOverloaded
+from gomoku_store import store_from_env, GameNotFound, GameExists, VersionConflict
+from gomoku_history import GameHistory, rebuild_game
+from gomoku_metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from gomoku_profiling import ProfileBuffer, SORT_KEYS as PROFILE_SORT_KEYS, call_profiled, profile_thread, profiling_request
+import gomoku_batch
+from gomoku_solvedb import SolvedPositions
+from gomoku_ponder import Ponderer
+from gomoku_movecache import MoveCache, Position
+
+logger = logging.getLogger(__name__)
+
+# Every game's moves are logged here (GOMOKU_HISTORY_DB; set it to an empty string to disable)
+HISTORY_DB = os.environ.get("GOMOKU_HISTORY_DB", "gomoku_history.db")
+history = GameHistory(HISTORY_DB) if HISTORY_DB else None
+HISTORY_FLUSH_TIMEOUT = 5.0 # Seconds a history request waits for queued moves to be written
+
+# Positions proven won, looked up before the AIs search (GOMOKU_SOLVED_DB; empty disables it).
+# Every worker reads it and records its proofs; the first to open it writes them all.
+SOLVED_DB = os.environ.get("GOMOKU_SOLVED_DB", "gomoku_solved.db")
+solved_positions = SolvedPositions(SOLVED_DB, writable=True) if SOLVED_DB else None
+GomokuGame.solved_positions = solved_positions
+
+# Batch analysis runs in a process pool, started on first use (GOMOKU_BATCH_WORKERS, default: one per core)
+BATCH_WORKERS = int(os.environ.get("GOMOKU_BATCH_WORKERS", "0")) or os.cpu_count()
+batch_pool = None
+
+def get_batch_pool():
+    global batch_pool
+    if batch_pool is None:
+        batch_pool = gomoku_batch.make_pool(BATCH_WORKERS)
+    return batch_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    if history is not None:
+        history.close() # Commits moves still waiting in the writer's queue
+    if batch_pool is not None:
+        batch_pool.shutdown(cancel_futures=True)
+    if solved_positions is not None:
+        solved_positions.close()
+    if ponderer is not None:
+        ponderer.close()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Requests without a game id all share this game, as before games had ids
+DEFAULT_GAME_ID = "default"
+GAME_ID_PATTERN = "^[A-Za-z0-9_-]{1,64}$"
+
 # Pydantic model for make_move request
 class MoveRequest(BaseModel):
     row: int
     col: int
+    game_id: str = Field(DEFAULT_GAME_ID, pattern=GAME_ID_PATTERN)
+    include_stats: bool = False # Adds the AI's search statistics to the response as "searchStats"
 
 # Pydantic model for new_game request
 class NewGameRequest(BaseModel):
     game_mode: str | None = None # e.g., "1P", "2P"
     ai_difficulty: str | None = None # e.g., "Easy", "Medium", "Hard"
+    game_id: str = Field(DEFAULT_GAME_ID, pattern=GAME_ID_PATTERN) # Created if it does not exist yet
 
 # Initialize Jinja2Templates for serving HTML
 # (The "templates" directory must exist at the root for this to work)
 templates = Jinja2Templates(directory="templates")
 
-# Initialize the Gomoku game instance
-# This will be a single global game instance for now
-game = GomokuGame()
+# Games live in a store shared by all worker processes (GOMOKU_STORE, in memory by default).
+# Each request loads its game, changes it and saves it back; a save fails with a 409 if
+# another request changed the game in the meantime.
+store = store_from_env()
+
+# AI searches run in worker threads behind the scheduler. Within a process, requests for
+# the same game are serialized so they do not lose each other's moves to version conflicts.
+ai_scheduler = AIScheduler()
+game_locks = weakref.WeakValueDictionary()
+
+# After a Hard AI move, the AI's answers to the human's likeliest replies are searched in the
+# background for up to GOMOKU_PONDER_SECONDS (0, the default, disables pondering). Pondering
+# stops whenever an AI request is running or waiting, so it only ever uses idle time.
+PONDER_SECONDS = float(os.environ.get("GOMOKU_PONDER_SECONDS", "0"))
+ponderer = Ponderer(PONDER_SECONDS, busy=lambda: ai_scheduler.active() > 0 or ai_scheduler.queue_depth() > 0) \
+    if PONDER_SECONDS > 0 else None
+PONDERED_DIFFICULTIES = ("Hard",)
+
+# Normal and Hard moves are cached across games by symmetry-reduced position, up to
+# GOMOKU_MOVE_CACHE_ENTRIES positions per process (0 disables the cache)
+MOVE_CACHE_ENTRIES = int(os.environ.get("GOMOKU_MOVE_CACHE_ENTRIES", "100000"))
+move_cache = MoveCache(MOVE_CACHE_ENTRIES) if MOVE_CACHE_ENTRIES > 0 else None
+CACHED_DIFFICULTIES = ("Medium", "Hard")
+
+def ai_budget(game_instance: GomokuGame, difficulty: str):
+    """The search settings an AI move depends on, besides the position."""
+    if difficulty == "Hard":
+        return (game_instance.SEARCH_DEPTH, game_instance.SOLVER_NODES)
+    return ()
+
+# AI move function for each difficulty offered by the frontend
+AI_MOVES = {
+    "Easy": GomokuGame.make_ai_move_easy,
+    "Medium": GomokuGame.make_ai_move_normal,
+    "Hard": GomokuGame.make_ai_move_hard,
+}
+
+def get_game_lock(game_id: str):
+    lock = game_locks.get(game_id)
+    if lock is None:
+        lock = game_locks[game_id] = asyncio.Lock()
+    return lock
+
+def load_game(game_id: str):
+    """Loads a game from the store; the shared default game is created on first use."""
+    try:
+        return store.load(game_id)
+    except GameNotFound:
+        if game_id != DEFAULT_GAME_ID:
+            raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
+    game = GomokuGame()
+    try:
+        store.create(game, game_id)
+        log_new_game(game_id, game)
+    except GameExists: # Another worker created it first
+        pass
+    return store.load(game_id)
+
+def log_new_game(game_id: str, game_instance: GomokuGame):
+    if history is not None:
+        history.start_game(game_id, game_instance.board_size_internal, game_instance.game_mode, game_instance.ai_difficulty)
+
+# Games this worker saw played recently and that are not over: game_id -> time of the
+# last change, least recent first. Reported as gomoku_active_games.
+ACTIVE_GAME_SECONDS = float(os.environ.get("GOMOKU_ACTIVE_GAME_SECONDS", "600"))
+active_games = OrderedDict()
+
+def track_activity(game_id: str, game_instance: GomokuGame):
+    if game_instance.game_over:
+        active_games.pop(game_id, None)
+    else:
+        active_games[game_id] = time.monotonic()
+        active_games.move_to_end(game_id)
+
+def count_active_games():
+    cutoff = time.monotonic() - ACTIVE_GAME_SECONDS
+    while active_games and next(iter(active_games.values())) < cutoff:
+        active_games.popitem(last=False)
+    return len(active_games)
+
+def log_moves(game_id: str, game_instance: GomokuGame, first_ply: int):
+    """Logs the moves made since ply first_ply, and the result if they ended the game."""
+    if history is None:
+        return
+    history.record_moves(game_id, first_ply, game_instance.moves[first_ply:])
+    if game_instance.game_over:
+        history.finish_game(game_id, game_instance.current_player if game_instance.check_win() else "draw")
+
+def run_ai_move(game_instance: GomokuGame, difficulty: str, collect_stats: bool = False):
+    """Makes the AI's move (in a worker thread) and records how long it took.
+
+    Returns (move_made, SearchStats or None); statistics are only collected when asked for.
+    """
+    started = time.perf_counter()
+    position = cached_move = None
+    if move_cache is not None and difficulty in CACHED_DIFFICULTIES and not collect_stats:
+        position = Position(game_instance.board, game_instance.current_player, difficulty,
+                            ai_budget(game_instance, difficulty))
+        cached_move = move_cache.get(position)
+    if cached_move is not None: # A dictionary lookup instead of a search
+        moved, stats = game_instance.make_move(*cached_move), None
+        game_instance.nodes_searched = 0
+    else:
+        with profile_thread(): # Only does anything when the request is being profiled
+            if collect_stats:
+                moved, stats = AI_MOVES[difficulty](game_instance, collect_stats=True)
+            else:
+                moved, stats = AI_MOVES[difficulty](game_instance), None
+        if moved and position is not None and game_instance.last_move_choices:
+            move_cache.put(position, game_instance.last_move_choices)
+    elapsed = time.perf_counter() - started
+    ai_think_seconds.observe(elapsed, difficulty=difficulty)
+    ai_nodes.inc(game_instance.nodes_searched, difficulty=difficulty)
+    if elapsed > 0 and game_instance.nodes_searched: # Cache hits search nothing
+        ai_nodes_per_second.observe(game_instance.nodes_searched / elapsed, difficulty=difficulty)
+    return moved, stats
+
+# Metrics, served at /metrics in the Prometheus text format
+metrics = Registry()
+request_seconds = metrics.histogram("gomoku_http_request_duration_seconds", "HTTP request latency by route.",
+                                    labels=("method", "route", "status"))
+ai_think_seconds = metrics.histogram("gomoku_ai_think_seconds", "Time the AI spent choosing a move.",
+                                     labels=("difficulty",))
+ai_nodes = metrics.counter("gomoku_ai_nodes_searched_total", "Positions examined by AI searches.",
+                           labels=("difficulty",))
+ai_nodes_per_second = metrics.histogram("gomoku_ai_nodes_per_second", "Search speed of AI moves that searched.",
+                                        labels=("difficulty",),
+                                        buckets=(1e3, 2.5e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6))
+metrics.gauge("gomoku_active_games", "Games not over with a change in the last GOMOKU_ACTIVE_GAME_SECONDS, in this worker.",
+              callback=count_active_games)
+metrics.gauge("gomoku_stored_games", "Games in the game store, finished and abandoned ones included.",
+              callback=lambda: store.count())
+metrics.gauge("gomoku_ai_queue_depth", "AI requests waiting for a slot.", labels=("difficulty",),
+              callback=lambda: {(d,): ai_scheduler.queue_depth(d) for d in ai_scheduler.tier_names()})
+metrics.gauge("gomoku_ai_active_searches", "AI searches currently running.", labels=("difficulty",),
+              callback=lambda: {(d,): ai_scheduler.active(d) for d in ai_scheduler.tier_names()})
+metrics.gauge("gomoku_store_evictions", "Games evicted from the in-memory store to stay within its limit.",
+              callback=lambda: getattr(store, "evictions", 0))
+if move_cache is not None:
+    metrics.gauge("gomoku_move_cache_hit_ratio", "Share of cached-difficulty AI moves answered from the move cache.",
+                  callback=lambda: move_cache.hit_rate)
+    metrics.gauge("gomoku_move_cache_entries", "Positions in the AI move cache.", callback=lambda: len(move_cache))
+    metrics.gauge("gomoku_move_cache_bytes", "Approximate memory held by the AI move cache.",
+                  callback=lambda: move_cache.memory_bytes)
+if ponderer is not None:
+    metrics.gauge("gomoku_ponder_hits", "AI moves answered from a pondered search.", callback=lambda: ponderer.hits)
+    metrics.gauge("gomoku_ponder_misses", "AI moves of pondered games the human replied to unexpectedly.",
+                  callback=lambda: ponderer.misses)
+if history is not None:
+    metrics.gauge("gomoku_history_write_amplification", "Bytes written to the history WAL per byte of moves.",
+                  callback=lambda: history.stats.write_amplification)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500 # What the client gets if the handler raises
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        # Route templates rather than raw paths, so ids in URLs do not explode the label set
+        route_label = route.path if route is not None else "unmatched"
+        request_seconds.observe(time.perf_counter() - started, method=request.method, route=route_label,
+                                status=status)
+
+@app.get("/metrics")
+async def api_metrics():
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+# On-demand profiling. Disabled unless GOMOKU_PROFILE_TOKEN is set; requests sending that
+# token in X-Profile-Token are run under cProfile and kept for download under /admin/profiles.
+PROFILE_TOKEN = os.environ.get("GOMOKU_PROFILE_TOKEN") or None
+profiles = ProfileBuffer(int(os.environ.get("GOMOKU_PROFILE_BUFFER", "20")))
+
+def profile_token_matches(token: str | None):
+    return PROFILE_TOKEN is not None and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not profile_token_matches(request.headers.get("x-profile-token")) or request.url.path.startswith("/admin/"):
+        return await call_next(request)
+    started_at = time.time()
+    started = time.perf_counter()
+    with profiling_request() as profile:
+        response = await call_next(request)
+    record = profiles.add(request.method, request.url.path, response.status_code, started_at,
+                          time.perf_counter() - started, profile.stats())
+    response.headers["X-Profile-Id"] = str(record.profile_id)
+    return response
+
+def require_profile_admin(request: Request):
+    if PROFILE_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not profile_token_matches(request.headers.get("x-profile-token")):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@app.get("/admin/profiles")
+async def api_list_profiles(request: Request):
+    require_profile_admin(request)
+    return {"profiles": [record.as_dict() for record in profiles.list()]}
+
+@app.get("/admin/profiles/{profile_id}")
+async def api_get_profile(request: Request, profile_id: int, format: str = Query("text", pattern="^(text|pstats)$"),
+                          sort: str = Query("cumulative", pattern="^(" + "|".join(PROFILE_SORT_KEYS) + ")$"),
+                          limit: int = Query(40, ge=1, le=1000)):
+    """Downloads a profile as a pstats text summary, or as a .prof file for pstats/snakeviz."""
+    require_profile_admin(request)
+    record = profiles.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found (it may have been dropped from the buffer)")
+    if format == "pstats":
+        return Response(content=record.pstats_bytes(), media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'})
+    return PlainTextResponse(record.text(sort, limit))
+
+def error_content(exc: Exception):
+    """(status code, JSON body) that a request failing with exc is answered with."""
+    if isinstance(exc, HTTPException):
+        return exc.status_code, {"detail": exc.detail}
+    if isinstance(exc, VersionConflict):
+        return 409, {"message": "The game was changed by another request. Reload it and try again.", "gameId": exc.game_id}
+    if isinstance(exc, SchedulerOverloaded):
+        return 503, {"message": "Server is busy, please retry shortly.", "retryAfter": exc.retry_after}
+    return 500, {"message": "Internal Server Error"}
+
+@app.exception_handler(VersionConflict)
+async def version_conflict_handler(request: Request, exc: VersionConflict):
+    status_code, content = error_content(exc)
+    return JSONResponse(status_code=status_code, content=content)
+
+@app.exception_handler(SchedulerOverloaded)
+async def scheduler_overloaded_handler(request: Request, exc: SchedulerOverloaded):
+    status_code, content = error_content(exc)
+    return JSONResponse(status_code=status_code, content=content, headers={"Retry-After": str(exc.retry_after)})
+
+def get_session_key(request: Request, game_id: str):
+    """Identifies the client for fair scheduling of AI requests."""
+    return request.headers.get("x-session-id") or game_id
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
@@ -37,26 +334,146 @@ async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 # Helper function to get the current game state
-def get_game_state_dict(game_instance: GomokuGame):
-    return {
-        "board": game_instance.board,
+def get_game_state_dict(game_instance: GomokuGame, encoding: str = "full", game_id: str = DEFAULT_GAME_ID):
+    board_key, board_value = gomoku_codec.encode_board_field(game_instance, encoding)
+    state = {
+        "gameId": game_id,
+        board_key: board_value,
         "currentPlayer": "Black" if game_instance.current_player == 'X' else "White",
         "gameOver": game_instance.game_over,
         "boardSize": game_instance.board_size_internal,
         "gameMode": game_instance.game_mode,          # New
-        "aiDifficulty": game_instance.ai_difficulty  # New
+        "aiDifficulty": game_instance.ai_difficulty,  # New
+        "version": game_instance.version,
     }
+    if encoding != "full":
+        state["boardEncoding"] = encoding
+    return state
+
+def get_game_state_etag(game_instance: GomokuGame, encoding: str = "full", game_id: str = DEFAULT_GAME_ID):
+    return f'"{store.epoch}-{game_id}-{game_instance.nonce}-{game_instance.version}-{encoding}"'
+
+def etag_matches(if_none_match: str | None, etag: str):
+    """Checks an If-None-Match header value against etag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
 
 @app.get("/api/game_state")
-async def api_get_game_state():
-    """Returns the current state of the game."""
-    return get_game_state_dict(game)
+async def api_get_game_state(request: Request, encoding: str = Query("full", pattern="^(full|compact|moves)$"),
+                             game_id: str = Query(DEFAULT_GAME_ID, pattern=GAME_ID_PATTERN)):
+    """Returns the current state of the game.
+
+    Supports conditional requests: send back the ETag from a previous response in
+    If-None-Match and an unchanged game answers 304 Not Modified with no body.
+    """
+    game = load_game(game_id)
+    etag = get_game_state_etag(game, encoding, game_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=gomoku_codec.dumps(get_game_state_dict(game, encoding, game_id)),
+                    media_type="application/json", headers=headers)
+
+def is_valid_human_move(game_instance: GomokuGame, move: MoveRequest):
+    return (not game_instance.game_over and
+            0 <= move.row < game_instance.board_size_internal and
+            0 <= move.col < game_instance.board_size_internal and
+            game_instance.board[move.row][move.col] == ' ')
 
 @app.post("/api/make_move")
-async def api_make_move(move: MoveRequest):
+async def api_make_move(move: MoveRequest, request: Request):
+    return await make_move_in_game(move, get_session_key(request, move.game_id))
+
+async def make_move_in_game(move: MoveRequest, session: str):
+    """
+    Plays the human's move and, in 1P games, the AI's reply; returns the new game state.
+    Shared by /api/make_move and /api/make_moves. Raises HTTPException, VersionConflict
+    or SchedulerOverloaded, leaving the stored game unchanged.
+    """
+    async with get_game_lock(move.game_id):
+        game = load_game(move.game_id)
+        loaded_version = game.version
+        loaded_ply = len(game.moves)
+        # Reserve the AI's slot before touching the board, so an overloaded server
+        # rejects the request without leaving the human's move half applied.
+        ai_turn = game.game_mode == "1P" and game.ai_difficulty in AI_MOVES and is_valid_human_move(game, move)
+        pondered_move = None
+        if ai_turn and ponderer is not None:
+            pondered_move = ponderer.take(move.game_id, game.moves + [(move.row, move.col)])
+        if pondered_move is not None: # Answered while the human was thinking: no slot needed
+            response_state = await play_move(game, move, game.ai_difficulty, pondered_move)
+        elif ai_turn:
+            async with ai_scheduler.admit(game.ai_difficulty, session) as granted_difficulty:
+                response_state = await play_move(game, move, granted_difficulty)
+        else:
+            response_state = await play_move(game, move, game.ai_difficulty)
+        if game.version != loaded_version:
+            store.save(move.game_id, game, loaded_version)
+            log_moves(move.game_id, game, loaded_ply)
+            track_activity(move.game_id, game)
+            if (ponderer is not None and game.game_mode == "1P" and game.ai_difficulty in PONDERED_DIFFICULTIES
+                    and not game.game_over and len(game.moves) > loaded_ply + 1):
+                ponderer.start(move.game_id, game, AI_MOVES[game.ai_difficulty])
+        return response_state
+
+class BulkMoveRequest(BaseModel):
+    moves: list[MoveRequest] = Field(min_length=1, max_length=1000)
+
+# Games of one /api/make_moves request whose moves are in progress at once; their AI replies
+# still queue for the scheduler's slots like any other (GOMOKU_BULK_MOVE_CONCURRENCY, default: one per core)
+BULK_MOVE_CONCURRENCY = int(os.environ.get("GOMOKU_BULK_MOVE_CONCURRENCY", "0")) or os.cpu_count()
+
+@app.post("/api/make_moves")
+async def api_make_moves(bulk: BulkMoveRequest, request: Request):
+    """
+    Plays moves in many games at once, for bot clients. Games are played concurrently,
+    the moves of one game in the order given. Streams one NDJSON line per move as it
+    completes: "index" (its position in the request), "status" and either the game state
+    /api/make_move would return or the error it would fail with. Once a move of a game
+    fails or is rejected, its later moves are skipped with status 424.
+    """
+    games = {}
+    for index, move in enumerate(bulk.moves):
+        games.setdefault(move.game_id, []).append((index, move))
+    results = asyncio.Queue()
+    slots = asyncio.Semaphore(BULK_MOVE_CONCURRENCY)
+
+    async def play_game(moves):
+        failed = False
+        for index, move in moves:
+            if failed:
+                status_code, content = 424, {"message": "Skipped: an earlier move of this game failed.", "gameId": move.game_id}
+            else:
+                try:
+                    async with slots:
+                        status_code, content = 200, await make_move_in_game(move, get_session_key(request, move.game_id))
+                except Exception as exc: # Reported on the move's line; the other games go on
+                    status_code, content = error_content(exc)
+                    if status_code == 500: # Unexpected: the line alone would not tell what went wrong
+                        logger.exception("Move %d of bulk request failed (game %s)", index, move.game_id)
+                failed = status_code != 200 or not content["moveSuccess"]
+            await results.put({"index": index, "status": status_code, **content})
+
+    async def stream():
+        tasks = [asyncio.create_task(play_game(moves)) for moves in games.values()]
+        try:
+            for _ in bulk.moves:
+                yield gomoku_codec.dumps(await results.get()) + b"\n"
+        finally:
+            for task in tasks: # The client went away: stop the games not done yet
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+async def play_move(game: GomokuGame, move: MoveRequest, ai_difficulty: str | None, pondered_move=None):
     message = ""
     human_move_made_successfully = False
     ai_move_made_this_turn = False # To track if AI made a move this turn
+    search_stats = None
 
     if game.game_over:
         message = "Game is already over."
@@ -76,7 +493,7 @@ async def api_make_move(move: MoveRequest):
             if human_move_made_successfully:
                 if game.check_win():
                     game.game_over = True
-                    message = f"Player {get_game_state_dict(game)['currentPlayer']} wins!"
+                    message = f"Player {get_game_state_dict(game, game_id=move.game_id)['currentPlayer']} wins!"
                 elif game.check_draw():
                     game.game_over = True
                     message = "It's a draw!"
@@ -87,21 +504,20 @@ async def api_make_move(move: MoveRequest):
                         ai_move_made = False # Reset for AI's attempt
 
                         if not game.game_over: # Check if game didn't end from human's move
-                            if game.ai_difficulty == "Easy":
-                                ai_move_made = game.make_ai_move_easy()
+                            if pondered_move is not None:
+                                ai_move_made = game.make_move(*pondered_move)
                                 ai_move_made_this_turn = True
-                            elif game.ai_difficulty == "Medium": # Matching "Medium" from frontend
-                                ai_move_made = game.make_ai_move_normal()
-                                ai_move_made_this_turn = True
-                            elif game.ai_difficulty == "Hard": # New condition
-                                ai_move_made = game.make_ai_move_hard()
+                            elif ai_difficulty in AI_MOVES:
+                                # Searches run off the event loop so other requests keep being served
+                                ai_move_made, search_stats = await asyncio.to_thread(
+                                    run_ai_move, game, ai_difficulty, move.include_stats)
                                 ai_move_made_this_turn = True
                             # else: # No other difficulties defined yet
                             
                             if ai_move_made:
                                 if game.check_win(): # AI wins
                                     game.game_over = True
-                                    message = f"Player {get_game_state_dict(game)['currentPlayer']} (AI) wins!"
+                                    message = f"Player {get_game_state_dict(game, game_id=move.game_id)['currentPlayer']} (AI) wins!"
                                 elif game.check_draw(): # Draw after AI move
                                     game.game_over = True
                                     message = "It's a draw!"
@@ -122,7 +538,7 @@ async def api_make_move(move: MoveRequest):
             else: # Human move failed (already caught by pre-checks, but as fallback)
                 message = "Invalid move." # Should be more specific if possible
     
-    response_state = get_game_state_dict(game)
+    response_state = get_game_state_dict(game, game_id=move.game_id)
     
     # Ensure message from win/draw takes precedence
     if "wins!" not in message.lower() and "draw!" not in message.lower():
@@ -137,13 +553,243 @@ async def api_make_move(move: MoveRequest):
 
 
     response_state["moveSuccess"] = human_move_made_successfully
+    if ai_move_made_this_turn and ai_difficulty != game.ai_difficulty:
+        response_state["aiDifficultyUsed"] = ai_difficulty # Overloaded tier fell back to a cheaper one
+    if search_stats is not None:
+        response_state["searchStats"] = search_stats.as_dict()
+    if pondered_move is not None:
+        response_state["aiPondered"] = True # The AI's move was searched before the request arrived
     return response_state
 
+class UndoRequest(BaseModel):
+    game_id: str = Field(DEFAULT_GAME_ID, pattern=GAME_ID_PATTERN)
+
+@app.post("/api/undo")
+async def api_undo(undo: UndoRequest):
+    """
+    Takes back the last move, and in 1P games the AI's reply along with the human's move,
+    so the human is to move again. The AI's caches are keyed by position, so replaying the
+    same moves afterwards is answered from them.
+    """
+    async with get_game_lock(undo.game_id):
+        game = load_game(undo.game_id)
+        loaded_version = game.version
+        undone = []
+        while (move := game.undo_move()) is not None:
+            undone.append(move)
+            if game.game_mode != "1P" or game.current_player == 'X':
+                break
+        if not undone:
+            response_state = get_game_state_dict(game, game_id=undo.game_id)
+            response_state.update(message="No move to take back.", undoneMoves=[])
+            return response_state
+        store.save(undo.game_id, game, loaded_version)
+        if history is not None:
+            history.take_back(undo.game_id, len(game.moves))
+        track_activity(undo.game_id, game)
+        if ponderer is not None:
+            ponderer.cancel(undo.game_id)
+            if game.game_mode == "1P" and game.ai_difficulty in PONDERED_DIFFICULTIES and game.moves:
+                ponderer.start(undo.game_id, game, AI_MOVES[game.ai_difficulty])
+        response_state = get_game_state_dict(game, game_id=undo.game_id)
+        response_state.update(message="Move taken back." if len(undone) == 1 else "Moves taken back.",
+                              undoneMoves=[list(move) for move in undone])
+        return response_state
+
 @app.post("/api/new_game")
 async def api_new_game(settings: NewGameRequest):
     """Resets the game to its initial state with new settings."""
-    game.reset_game(game_mode=settings.game_mode, ai_difficulty=settings.ai_difficulty)
-    return get_game_state_dict(game)
+    async with get_game_lock(settings.game_id):
+        if ponderer is not None:
+            ponderer.cancel(settings.game_id)
+        try:
+            game = store.load(settings.game_id)
+        except GameNotFound:
+            game = GomokuGame(game_mode=settings.game_mode, ai_difficulty=settings.ai_difficulty)
+            try:
+                store.create(game, settings.game_id)
+                log_new_game(settings.game_id, game)
+                track_activity(settings.game_id, game)
+                return get_game_state_dict(game, game_id=settings.game_id)
+            except GameExists: # Created concurrently by another worker; reset that one instead
+                game = store.load(settings.game_id)
+        loaded_version = game.version
+        game.reset_game(game_mode=settings.game_mode, ai_difficulty=settings.ai_difficulty)
+        store.save(settings.game_id, game, loaded_version)
+        log_new_game(settings.game_id, game)
+        track_activity(settings.game_id, game)
+        return get_game_state_dict(game, game_id=settings.game_id)
+
+class AnalyzeRequest(BaseModel):
+    game_id: str = Field(DEFAULT_GAME_ID, pattern=GAME_ID_PATTERN)
+    k: int = Field(3, ge=1, le=20) # Number of best moves to return
+    depth: int | None = Field(None, ge=1, le=8) # Defaults to the Hard AI's search depth
+    time_budget: float = Field(2.0, gt=0, le=30.0) # Seconds
+    node_budget: int | None = Field(None, ge=1)
+
+# Hash tables of recently analysed games, so repeated hints on a game reuse earlier searches.
+# They are per process: a game analysed by another worker starts with an empty table.
+ANALYSIS_TABLES_MAX = 64
+ANALYSIS_TABLE_ENTRIES = 200000
+analysis_tables = OrderedDict() # game_id -> TranspositionTable, least recently used first
+
+def get_analysis_table(game_id: str):
+    table = analysis_tables.pop(game_id, None)
+    if table is None:
+        table = TranspositionTable(ANALYSIS_TABLE_ENTRIES)
+    analysis_tables[game_id] = table
+    while len(analysis_tables) > ANALYSIS_TABLES_MAX:
+        analysis_tables.popitem(last=False)
+    return table
+
+@app.post("/api/analyze")
+async def api_analyze(settings: AnalyzeRequest, request: Request):
+    """Returns the k best moves for the player to move, with scores and principal variations.
+
+    The game is not changed. Scores are from the point of view of the player to move.
+    """
+    game = load_game(settings.game_id)
+    table = get_analysis_table(settings.game_id)
+    # Analysis is a Hard-strength search, so it takes a Hard slot (or is rejected when overloaded)
+    async with ai_scheduler.admit("Hard", get_session_key(request, settings.game_id)):
+        analysis = await asyncio.to_thread(call_profiled, game.analyze, settings.k, settings.depth, settings.node_budget,
+                                           settings.time_budget, table)
+    result = analysis.as_dict()
+    result.update(gameId=settings.game_id, version=game.version,
+                  currentPlayer="Black" if game.current_player == 'X' else "White")
+    return result
+
+class SolveRequest(BaseModel):
+    game_id: str = Field(DEFAULT_GAME_ID, pattern=GAME_ID_PATTERN)
+    # A puzzle position to solve instead of the game's, in the encodings of /api/analyze_batch
+    board: str | None = Field(None, max_length=40000)
+    moves: list[int] | None = None
+    board_size: int = Field(15, ge=5, le=200)
+    to_move: str | None = Field(None, pattern="^[XO]$")
+    node_budget: int = Field(100000, ge=1, le=5000000)
+    time_budget: float = Field(2.0, gt=0, le=30.0) # Seconds
+    vcf_only: bool = False # Only look for wins by continuous fours
+
+@app.post("/api/solve")
+async def api_solve(puzzle: SolveRequest, request: Request):
+    """Solves a game's position (or a puzzle position) for the player to move: forced win, forced loss or unknown.
+
+    "move" is the winning move, or for "unknown" a move the solver could not refute.
+    """
+    if puzzle.board is not None or puzzle.moves is not None:
+        try:
+            game = gomoku_batch.build_position(puzzle.model_dump(include={"board", "moves", "board_size", "to_move"},
+                                                                 exclude_none=True))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        game = load_game(puzzle.game_id)
+    async with ai_scheduler.admit("Hard", get_session_key(request, puzzle.game_id)):
+        solution = await asyncio.to_thread(call_profiled, game.solve, puzzle.node_budget, puzzle.time_budget, puzzle.vcf_only)
+    result = solution.as_dict()
+    result.update(currentPlayer="Black" if game.current_player == 'X' else "White")
+    return result
+
+BATCH_MAX_BOARD_SIZE = 25
+
+class BatchPosition(BaseModel):
+    id: str | int | None = None
+    # Up to 25x25: a search node costs time in proportion to the board's area, and the time
+    # budget is checked every 64 nodes, so larger boards could overrun it by seconds
+    board: str | None = Field(None, min_length=5 * 5, max_length=BATCH_MAX_BOARD_SIZE ** 2) # Compact board string
+    moves: list[int] | None = None # Cell indices in play order
+    board_size: int = Field(15, ge=5, le=BATCH_MAX_BOARD_SIZE) # For moves
+    to_move: str | None = Field(None, pattern="^[XO]$")
+    k: int | None = Field(None, ge=1, le=20)
+    depth: int | None = Field(None, ge=1, le=6)
+    time_budget: float | None = Field(None, gt=0, le=10.0)
+    node_budget: int | None = Field(None, ge=1)
+
+class BatchAnalyzeRequest(BaseModel):
+    positions: list[BatchPosition] = Field(max_length=10000)
+    k: int = Field(1, ge=1, le=20)
+    depth: int = Field(2, ge=1, le=6)
+    time_budget: float = Field(1.0, gt=0, le=10.0) # Seconds per position
+    node_budget: int | None = Field(None, ge=1)
+
+@app.post("/api/analyze_batch")
+async def api_analyze_batch(batch: BatchAnalyzeRequest, request: Request):
+    """
+    Analyses many positions in parallel; streams one NDJSON result line per position as it finishes.
+    Each position holds a slot of the scheduler's Batch tier while it is analysed, so batches
+    share the machine with interactive players; a position that cannot get one in time, or
+    whose analysis fails, has an "error" result and the others are still answered.
+    """
+    items = [position.model_dump(exclude_none=True) for position in batch.positions]
+    session = get_session_key(request, f"batch-{id(batch)}") # Anonymous batches take turns with each other
+    results = gomoku_batch.analyze_batch_async(items, get_batch_pool(), BATCH_WORKERS,
+                                               admit=lambda: ai_scheduler.admit("Batch", session),
+                                               k=batch.k, depth=batch.depth,
+                                               time_budget=batch.time_budget, node_budget=batch.node_budget)
+    async def stream():
+        async for result in results:
+            yield gomoku_codec.dumps(result) + b"\n"
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+class ResumeRequest(BaseModel):
+    game_id: str = Field(pattern=GAME_ID_PATTERN)
+    record_id: int | None = None # Defaults to the game id's newest record
+
+async def flush_history():
+    """Makes moves still queued in this process visible to history reads."""
+    if history is None:
+        raise HTTPException(status_code=404, detail="Game history is disabled")
+    if not await asyncio.to_thread(history.flush, HISTORY_FLUSH_TIMEOUT):
+        raise HTTPException(status_code=503, detail="Game history is not keeping up, please retry shortly")
+
+async def get_history_record(game_id: str, record_id: int | None):
+    """Returns (record, is_newest_record_of_the_game_id)."""
+    await flush_history()
+    records = history.records(game_id)
+    for record in reversed(records):
+        if record_id is None or record["recordId"] == record_id:
+            return record, record is records[-1]
+    raise HTTPException(status_code=404, detail=f"No history for game {game_id}")
+
+@app.get("/api/history/{game_id}")
+async def api_get_history(game_id: str):
+    """Lists the games played under a game id, oldest first."""
+    await flush_history()
+    return {"gameId": game_id, "records": history.records(game_id)}
+
+@app.get("/api/history/{game_id}/moves")
+async def api_stream_moves(game_id: str, record_id: int | None = None):
+    """Streams a game's moves for replay, one JSON object per line."""
+    record, _ = await get_history_record(game_id, record_id)
+    board_size = record["boardSize"]
+
+    def lines():
+        for ply, (row, col) in enumerate(history.iter_moves(record["recordId"])):
+            yield gomoku_codec.dumps({"ply": ply, "row": row, "col": col, "player": 'X' if ply % 2 == 0 else 'O',
+                                      "cell": row * board_size + col}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/resume")
+async def api_resume_game(settings: ResumeRequest):
+    """Restores a game from its move log, e.g. after a restart with the in-memory store."""
+    async with get_game_lock(settings.game_id):
+        record, is_latest = await get_history_record(settings.game_id, settings.record_id)
+        moves = list(history.iter_moves(record["recordId"]))
+        game = rebuild_game(record, moves)
+        if ponderer is not None:
+            ponderer.cancel(settings.game_id)
+        try:
+            current = store.load(settings.game_id)
+            game.version = current.version + 1 # Keep versions (and ETags) moving forward
+            store.save(settings.game_id, game, current.version)
+        except GameNotFound:
+            store.create(game, settings.game_id)
+        if not is_latest: # Continuing an older game: give it a record of its own so new moves land there
+            log_new_game(settings.game_id, game)
+            log_moves(settings.game_id, game, 0)
+        track_activity(settings.game_id, game)
+        return get_game_state_dict(game, game_id=settings.game_id)
 
 # To run this app (from the terminal, assuming uvicorn is installed):
 # uvicorn gomoku_web_app:app --reload
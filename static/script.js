@@ -20,6 +20,13 @@ document.addEventListener('DOMContentLoaded', () => {
     let boardData = [];   // To store the game board state
     let boardSize = 15; // Default, will be updated from backend
 
+    // Each browser tab plays its own game; the id survives page reloads within the tab
+    let gameId = sessionStorage.getItem('gomokuGameId');
+    if (!gameId) {
+        gameId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : `g${Date.now()}${Math.random().toString(36).slice(2)}`;
+        sessionStorage.setItem('gomokuGameId', gameId);
+    }
+
     let currentGameMode = '1P'; // Default to 1P
     let currentDifficulty = 'Easy'; // Default to Easy
 
@@ -72,7 +79,11 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function fetchGameStateAndDraw() {
         try {
-            const response = await fetch('/api/game_state');
+            const response = await fetch(`/api/game_state?game_id=${encodeURIComponent(gameId)}`);
+            if (response.status === 404) { // First visit in this tab: the game does not exist yet
+                await startNewGame();
+                return;
+            }
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
@@ -189,7 +200,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     canvas.addEventListener('click', async (event) => {
         // Fetch current game state to check if game is over before processing click
-        const currentStateResponse = await fetch('/api/game_state');
+        const currentStateResponse = await fetch(`/api/game_state?game_id=${encodeURIComponent(gameId)}`);
         const currentState = await currentStateResponse.json();
         if (currentState.gameOver) {
             // Optionally, provide feedback e.g. alert("Game is over. Please start a new game.");
@@ -217,7 +228,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ row: clickedRow, col: clickedCol }),
+                    body: JSON.stringify({ row: clickedRow, col: clickedCol, game_id: gameId }),
                 });
                 if (!response.ok) {
                     // Try to get error message from backend if available
@@ -249,7 +260,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    newGameButton.addEventListener('click', async () => {
+    async function startNewGame() {
         // Log selected mode and difficulty
         console.log(`Starting new game: Mode=${currentGameMode}, Difficulty=${currentDifficulty}`);
 
@@ -270,7 +281,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 // Send mode and difficulty to backend
                 body: JSON.stringify({ 
                     game_mode: currentGameMode, 
-                    ai_difficulty: currentDifficulty 
+                    ai_difficulty: currentDifficulty,
+                    game_id: gameId
                 }),
             });
             if (!response.ok) {
@@ -286,7 +298,9 @@ document.addEventListener('DOMContentLoaded', () => {
             console.error("Failed to start new game:", error);
             gameStatusElement.textContent = "Failed to start new game.";
         }
-    });
+    }
+
+    newGameButton.addEventListener('click', startNewGame);
 
     // Initial UI State Setup
     updateModeSelectionState(); // Call once to set initial state of difficulty div visibility
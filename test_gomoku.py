@@ -1,5 +1,7 @@
 import unittest
-from gomoku import GomokuGame, DEFAULT_BOARD_SIZE
+from gomoku import (GomokuGame, SearchStats, TranspositionTable, board_hash, board_symmetries,
+                    MATE_THRESHOLD, DEFAULT_BOARD_SIZE)
+from gomoku_trace import SearchTracer
 
 class TestGomoku(unittest.TestCase):
     def test_create_board(self):
@@ -134,6 +136,28 @@ class TestGomoku(unittest.TestCase):
         self.assertFalse(game_small_full.check_win(), "Small full board should not have O as winner for this pattern")
         self.assertTrue(game_small_full.check_draw(), "Small full board should be a draw")
 
+    def test_dead_cells_and_early_draw(self):
+        game = GomokuGame(board_size=5)
+        # Every column, diagonal and row but the last holds both players
+        for c in range(5):
+            game.board[0][c] = 'X' if c % 2 == 0 else 'O'
+            game.board[1][c] = 'O' if c % 2 == 0 else 'X'
+        for r, c, symbol in [(2, 0, 'X'), (2, 2, 'O'), (3, 0, 'O'), (3, 1, 'X'), (4, 0, 'X')]:
+            game.board[r][c] = symbol
+        self.assertEqual(game.live_cells(), [(4, c) for c in range(1, 5)])
+        self.assertFalse(game.check_draw())
+
+        # The AIs only play live cells
+        game.current_player = 'O'
+        self.assertTrue(game.make_ai_move_hard())
+        self.assertEqual(game.moves[-1][0], 4)
+        game.board[4][game.moves[-1][1]] = ' '
+        self.assertTrue(game.make_ai_move_normal())
+        self.assertEqual(game.moves[-1][0], 4)
+
+        self.assertEqual(game.live_cells(), [])
+        self.assertTrue(game.check_draw(), "No five is possible any more, with 6 cells still empty")
+
 
     def test_check_win_edge_cases(self):
         game = GomokuGame()
@@ -721,6 +745,176 @@ class TestGomoku(unittest.TestCase):
         game.board = [['O','X','O'],['X','O','X'],['O','X','O']]
         self.assertFalse(game.make_ai_move_hard(), "AI should not move on a full board (returns False or falls back and returns False)")
 
+    def test_search_stats(self):
+        game = GomokuGame(board_size=5, game_mode="1P", ai_difficulty="Hard")
+        game.SEARCH_DEPTH = 3 # Cutoffs need a minimizing node below a maximizing one
+        game.board[2][2] = 'O'
+        symmetries = board_symmetries(game.board)
+        moved, stats = game.make_ai_move_hard(collect_stats=True)
+        self.assertTrue(moved)
+        self.assertIsInstance(stats, SearchStats)
+        self.assertEqual(stats.nodes, game.nodes_searched)
+        self.assertEqual(sorted(stats.nodes_by_ply), [0, 1, 2, 3])
+        # One root move per class of moves the board's 8 symmetries make equivalent, in each of the three iterations,
+        # and once more for each class found to tie with the best in the last one
+        tied_classes = {min(t(*move) for t in symmetries) for move in game.last_move_choices}
+        self.assertEqual(stats.nodes_by_ply[1], 5 * 3 + len(tied_classes) - 1)
+        self.assertEqual(sum(stats.nodes_by_ply.values()), stats.nodes + 1) # Plus the root
+        self.assertLessEqual(stats.first_move_cutoffs, stats.beta_cutoffs)
+        self.assertGreater(stats.beta_cutoffs, 0)
+        # Leaves are the last ply of every iteration: all of ply 3, and some of plies 1 and 2
+        self.assertGreater(stats.leaves, stats.nodes_by_ply[3])
+        self.assertLess(stats.leaves, stats.nodes_by_ply[1] + stats.nodes_by_ply[2] + stats.nodes_by_ply[3])
+        self.assertEqual(len(stats.effective_branching_factors), 3)
+        self.assertGreater(stats.elapsed, 0)
+        self.assertIn("firstMoveCutoffRate", stats.as_dict())
+        self.assertIsNone(game._search_stats, "Collection should stop with the search")
+
+        # Without collect_stats the return value is unchanged
+        game = GomokuGame(board_size=5, game_mode="1P", ai_difficulty="Medium")
+        self.assertIs(game.make_ai_move_normal(), True)
+        moved, stats = game.make_ai_move_easy(collect_stats=True)
+        self.assertTrue(moved)
+        self.assertEqual(stats.nodes, 0)
+
+    def test_hard_ai_symmetric_positions(self):
+        board = [[' '] * 7 for _ in range(7)]
+        self.assertEqual(len(board_symmetries(board)), 8)
+        board[3][3] = 'X'
+        self.assertEqual(len(board_symmetries(board)), 8)
+        board[3][4] = 'O'
+        self.assertEqual(len(board_symmetries(board)), 2, "Only the top-bottom reflection is left")
+        board[4][3] = 'O'
+        self.assertEqual([t(3, 4) for t in board_symmetries(board)], [(3, 4), (4, 3)])
+
+        played = set()
+        for _ in range(40):
+            game = GomokuGame(board_size=7, game_mode="1P", ai_difficulty="Hard")
+            game.SEARCH_DEPTH = 1
+            game.SOLVER_NODES = 0
+            for c in (2, 3, 4):
+                game.board[3][c] = 'X'
+            game.current_player = 'O'
+            tracer = SearchTracer()
+            self.assertTrue(game.make_ai_move_hard(tracer=tracer))
+            self.assertEqual(len(tracer.root.children), 9 + 2 + 3, "One of each class of the 46 empty cells")
+            played.add(game.moves[-1])
+        self.assertEqual(played, {(3, 1), (3, 5)}, "Both ends of the three are blocked, picked at random")
+
+    def test_hard_ai_search_is_exact(self):
+        # Null windows, aspiration windows and the shared root alpha must not change the result
+        game = GomokuGame(board_size=6, game_mode="1P", ai_difficulty="Hard")
+        game.SEARCH_DEPTH = 3
+        game.SOLVER_NODES = 0
+        for r, c, symbol in [(2, 2, 'O'), (2, 3, 'X'), (3, 3, 'O'), (1, 1, 'X'), (4, 4, 'O')]:
+            game.board[r][c] = symbol
+        board = [row[:] for row in game.board]
+        self.assertTrue(game.make_ai_move_hard())
+        pruned_nodes = game.nodes_searched
+
+        game._root_depth = game.SEARCH_DEPTH
+        game.nodes_searched = 0
+        scores = {}
+        for r, c in [(r, c) for r in range(6) for c in range(6) if board[r][c] == ' ']:
+            after = [row[:] for row in board]
+            after[r][c] = 'X'
+            scores[(r, c)] = game._minimax(2, False, -float('inf'), float('inf'), after, 'X')
+        full_window_nodes = game.nodes_searched
+        self.assertEqual(scores[game.moves[-1]], max(scores.values()))
+        self.assertLess(pruned_nodes, full_window_nodes)
+
+    def test_analyze(self):
+        game = GomokuGame(board_size=9)
+        for c in range(1, 4): game.board[4][c] = 'X' # Open three for the player to move
+        game.board[0][0] = 'O'; game.board[8][8] = 'O'
+        board_before = [row[:] for row in game.board]
+        version_before = game.version
+
+        analysis = game.analyze(k=3, depth=2)
+        self.assertEqual(game.board, board_before, "Analysis must not change the game")
+        self.assertEqual(game.version, version_before)
+        self.assertEqual(len(analysis.lines), 3)
+        self.assertIn(analysis.best_move, [(4, 0), (4, 4)], "Making an open four is best")
+        scores = [score for _, score, _ in analysis.lines]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        for move, _, pv in analysis.lines:
+            self.assertEqual(pv[0], move)
+        self.assertTrue(analysis.complete)
+        self.assertEqual(analysis.depth, 2)
+
+        # Asking again is answered from the game's table without searching
+        again = game.analyze(k=2, depth=2)
+        self.assertEqual(again.nodes, 0)
+        self.assertEqual(again.lines, analysis.lines[:2])
+
+    def test_analyze_wins_and_budgets(self):
+        game = GomokuGame(board_size=9)
+        for c in range(4): game.board[4][c] = 'O'
+        game.current_player = 'O'
+        analysis = game.analyze(k=1, depth=3, tt=TranspositionTable())
+        self.assertEqual(analysis.best_move, (4, 4))
+        self.assertGreater(analysis.lines[0][1], MATE_THRESHOLD)
+        self.assertTrue(analysis.complete)
+        self.assertIsNone(game.transposition_table, "A table passed in is used instead of the game's")
+
+        game = GomokuGame(board_size=9)
+        game.board[4][4] = 'O'
+        analysis = game.analyze(k=2, depth=4, node_budget=200)
+        self.assertFalse(analysis.complete)
+        self.assertLessEqual(analysis.nodes, 201)
+        self.assertLess(analysis.depth, 4)
+
+        analysis = GomokuGame(board_size=9).analyze(k=1, node_budget=10)
+        self.assertEqual(analysis.depth, 0)
+        self.assertIsNotNone(analysis.best_move, "Moves scored before the budget ran out are still returned")
+
+        game = GomokuGame(board_size=5)
+        game.board = [list(row) for row in ("XXOOX", "OOXXO", "XXOOX", "OOXXO", "XXOOX")] # Full, without a five
+        analysis = game.analyze()
+        self.assertEqual((analysis.lines, analysis.best_move), ([], None))
+        self.assertTrue(analysis.complete)
+
+    def test_transposition_table_limit(self):
+        table = TranspositionTable(max_entries=2)
+        for key in range(3):
+            table.put(key, 1, 0, TranspositionTable.EXACT, None)
+        self.assertEqual(len(table), 2)
+        self.assertIsNone(table.get(0), "The oldest entry is dropped")
+        self.assertEqual(table.get(2), (1, 0, TranspositionTable.EXACT, None))
+        self.assertEqual((table.probes, table.hits), (2, 1))
+        self.assertEqual(board_hash([[' ', 'X'], ['O', ' ']]), board_hash([[' ', 'X'], ['O', ' ']]))
+        self.assertNotEqual(board_hash([[' ', 'X'], ['O', ' ']]), board_hash([[' ', 'O'], ['X', ' ']]))
+
+
+    def test_undo_and_redo(self):
+        game = GomokuGame(board_size=9)
+        for move in [(4, 4), (4, 5), (3, 3)]:
+            game.make_move(*move)
+            game.switch_player()
+        version = game.version
+        position = [row[:] for row in game.board]
+        analysis = game.analyze(k=1, depth=2)
+        self.assertGreater(analysis.nodes, 0)
+
+        game.make_move(*analysis.best_move)
+        game.game_over = True
+        self.assertEqual(game.undo_move(), analysis.best_move)
+        self.assertEqual((game.current_player, game.game_over), ('O', False))
+        self.assertEqual(game.undo_move(), (3, 3))
+        self.assertEqual((game.current_player, game.moves), ('X', [(4, 4), (4, 5)]))
+        self.assertEqual(game.redo_move(), (3, 3))
+        self.assertEqual(game.board, position)
+        self.assertGreater(game.version, version)
+        game.switch_player() # Like make_move, redo_move leaves that to the caller
+        self.assertEqual(game.analyze(k=1, depth=2).nodes, 0, "The position's search result survives the takeback")
+
+        game.make_move(0, 0) # A new move drops the moves still to redo
+        self.assertIsNone(game.redo_move())
+        for _ in range(4):
+            game.undo_move()
+        self.assertIsNone(game.undo_move())
+        self.assertEqual(game.board, GomokuGame(board_size=9).board)
+
 
 if __name__ == '__main__':
     unittest.main()
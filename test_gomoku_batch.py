@@ -0,0 +1,64 @@
+import unittest
+import gomoku_codec
+import gomoku_batch
+from gomoku import GomokuGame
+
+def four_in_a_row_board():
+    game = GomokuGame(board_size=9)
+    for c in range(4):
+        game.board[4][c] = 'X'
+    game.board[0][0] = game.board[0][8] = game.board[8][0] = 'O'
+    return gomoku_codec.encode_board(game.board)
+
+class TestGomokuBatch(unittest.TestCase):
+    def test_build_position(self):
+        game = gomoku_batch.build_position({"moves": [40, 41, 31], "board_size": 9})
+        self.assertEqual(game.board[4][4], 'X')
+        self.assertEqual(game.board[4][5], 'O')
+        self.assertEqual(game.current_player, 'O', "O has fewer stones")
+        game = gomoku_batch.build_position({"board": four_in_a_row_board(), "to_move": "O"})
+        self.assertEqual((game.board_size_internal, game.current_player), (9, 'O'))
+        with self.assertRaises(ValueError):
+            gomoku_batch.build_position({"board": "..X"})
+        with self.assertRaises(ValueError):
+            gomoku_batch.build_position({"moves": [0, 0], "board_size": 9})
+        for item in ({"board": ""}, {"board": "." * 16}, {"moves": [], "board_size": 4}):
+            with self.assertRaises(ValueError):
+                gomoku_batch.build_position(item)
+
+    def test_inline_batch(self):
+        items = [{"id": "win", "board": four_in_a_row_board(), "to_move": "X"},
+                 {"id": "bad", "board": "?" * 81},
+                 {"moves": [40], "board_size": 9, "depth": 1, "k": 2}]
+        results = sorted(gomoku_batch.analyze_batch(items, workers=1, depth=2, time_budget=5.0),
+                         key=lambda result: result["index"])
+        self.assertEqual(results[0]["id"], "win")
+        self.assertEqual((results[0]["moves"][0]["row"], results[0]["moves"][0]["col"]), (4, 4))
+        self.assertIn("eval", results[0])
+        self.assertIn("error", results[1])
+        self.assertEqual(len(results[2]["moves"]), 2, "Per-item options override the batch defaults")
+        self.assertEqual(results[2]["depth"], 1)
+
+    def test_failing_items(self):
+        full = "XXOOXOOXXOXXOOXOOXXOXXOOX"
+        items = [{"moves": [40], "board_size": 9}, {"id": "broken", "moves": [40], "board_size": 9, "depth": "deep"},
+                 {"id": "full", "board": full}, {"board": ""}, {"moves": [41], "board_size": 9}]
+        for workers in (1, 2):
+            results = sorted(gomoku_batch.analyze_batch(items, workers=workers, depth=1, time_budget=5.0),
+                             key=lambda result: result["index"])
+            self.assertEqual([result["index"] for result in results], [0, 1, 2, 3, 4], "Every item has its result")
+            self.assertTrue(results[0]["moves"] and results[4]["moves"])
+            self.assertEqual(results[1]["id"], "broken")
+            self.assertIn("Analysis failed", results[1]["error"])
+            self.assertEqual((results[2]["moves"], results[2]["complete"]), ([], True))
+            self.assertIn("at least 5x5", results[3]["error"])
+
+    def test_process_pool(self):
+        items = [{"moves": [40 + i], "board_size": 9} for i in range(4)]
+        results = list(gomoku_batch.analyze_batch(items, workers=2, depth=1, time_budget=5.0))
+        self.assertEqual(sorted(result["index"] for result in results), [0, 1, 2, 3])
+        self.assertTrue(all(result["moves"] for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import gomoku_bench
+
+class TestGomokuBench(unittest.TestCase):
+    def test_corpus_positions_build(self):
+        corpus = gomoku_bench.load_corpus()
+        ids = [position["id"] for position in corpus["positions"]]
+        self.assertEqual(len(ids), len(set(ids)), "Position ids must be unique")
+        categories = {position["category"] for position in corpus["positions"]}
+        self.assertTrue({"opening", "midgame", "tactical", "near-full"} <= categories)
+        for position in corpus["positions"]:
+            game = gomoku_bench.build_game(position)
+            self.assertEqual(len(game.board), position["board_size"])
+            self.assertTrue(set(position["engines"]) <= set(gomoku_bench.ENGINES))
+            # Benchmark positions must still be in play
+            for player in ('X', 'O'):
+                game.current_player = player
+                self.assertFalse(game.check_win(), f"{position['id']} already has a winner")
+
+    def test_run_and_compare(self):
+        corpus = {"version": 1, "positions": [
+            {"id": "tiny", "category": "opening", "board_size": 5, "moves": [[2, 2]],
+             "engines": {"normal": {}, "check_win": {"repeat": 2}}},
+        ]}
+        results = gomoku_bench.run(corpus, repeat=1)
+        self.assertEqual([r["engine"] for r in results["results"]], ["normal", "check_win"])
+        normal = results["results"][0]
+        self.assertGreater(normal["nodes"], 0)
+        self.assertGreater(normal["peak_memory_bytes"], 0)
+
+        slower = {**results, "results": [dict(r, time_per_move_s=r["time_per_move_s"] * 2) for r in results["results"]]}
+        rows = gomoku_bench.compare(results, slower, threshold=0.5)
+        self.assertTrue(all(row["regression"] for row in rows))
+        self.assertFalse(any(row["regression"] for row in gomoku_bench.compare(results, results)))
+        with self.assertRaises(ValueError):
+            gomoku_bench.compare(results, dict(slower, corpus_version=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import unittest
+from gomoku import GomokuGame
+import gomoku_codec
+
+class TestGomokuCodec(unittest.TestCase):
+    def test_board_round_trip(self):
+        game = GomokuGame(board_size=5)
+        game.make_move(0, 0)
+        game.switch_player()
+        game.make_move(4, 3)
+        text = gomoku_codec.encode_board(game.board)
+        self.assertEqual(len(text), 25)
+        self.assertEqual(text[0], 'X')
+        self.assertEqual(text[4 * 5 + 3], 'O')
+        self.assertEqual(text.count('.'), 23)
+        self.assertEqual(gomoku_codec.decode_board(text, 5), game.board)
+
+    def test_decode_board_rejects_bad_input(self):
+        with self.assertRaises(ValueError):
+            gomoku_codec.decode_board('.' * 24, 5)
+        with self.assertRaises(ValueError):
+            gomoku_codec.decode_board('.' * 24 + 'Z', 5)
+
+    def test_moves_round_trip(self):
+        moves = [(7, 7), (0, 14), (14, 0)]
+        indices = gomoku_codec.encode_moves(moves, 15)
+        self.assertEqual(indices, [112, 14, 210])
+        self.assertEqual(gomoku_codec.decode_moves(indices, 15), moves)
+
+    def test_pack_moves(self):
+        moves = [(7, 7), (0, 14), (14, 0)]
+        packed = gomoku_codec.pack_moves(moves, 15)
+        self.assertEqual(len(packed), 3)
+        self.assertEqual(gomoku_codec.unpack_moves(packed, 15), moves)
+        big_moves = [(0, 1), (18, 18), (10, 3)] # 19x19 needs varints past index 127
+        packed = gomoku_codec.pack_moves(big_moves, 19)
+        self.assertEqual(len(packed), 5)
+        self.assertEqual(gomoku_codec.unpack_moves(packed, 19), big_moves)
+        with self.assertRaises(ValueError):
+            gomoku_codec.unpack_moves(packed[:-1], 19)
+
+    def test_encode_board_field(self):
+        game = GomokuGame(board_size=5)
+        game.make_move(1, 2)
+        self.assertEqual(gomoku_codec.encode_board_field(game, "full"), ("board", game.board))
+        self.assertEqual(gomoku_codec.encode_board_field(game, "moves"), ("moves", [7]))
+        key, value = gomoku_codec.encode_board_field(game, "compact")
+        self.assertEqual(key, "board")
+        self.assertEqual(value[7], 'X')
+        with self.assertRaises(ValueError):
+            gomoku_codec.encode_board_field(game, "png")
+
+    def test_dumps(self):
+        payload = {"board": "X..", "gameOver": False, "version": 3}
+        self.assertEqual(json.loads(gomoku_codec.dumps(payload)), payload)
+
+    def test_version_tracks_state_changes(self):
+        game = GomokuGame(board_size=5)
+        v0 = game.version
+        game.make_move(0, 0)
+        self.assertGreater(game.version, v0)
+        v1 = game.version
+        self.assertFalse(game.make_move(0, 0)) # Rejected moves do not change the state
+        self.assertEqual(game.version, v1)
+        game.switch_player()
+        self.assertGreater(game.version, v1)
+        v2 = game.version
+        game.game_over = True
+        self.assertGreater(game.version, v2)
+        v3 = game.version
+        game.reset_game()
+        self.assertGreater(game.version, v3) # Never reused, even across resets
+        self.assertEqual(game.moves, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
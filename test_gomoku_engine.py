@@ -0,0 +1,62 @@
+import io
+import time
+import unittest
+from gomoku_engine import GomocupEngine
+
+class TestGomokuEngine(unittest.TestCase):
+    def session(self, lines):
+        out = io.StringIO()
+        GomocupEngine(out).run(lines)
+        return out.getvalue().splitlines()
+
+    def test_protocol(self):
+        replies = self.session(["ABOUT", "INFO timeout_turn 200", "START 15", "BEGIN", "TURN 8,8",
+                                "TAKEBACK 8,8", "TAKEBACK 7,7", "OK?", "TURN 99,0", "END", "BEGIN"])
+        self.assertTrue(replies[0].startswith('name="'))
+        self.assertEqual(replies[1:3], ["OK", "7,7"])
+        x, y = map(int, replies[3].split(","))
+        self.assertNotIn((x, y), [(7, 7), (8, 8)])
+        self.assertEqual(replies[4:6], ["OK", "OK"])
+        self.assertTrue(replies[6].startswith("UNKNOWN"))
+        self.assertTrue(replies[7].startswith("ERROR"))
+        self.assertEqual(len(replies), 8, "Nothing is answered after END")
+        self.assertTrue(self.session(["START 3"])[0].startswith("ERROR"))
+        self.assertTrue(self.session(["BEGIN"])[0].startswith("ERROR"), "No game started")
+
+    def test_takeback(self):
+        out = io.StringIO()
+        engine = GomocupEngine(out)
+        engine.run(["START 15", "INFO timeout_turn 200", "BEGIN", "TURN 8,8"])
+        reply = out.getvalue().split()[-1]
+        engine.run([f"TAKEBACK {reply}", "TAKEBACK 8,8"])
+        self.assertEqual(out.getvalue().split()[-2:], ["OK", "OK"])
+        self.assertEqual(engine.game.moves, [(7, 7)])
+        self.assertEqual(sum(row.count(' ') for row in engine.game.board), 15 * 15 - 1)
+
+    def test_board_position(self):
+        # x,y,who with x the column: four of ours in column 5 must be completed...
+        replies = self.session(["START 15", "INFO timeout_turn 1000", "BOARD",
+                                "5,5,1", "5,6,1", "5,7,1", "5,8,1", "0,0,2", "1,0,2", "2,0,2", "DONE"])
+        self.assertIn(replies[1], ("5,4", "5,9"))
+        # ...and the opponent's four blocked when we have nothing better
+        replies = self.session(["START 15", "INFO timeout_turn 1000", "BOARD",
+                                "3,3,2", "4,3,2", "5,3,2", "6,3,2", "9,9,1", "DONE"])
+        self.assertIn(replies[1], ("2,3", "7,3"))
+
+    def test_time_limit(self):
+        engine = GomocupEngine(io.StringIO())
+        engine.run(["START 15", "INFO timeout_turn 500", "INFO timeout_match 60000", "BEGIN"])
+        self.assertAlmostEqual(engine.move_time(), 0.5 * 0.8 - 0.15)
+        engine.handle("INFO time_left 2000")
+        self.assertAlmostEqual(engine.move_time(), 0.05, "Never less than the fastest move")
+        engine.handle("INFO time_left 10000")
+        self.assertAlmostEqual(engine.move_time(), 10 / 25 * 0.8 - 0.15)
+        engine.handle("INFO time_left 300000")
+        for turn in ("8,8", "6,6", "9,7"):
+            started = time.perf_counter()
+            engine.handle(f"TURN {turn}")
+            self.assertLess(time.perf_counter() - started, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from gomoku_history import GameHistory, rebuild_game
+
+class TestGameHistory(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.history = GameHistory(os.path.join(tmpdir.name, "history.db"), flush_interval=0.01)
+        self.addCleanup(self.history.close)
+
+    def test_moves_are_logged_in_order(self):
+        self.history.start_game("g", 15, "2P", None)
+        self.history.record_moves("g", 0, [(7, 7)])
+        self.history.record_moves("g", 1, [(7, 8), (8, 8)])
+        self.history.finish_game("g", "X")
+        self.assertTrue(self.history.flush(timeout=5))
+        record = self.history.latest_record("g")
+        self.assertEqual(record["result"], "X")
+        self.assertIsNotNone(record["finished"])
+        self.assertEqual(list(self.history.iter_moves(record["recordId"])), [(7, 7), (7, 8), (8, 8)])
+        self.assertEqual(self.history.stats.moves_logged, 3)
+        self.assertEqual(self.history.stats.payload_bytes, 3) # One byte per move on 15x15
+
+    def test_batches_share_a_transaction(self):
+        self.history.start_game("g", 15)
+        for ply in range(50):
+            self.history.record_moves("g", ply, [divmod(ply, 15)])
+        self.history.flush(timeout=5)
+        self.assertLess(self.history.stats.transactions, 50)
+        self.assertGreater(self.history.stats.wal_bytes, 0)
+        self.assertGreater(self.history.stats.write_amplification, 0)
+
+    def test_failed_batch(self):
+        self.history.start_game("g", 15)
+        self.assertTrue(self.history.flush(timeout=5))
+        with mock.patch.object(self.history, "_insert_chunk", side_effect=sqlite3.OperationalError("disk I/O error")), \
+             self.assertLogs("gomoku_history", "ERROR"):
+            self.history.record_moves("g", 0, [(7, 7)])
+            self.assertTrue(self.history.flush(timeout=5), "Waiters of a failed batch are released")
+        self.history.record_moves("g", 0, [(7, 8)])
+        self.assertTrue(self.history.flush(timeout=5), "The writer goes on")
+        self.assertEqual(list(self.history.iter_moves(self.history.latest_record("g")["recordId"])), [(7, 8)])
+
+    def test_reset_game_id_gets_new_record(self):
+        self.history.start_game("g", 15)
+        self.history.record_moves("g", 0, [(0, 0)])
+        self.history.start_game("g", 15)
+        self.history.record_moves("g", 0, [(1, 1)])
+        self.history.flush(timeout=5)
+        first, second = self.history.records("g")
+        self.assertEqual(list(self.history.iter_moves(first["recordId"])), [(0, 0)])
+        self.assertEqual(list(self.history.iter_moves(second["recordId"])), [(1, 1)])
+
+    def test_duplicate_chunks_are_skipped(self):
+        self.history.start_game("g", 15)
+        self.history.record_moves("g", 0, [(0, 0), (0, 1)])
+        self.history.flush(timeout=5)
+        self.history.record_moves("g", 1, [(0, 1), (0, 2)]) # Overlaps the first chunk by one move
+        self.history.flush(timeout=5)
+        record = self.history.latest_record("g")
+        self.assertEqual(list(self.history.iter_moves(record["recordId"])), [(0, 0), (0, 1), (0, 2)])
+
+    def test_take_back(self):
+        self.history.start_game("g", 15)
+        self.history.record_moves("g", 0, [(0, 0), (0, 1), (0, 2)])
+        self.history.finish_game("g", "X")
+        self.history.flush(timeout=5)
+        self.history.take_back("g", 1) # Within a committed chunk
+        self.history.record_moves("g", 1, [(5, 5), (5, 6)])
+        self.history.take_back("g", 2) # Within a chunk of the same batch
+        self.history.record_moves("g", 2, [(6, 6)])
+        self.history.flush(timeout=5)
+        record = self.history.latest_record("g")
+        self.assertEqual(list(self.history.iter_moves(record["recordId"])), [(0, 0), (5, 5), (6, 6)])
+        self.assertIsNone(record["result"], "Taking back the last move reopens the game")
+        self.history.take_back("g", 0)
+        self.history.flush(timeout=5)
+        self.assertEqual(list(self.history.iter_moves(record["recordId"])), [])
+
+    def test_rebuild_game(self):
+        record = {"boardSize": 15, "gameMode": "2P", "aiDifficulty": None}
+        moves = []
+        for i in range(5):
+            moves.append((0, i)) # X
+            if i < 4:
+                moves.append((1, i)) # O
+        game = rebuild_game(record, moves)
+        self.assertTrue(game.game_over)
+        self.assertEqual(game.current_player, 'X')
+        self.assertEqual(game.moves, moves)
+        with self.assertRaises(ValueError):
+            rebuild_game(record, [(0, 0), (0, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import httpx
+
+_history_dir = tempfile.TemporaryDirectory()
+os.environ.setdefault("GOMOKU_HISTORY_DB", os.path.join(_history_dir.name, "history.db"))
+os.environ.setdefault("GOMOKU_SOLVED_DB", os.path.join(_history_dir.name, "solved.db"))
+import gomoku_loadtest
+
+class TestGomokuLoadTest(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(gomoku_loadtest.percentile(values, 50), 50)
+        self.assertEqual(gomoku_loadtest.percentile(values, 99), 99)
+        self.assertEqual(gomoku_loadtest.percentile([], 95), 0.0)
+
+    def test_parse_mix(self):
+        self.assertEqual(gomoku_loadtest.parse_mix("1P-Easy=3,2P"), {"1P-Easy": 3.0, "2P": 1.0})
+        with self.assertRaises(ValueError):
+            gomoku_loadtest.parse_mix("1P-Impossible=1")
+
+    def test_in_process_run(self):
+        report = asyncio.run(gomoku_loadtest.run_load_test(
+            players=3, duration=1.0, ramp_up=0.2, think_time=0, mix={"1P-Easy": 1, "2P": 1},
+            max_moves=5, seed=1))
+        endpoints = report["endpoints"]
+        self.assertGreater(endpoints["/api/new_game"]["requests"], 0)
+        self.assertGreater(endpoints["/api/make_move"]["requests"], 0)
+        self.assertEqual(endpoints["/api/make_move"]["error_rate"], 0.0)
+        self.assertLessEqual(endpoints["/api/make_move"]["p50_ms"], endpoints["/api/make_move"]["p99_ms"])
+        self.assertIn("/api/make_move", gomoku_loadtest.format_report(report))
+
+    def test_overloaded_server_is_not_hammered(self):
+        async def run():
+            transport = httpx.MockTransport(lambda request: httpx.Response(503, json={"retryAfter": 1}))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await gomoku_loadtest.LoadTest(client, players=2, duration=1.0, ramp_up=0, think_time=0,
+                                                      seed=1).run()
+        report = asyncio.run(run())
+        requests = report["endpoints"]["/api/new_game"]["requests"]
+        self.assertGreater(requests, 2)
+        self.assertLess(requests, 40, "Each player backs off after a failure")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from gomoku_metrics import Registry
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_and_gauge(self):
+        registry = Registry()
+        nodes = registry.counter("nodes_total", "Nodes.", labels=("difficulty",))
+        nodes.inc(5, difficulty="Hard")
+        nodes.inc(2, difficulty="Hard")
+        registry.gauge("games", "Games.", callback=lambda: 3)
+        text = registry.render()
+        self.assertIn("# TYPE nodes_total counter", text)
+        self.assertIn('nodes_total{difficulty="Hard"} 7', text)
+        self.assertIn("games 3", text)
+        with self.assertRaises(ValueError):
+            nodes.inc(1, level="Hard")
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            latency.observe(value)
+        text = registry.render()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn("latency_seconds_count 4", text)
+        self.assertIn("latency_seconds_sum 2.65", text)
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        registry.counter("c", "C.", labels=("route",)).inc(route='a"b\\c')
+        self.assertIn('c{route="a\\"b\\\\c"} 1', registry.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from gomoku import GomokuGame
+from gomoku_movecache import MoveCache, Position, canonical_position
+
+def make_board(stones, board_size=9):
+    board = [[' '] * board_size for _ in range(board_size)]
+    for r, c, symbol in stones:
+        board[r][c] = symbol
+    return board
+
+class TestGomokuMoveCache(unittest.TestCase):
+    def test_symmetric_positions_share_entries(self):
+        board = make_board([(2, 3, 'X'), (4, 4, 'O')])
+        mirrored = make_board([(2, 5, 'X'), (4, 4, 'O')]) # Left-right reflection
+        rotated = make_board([(3, 6, 'X'), (4, 4, 'O')]) # Quarter turn clockwise
+        self.assertEqual(canonical_position(board)[0], canonical_position(mirrored)[0])
+        self.assertEqual(canonical_position(board)[0], canonical_position(rotated)[0])
+        self.assertNotEqual(canonical_position(board)[0], canonical_position(make_board([(2, 3, 'O'), (4, 4, 'X')]))[0])
+
+        cache = MoveCache()
+        cache.put(Position(board, 'X', "Hard", (4, 2000)), [(2, 2)])
+        self.assertEqual(cache.get(Position(mirrored, 'X', "Hard", (4, 2000))), (2, 6))
+        self.assertEqual(cache.get(Position(rotated, 'X', "Hard", (4, 2000))), (2, 6))
+        self.assertIsNone(cache.get(Position(board, 'O', "Hard", (4, 2000))))
+        self.assertIsNone(cache.get(Position(board, 'X', "Medium")))
+        self.assertIsNone(cache.get(Position(board, 'X', "Hard", (2, 2000))), "The budget is part of the key")
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        self.assertAlmostEqual(cache.hit_rate, 0.4)
+
+    def test_equal_moves_and_eviction(self):
+        cache = MoveCache(max_entries=2)
+        boards = [make_board([(4, 4, 'X')]), make_board([(0, 0, 'X')]), make_board([(1, 0, 'X')])]
+        cache.put(Position(boards[0], 'O', "Medium"), [(3, 3), (3, 5), (5, 3), (5, 5)])
+        picked = {cache.get(Position(boards[0], 'O', "Medium")) for _ in range(100)}
+        self.assertEqual(picked, {(3, 3), (3, 5), (5, 3), (5, 5)}, "Every equally good move stays in play")
+
+        size_one = cache.memory_bytes
+        self.assertGreater(size_one, 0)
+        cache.put(Position(boards[1], 'O', "Medium"), [(1, 1)])
+        cache.get(Position(boards[0], 'O', "Medium")) # Now the most recently used
+        cache.put(Position(boards[2], 'O', "Medium"), [(1, 1)])
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(Position(boards[1], 'O', "Medium")), "Least recently used entry evicted")
+        self.assertIsNotNone(cache.get(Position(boards[0], 'O', "Medium")))
+        cache.clear()
+        self.assertEqual((len(cache), cache.memory_bytes), (0, 0))
+
+    def test_ai_move_choices(self):
+        game = GomokuGame(board_size=7)
+        game.SEARCH_DEPTH = 1
+        game.SOLVER_NODES = 0
+        for c in (2, 3, 4):
+            game.board[3][c] = 'X'
+        game.current_player = 'O'
+        self.assertTrue(game.make_ai_move_hard())
+        self.assertEqual(sorted(game.last_move_choices), [(3, 1), (3, 5)], "Symmetric moves are equally good")
+        self.assertIn(game.moves[-1], game.last_move_choices)
+        self.assertTrue(game.make_ai_move_normal())
+        self.assertIn(game.moves[-1], game.last_move_choices)
+
+    def test_normal_ai_wins_and_blocks(self):
+        game = GomokuGame(board_size=9)
+        for c in range(2, 6):
+            game.board[4][c] = 'O'
+        game.board[0][0] = 'X'
+        self.assertTrue(game.make_ai_move_normal()) # X must block either end of O's open four
+        self.assertEqual(sorted(game.last_move_choices), [(4, 1), (4, 6)])
+        game.undo_move()
+        game.current_player = 'O'
+        self.assertTrue(game.make_ai_move_normal()) # O wins at either end
+        self.assertEqual(sorted(game.last_move_choices), [(4, 1), (4, 6)])
+
+    def test_hard_ai_ties(self):
+        class FlatGame(GomokuGame): # Every position is even: every move ties
+            def _evaluate_board_state(self, board_state, ai_player_symbol):
+                return 0
+        game = FlatGame(board_size=7)
+        game.SEARCH_DEPTH = 2
+        game.SOLVER_NODES = 0
+        game.board[0][0], game.board[0][1] = 'X', 'O' # No symmetry
+        self.assertTrue(game.make_ai_move_hard())
+        self.assertEqual(len(game.last_move_choices), 7 * 7 - 2, "Not only the move found first")
+        self.assertIn(game.moves[-1], game.last_move_choices)
+
+
+if __name__ == '__main__':
+    unittest.main()
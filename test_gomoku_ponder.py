@@ -0,0 +1,75 @@
+import threading
+import unittest
+from gomoku import GomokuGame
+from gomoku_ponder import Ponderer
+
+def make_game(stones, board_size=9):
+    game = GomokuGame(board_size=board_size, game_mode="1P", ai_difficulty="Hard")
+    game.SEARCH_DEPTH = 2
+    for row, col in stones:
+        game.make_move(row, col)
+        game.switch_player()
+    return game
+
+class TestGomokuPonder(unittest.TestCase):
+    def ponderer(self, **options):
+        ponderer = Ponderer(**options)
+        self.addCleanup(ponderer.close)
+        return ponderer
+
+    def test_pondered_replies_are_answered(self):
+        ponderer = self.ponderer(time_budget=30.0, replies=2)
+        game = make_game([(4, 4), (4, 5), (3, 3)]) # O, the AI, has just moved; X is to move
+        ponderer.start("g", game, GomokuGame.make_ai_move_hard)
+        ponderer.wait_idle()
+
+        replies = [move for move, _, _ in make_game(game.moves).analyze(k=2, depth=1).lines]
+        for reply in replies:
+            answer = ponderer.take("g", game.moves + [reply])
+            self.assertIsNotNone(answer)
+            self.assertEqual(game.board[answer[0]][answer[1]], ' ')
+            self.assertNotEqual(answer, reply)
+        unexpected = next((r, c) for r in range(9) for c in range(9) if game.board[r][c] == ' ' and (r, c) not in replies)
+        self.assertIsNone(ponderer.take("g", game.moves + [unexpected]))
+        self.assertEqual((ponderer.hits, ponderer.misses), (2, 1))
+        self.assertEqual(game.moves, [(4, 4), (4, 5), (3, 3)], "The game itself is not touched")
+
+        ponderer.cancel("g")
+        self.assertIsNone(ponderer.take("g", game.moves + [replies[0]]))
+
+    def test_stops_when_busy_or_pondered_again(self):
+        busy = threading.Event()
+        ponderer = self.ponderer(time_budget=30.0, busy=busy.is_set)
+        game = make_game([(4, 4), (4, 5), (3, 3)])
+        game.SEARCH_DEPTH = 6 # Far too deep to finish: only busy can end it
+        started = threading.Event()
+
+        def make_ai_move(position):
+            started.set()
+            return GomokuGame.make_ai_move_hard(position)
+
+        ponderer.start("g", game, make_ai_move)
+        started.wait(10)
+        busy.set()
+        ponderer.wait_idle()
+        self.assertEqual(ponderer.cancelled, 1)
+        self.assertIsNone(ponderer.take("g", game.moves + [(5, 5)]))
+
+        # A newer position of the same game replaces the older one
+        busy.clear()
+        game.SEARCH_DEPTH = 1
+        ponderer.start("g", game, GomokuGame.make_ai_move_hard)
+        newer = make_game(game.moves)
+        newer.SEARCH_DEPTH = 1
+        newer.make_move(0, 0)
+        newer.switch_player()
+        newer.make_move(8, 8)
+        newer.switch_player()
+        ponderer.start("g", newer, GomokuGame.make_ai_move_hard)
+        ponderer.wait_idle()
+        reply = make_game(newer.moves).analyze(k=1, depth=1).lines[0][0]
+        self.assertIsNotNone(ponderer.take("g", newer.moves + [reply]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import asyncio
+import marshal
+import unittest
+from gomoku_profiling import ProfileBuffer, profile_thread, profiling_request
+
+def busy_work():
+    return sum(i * i for i in range(2000))
+
+def worker():
+    with profile_thread():
+        return busy_work()
+
+class TestGomokuProfiling(unittest.TestCase):
+    def test_worker_threads_are_profiled(self):
+        def event_loop_work():
+            return busy_work()
+
+        async def request():
+            with profiling_request() as profile:
+                event_loop_work()
+                await asyncio.to_thread(worker) # Copies the context, so the worker finds the profile
+            return profile.stats()
+        stats = asyncio.run(request())
+        functions = {name for _, _, name in stats.stats}
+        self.assertIn("busy_work", functions)
+        self.assertNotIn("event_loop_work", functions, "The event loop thread is shared by all requests")
+
+    def test_profile_thread_without_request(self):
+        self.assertEqual(worker(), busy_work())
+
+    def test_ring_buffer(self):
+        buffer = ProfileBuffer(capacity=2)
+        with profiling_request() as profile:
+            worker()
+        for path in ("/a", "/b", "/c"):
+            buffer.add("POST", path, 200, 0.0, 0.1, profile.stats())
+        self.assertEqual([record.path for record in buffer.list()], ["/c", "/b"])
+        self.assertIsNone(buffer.get(1))
+        record = buffer.get(3)
+        self.assertIn("busy_work", record.text(sort="tottime"))
+        self.assertEqual(marshal.loads(record.pstats_bytes()).keys(), profile.stats().stats.keys())
+        with self.assertRaises(ValueError):
+            record.text(sort="name; import os")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+import gomoku_records
+from gomoku_records import GameRecord, RecordFormatError, RecordReader, RecordWriter
+
+class TestGomokuRecords(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.path = os.path.join(self._dir.name, "games.bin")
+
+    def test_binary_round_trip(self):
+        records = [
+            GameRecord(15, [(7, 7), (7, 8), (0, 14)], 'X', {"black": "normal", "seed": "12"}),
+            GameRecord(9, [], None),
+            GameRecord(19, [(18, 18), (0, 0), (9, 10)], "draw"), # Varint moves
+        ]
+        with RecordWriter(self.path, buffer_size=16) as writer:
+            offsets = [writer.write(record) for record in records]
+        with RecordReader(self.path) as reader:
+            self.assertEqual(list(reader), records)
+            self.assertEqual(reader.read_at(offsets[2]), records[2])
+        self.assertEqual(offsets[0], len(gomoku_records.FILE_HEADER))
+        self.assertEqual(offsets[1] - offsets[0], 12 + len(b"black=normal\nseed=12") + 3, "One byte per move")
+
+        # Appending keeps the existing records; a torn tail is skipped
+        with RecordWriter(self.path) as writer:
+            writer.write(records[0])
+        with open(self.path, "ab") as f:
+            f.write(records[0].to_bytes()[:-1])
+        self.assertEqual(list(gomoku_records.read_records(self.path)), records + [records[0]])
+        self.assertEqual(list(gomoku_records.read_records(self.path, offsets[1])), records[:1])
+
+    def test_rejects_bad_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a record file")
+        with self.assertRaises(RecordFormatError):
+            RecordReader(self.path)
+        with open(self.path, "wb"):
+            pass
+        self.assertEqual(list(gomoku_records.read_records(self.path)), [])
+        with self.assertRaises(ValueError):
+            GameRecord(15, [], "white")
+        with self.assertRaises(ValueError):
+            GameRecord(15, [], tags={"a=b": "c"}).to_bytes()
+        for record in (GameRecord(0, []), GameRecord(256, []), GameRecord(9, [(9, 0)])):
+            with self.assertRaises(ValueError):
+                record.to_bytes()
+
+    def test_rejects_corrupt_records(self):
+        with open(self.path, "wb") as f:
+            f.write(gomoku_records.FILE_HEADER[:5])
+        with self.assertRaises(RecordFormatError):
+            RecordReader(self.path)
+        good = GameRecord(20, [(19, 19), (0, 1)]).to_bytes()
+        corrupt = [
+            good[:4] + b"\0" + good[5:], # Board size 0
+            good[:-1] + b"\x80", # Truncated varint
+            good[:-3] + bytes([0x90, 0x03, 0x01]), # 400: one past the last cell
+        ]
+        for data in corrupt:
+            with open(self.path, "wb") as f:
+                f.write(gomoku_records.FILE_HEADER + data)
+            with self.assertRaises(RecordFormatError):
+                list(gomoku_records.read_records(self.path))
+
+    def test_text_round_trip(self):
+        records = [
+            GameRecord(15, [(7, 7), (6, 8)] * 15, 'O', {"Event": 'self-play "A"'}),
+            GameRecord(30, [(29, 27)]),
+        ]
+        text = "\n".join(gomoku_records.format_text(record) for record in records)
+        self.assertIn('[Size "15"]\n[Result "O"]\n[Event "self-play \\"A\\""]\nh8 i7', text)
+        self.assertIn("ab30", text)
+        self.assertEqual(gomoku_records.parse_text(text), records)
+        self.assertEqual(gomoku_records.column_name(26), "aa")
+        self.assertEqual(gomoku_records.column_index("aa"), 26)
+
+        with self.assertRaises(RecordFormatError):
+            gomoku_records.parse_text('[Result "X"]\nh8')
+        with self.assertRaises(RecordFormatError):
+            gomoku_records.parse_text('[Size "9"]\nj10')
+        with self.assertRaises(RecordFormatError):
+            gomoku_records.parse_text('[Size "9"]\nh8 8h')
+
+    def test_cli(self):
+        text_path = os.path.join(self._dir.name, "games.txt")
+        with open(text_path, "w") as f:
+            f.write('[Size "15"]\n[Result "X"]\nh8 i9 h9\n\n[Size "9"]\ne5\n')
+        self.assertEqual(gomoku_records.main(["pack", text_path, self.path]), 0)
+        records = list(gomoku_records.read_records(self.path))
+        self.assertEqual([(r.board_size, r.result, len(r.moves)) for r in records], [(15, 'X', 3), (9, None, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+from gomoku_scheduler import AIScheduler, TierPolicy, SchedulerOverloaded, FALLBACK
+
+class TestAIScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_limit(self):
+        scheduler = AIScheduler({"Hard": TierPolicy(max_concurrent=2, max_queue=10, queue_timeout=5.0)})
+        running = 0
+        peak = 0
+
+        async def search():
+            nonlocal running, peak
+            async with scheduler.admit("Hard", "s") as granted:
+                self.assertEqual(granted, "Hard")
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(search() for _ in range(6)))
+        self.assertEqual(peak, 2)
+        self.assertEqual(scheduler.active(), 0)
+        self.assertEqual(scheduler.queue_depth(), 0)
+
+    async def test_queue_full_rejects_with_retry_hint(self):
+        scheduler = AIScheduler({"Hard": TierPolicy(max_concurrent=1, max_queue=0, queue_timeout=5.0)})
+        async with scheduler.admit("Hard", "a"):
+            with self.assertRaises(SchedulerOverloaded) as ctx:
+                async with scheduler.admit("Hard", "b"):
+                    pass
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+    async def test_queue_deadline(self):
+        scheduler = AIScheduler({"Hard": TierPolicy(max_concurrent=1, max_queue=5, queue_timeout=0.01)})
+        async with scheduler.admit("Hard", "a"):
+            with self.assertRaises(SchedulerOverloaded):
+                async with scheduler.admit("Hard", "b"):
+                    pass
+            self.assertEqual(scheduler.queue_depth(), 0)
+
+    async def test_fallback_to_cheaper_tier(self):
+        scheduler = AIScheduler({
+            "Hard": TierPolicy(max_concurrent=1, max_queue=0, queue_timeout=1.0, on_overload=FALLBACK, fallback="Easy"),
+            "Easy": TierPolicy(max_concurrent=1, max_queue=0, queue_timeout=1.0),
+        })
+        async with scheduler.admit("Hard", "a"):
+            async with scheduler.admit("Hard", "b") as granted:
+                self.assertEqual(granted, "Easy")
+
+    async def test_round_robin_across_sessions(self):
+        scheduler = AIScheduler({"Hard": TierPolicy(max_concurrent=1, max_queue=10, queue_timeout=5.0)})
+        order = []
+
+        async def search(session):
+            async with scheduler.admit("Hard", session):
+                order.append(session)
+                await asyncio.sleep(0)
+
+        async with scheduler.admit("Hard", "holder"):
+            # One session floods the queue before another session arrives
+            tasks = [asyncio.create_task(search("greedy")) for _ in range(3)]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(search("polite")))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        self.assertEqual(order[:2], ["greedy", "polite"])
+
+    def test_rejects_unknown_fallback(self):
+        with self.assertRaises(ValueError):
+            AIScheduler({"Hard": TierPolicy(1, 1, 1.0, on_overload=FALLBACK, fallback="Medium")})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+import gomoku_selfplay
+from gomoku import GomokuGame
+
+class TestGomokuSelfPlay(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.out = self._dir.name
+
+    def generate(self, out, games, **options):
+        options = dict(dict(workers=1, black="easy", white="normal", board_size=9, seed=7), **options)
+        return gomoku_selfplay.generate(out, games, **options)
+
+    def test_games_are_legal_and_reproducible(self):
+        summary = self.generate(self.out, 4)
+        self.assertEqual(summary["played"], 4)
+        records = sorted(gomoku_selfplay.iter_games(self.out))
+        self.assertEqual([record[0] for record in records], [0, 1, 2, 3])
+        for number, seed, board_size, result, black, white, moves in records:
+            self.assertEqual(seed, gomoku_selfplay.game_seed(7, number))
+            self.assertEqual((board_size, black, white), (9, "easy", "normal"))
+            game = GomokuGame(board_size=9)
+            for row, col in moves:
+                self.assertTrue(game.make_move(row, col))
+                game.switch_player()
+            if result in (gomoku_selfplay.RESULT_X, gomoku_selfplay.RESULT_O):
+                game.switch_player()
+                self.assertTrue(game.check_win())
+                self.assertEqual(game.current_player, 'X' if result == gomoku_selfplay.RESULT_X else 'O')
+
+        with tempfile.TemporaryDirectory() as other:
+            self.generate(other, 4, workers=2)
+            self.assertEqual(sorted(gomoku_selfplay.iter_games(other)), records, "Same seeds, same games")
+
+    def test_shards_and_resume(self):
+        summary = self.generate(self.out, 3, shard_bytes=1, index_every=1, workers=8) # One game per shard
+        self.assertEqual(summary["workers"], 3, "No more processes than games")
+        self.assertAlmostEqual(summary["games_per_second_per_core"], summary["games_per_second"] / 3)
+        resumed = self.generate(self.out, 3)
+        self.assertEqual((resumed["played"], resumed["workers"]), (0, 1), "Nothing left to play: no pool")
+        index = gomoku_selfplay.load_index(self.out)
+        self.assertEqual([shard["games"] for shard in index["shards"]], [1, 1, 1])
+
+        # A write torn by an interruption is dropped when resuming
+        with open(os.path.join(self.out, index["shards"][-1]["file"]), "ab") as f:
+            f.write(b"\x05\x00\x00")
+        summary = self.generate(self.out, 5, shard_bytes=1, index_every=1)
+        self.assertEqual((summary["played"], summary["resumed"]), (2, 3))
+        self.assertEqual(sorted(record[0] for record in gomoku_selfplay.iter_games(self.out)), [0, 1, 2, 3, 4])
+
+        with self.assertRaises(ValueError):
+            self.generate(self.out, 6, black="hard")
+
+    def test_opening_stones_must_fit(self):
+        with tempfile.TemporaryDirectory() as other:
+            with self.assertRaises(ValueError):
+                self.generate(other, 1, opening_stones=26) # Only the 5x5 cells around the centre are used
+            with self.assertRaises(ValueError):
+                self.generate(other, 1, board_size=5, opening_stones=26)
+            self.assertEqual(os.listdir(other), [], "Rejected before anything is written")
+            self.assertEqual(self.generate(other, 1, board_size=5, opening_stones=20)["played"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import time
+import unittest
+import gomoku_solvedb
+from gomoku import GomokuGame
+from gomoku_solvedb import SolvedPositions
+
+def make_board(xs, os, board_size=15):
+    board = [[' '] * board_size for _ in range(board_size)]
+    for r, c in xs:
+        board[r][c] = 'X'
+    for r, c in os:
+        board[r][c] = 'O'
+    return board
+
+class TestGomokuSolvedPositions(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.path = os.path.join(self._dir.name, "solved.db")
+
+    def open(self, **options):
+        db = SolvedPositions(self.path, **options)
+        self.addCleanup(db.close)
+        return db
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "Timed out")
+            time.sleep(0.01)
+
+    def test_single_writer_and_readers(self):
+        writer = self.open(writable=True, compact_every=3)
+        self.assertTrue(writer.writer)
+        self.assertFalse(self.open(writable=True).writer, "The lock allows one writer")
+        reader = self.open(refresh_interval=0)
+
+        boards = [make_board([(7, i)], [(0, i)]) for i in range(5)]
+        self.assertTrue(writer.record(boards[0], 'X', "win", (7, 7)))
+        self.assertFalse(reader.record(boards[0], 'X', "loss"))
+        self.assertEqual(writer.lookup(boards[0], 'X'), ("win", (7, 7)))
+        self.assertIsNone(writer.lookup(boards[0], 'O'), "The side to move is part of the key")
+        self.assertEqual(reader.lookup(boards[0], 'X'), ("win", (7, 7)), "Read from the log")
+
+        for board in boards[1:]: # The writer's thread compacts after the third entry
+            writer.record(board, 'O', "loss")
+        self.assertEqual(len(writer), 5)
+        self.wait_for(lambda: os.path.getsize(self.path) > gomoku_solvedb._TABLE_HEADER.size) # Compacted
+        for board in boards[1:]:
+            self.assertEqual(reader.lookup(board, 'O'), ("loss", None))
+        self.assertEqual(reader.lookup(boards[0], 'X'), ("win", (7, 7)), "Read from the table")
+
+        writer.record(boards[0], 'X', "draw") # A newer result replaces the old one when compacting
+        writer.compact()
+        self.assertEqual(reader.lookup(boards[0], 'X'), ("draw", None))
+        self.assertEqual(len(reader), 5)
+
+    def test_other_workers_record_through_the_writer(self):
+        writer = self.open(writable=True, refresh_interval=0.01)
+        worker = self.open(writable=True, refresh_interval=0)
+        self.assertFalse(worker.writer)
+        board = make_board([(7, 7)], [(0, 0)])
+        self.assertTrue(worker.record(board, 'X', "win", (7, 8)))
+        self.wait_for(lambda: writer.lookup(board, 'X') is not None)
+        self.assertEqual(worker.lookup(board, 'X'), ("win", (7, 8)))
+        worker.close()
+        self.assertEqual([name for name in os.listdir(self._dir.name) if ".pending." in name], [],
+                         "An emptied pending file is removed by its process")
+
+        # Entries left by a process that died are merged, and its file removed, on the next start
+        writer.close()
+        dead = os.path.join(self._dir.name, "solved.db.pending.999999999-1")
+        other = make_board([(3, 3)], [(0, 0)])
+        with open(dead, "wb") as f: # A loss for O, then an entry torn by the crash
+            f.write(gomoku_solvedb._ENTRY.pack(gomoku_solvedb.position_key(other, 'O'), 15, 2, 0xFFFF) + b"\x01")
+        writer = self.open(writable=True)
+        writer.compact()
+        self.assertEqual(writer.lookup(other, 'O'), ("loss", None))
+        self.assertFalse(os.path.exists(dead))
+
+    def test_survives_restarts_and_torn_writes(self):
+        board = make_board([(7, 7), (7, 8)], [(0, 0)])
+        db = SolvedPositions(self.path, writable=True)
+        db.record(board, 'O', "win", (1, 1))
+        db.close()
+        with open(self.path + ".log", "ab") as f:
+            f.write(b"\x01\x02\x03") # An entry torn by a crash
+        db = self.open(writable=True)
+        self.assertEqual(db.lookup(board, 'O'), ("win", (1, 1)))
+        db.record(board, 'X', "loss")
+        self.assertEqual(self.open().lookup(board, 'X'), ("loss", None))
+
+    def test_engines_use_it(self):
+        db = self.open(writable=True)
+        saved = GomokuGame.solved_positions
+        GomokuGame.solved_positions = db
+        self.addCleanup(setattr, GomokuGame, "solved_positions", saved)
+
+        # A proof by the Hard AI's solver is recorded...
+        game = GomokuGame(board_size=15)
+        game.board = make_board([(7, 6), (7, 7), (7, 8)], [(0, 0), (0, 1)])
+        game.make_ai_move_hard()
+        self.assertIn(game.moves[-1], [(7, 5), (7, 9)])
+        game.board[game.moves[-1][0]][game.moves[-1][1]] = ' '
+        self.assertEqual(db.lookup(game.board, 'X'), ("win", game.moves[-1]))
+
+        # ...and so are proofs found by the AIs' solver, not puzzles sent to solve()
+        puzzle = GomokuGame(board_size=15)
+        puzzle.board = make_board([(3, 3), (3, 4), (3, 5), (3, 6)], [(10, 10)])
+        self.assertEqual(puzzle.solve().result, "win")
+        self.assertIsNone(db.lookup(puzzle.board, 'X'))
+
+        # ...and then answered without any search, by both AIs
+        for make_ai_move in (GomokuGame.make_ai_move_hard, GomokuGame.make_ai_move_normal):
+            replay = GomokuGame(board_size=15)
+            replay.board = [row[:] for row in game.board]
+            self.assertTrue(make_ai_move(replay))
+            self.assertEqual(replay.moves, game.moves[-1:])
+            self.assertEqual(replay.nodes_searched, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from gomoku import GomokuGame
+from gomoku_solver import ThreatSolver, WIN, LOSS, UNKNOWN
+
+def make_game(xs, os, to_move='X', board_size=15):
+    game = GomokuGame(board_size=board_size)
+    for r, c in xs:
+        game.board[r][c] = 'X'
+    for r, c in os:
+        game.board[r][c] = 'O'
+    game.current_player = to_move
+    return game
+
+class TestGomokuSolver(unittest.TestCase):
+    def test_open_three_wins(self):
+        game = make_game([(7, 6), (7, 7), (7, 8)], [(0, 0), (0, 1)])
+        solution = game.solve()
+        self.assertEqual(solution.result, WIN)
+        self.assertIn(solution.move, [(7, 5), (7, 9)])
+        self.assertEqual(solution.pv[0], solution.move)
+        self.assertTrue(solution.complete)
+
+        # The defender can still block an open three
+        game.current_player = 'O'
+        solution = game.solve()
+        self.assertEqual(solution.result, UNKNOWN)
+        self.assertIn(solution.move, [(7, 4), (7, 5), (7, 9), (7, 10)])
+
+    def test_four_three_and_loss(self):
+        xs, os = [(7, 7), (7, 8), (8, 9), (9, 9), (5, 5)], [(6, 6), (10, 10), (0, 0)]
+        solution = make_game(xs, os).solve()
+        self.assertEqual(solution.result, WIN)
+        self.assertEqual(solution.move, (7, 9), "The only move making two open threes")
+
+        solution = make_game([(7, 6), (7, 7), (7, 8), (7, 9)], [(0, 0), (0, 1), (0, 3)], to_move='O').solve()
+        self.assertEqual(solution.result, LOSS, "An open four cannot be stopped")
+        self.assertIsNone(solution.move)
+
+    def test_vcf_and_counter_threats(self):
+        # Two open threes at once are no win by fours alone
+        game = make_game([(7, 7), (7, 8), (8, 9), (9, 9), (5, 5)], [(6, 6), (10, 10), (0, 0)])
+        self.assertEqual(game.solve(vcf_only=True).result, UNKNOWN)
+        self.assertEqual(make_game([(7, 6), (7, 7), (7, 8)], [(0, 0)]).solve(vcf_only=True).result, WIN)
+        # O's four has to be answered first, which ends X's attack
+        game = make_game([(7, 6), (7, 7), (7, 8)], [(0, 0), (0, 1), (0, 2), (0, 3)])
+        solution = game.solve()
+        self.assertNotEqual(solution.result, WIN)
+        self.assertEqual(make_game([(7, 6), (7, 7), (7, 8)], [(0, 1), (0, 2), (0, 3), (0, 4)]).solve().result,
+                         LOSS, "O's open four comes first")
+
+    def test_budgets(self):
+        game = make_game([(7, 7), (7, 8), (8, 9), (9, 9), (5, 5)], [(6, 6), (10, 10), (0, 0)], to_move='O')
+        solution = ThreatSolver().solve(game.board, 'O', node_budget=5)
+        self.assertEqual(solution.result, UNKNOWN)
+        self.assertFalse(solution.complete)
+        self.assertLessEqual(solution.nodes, 6)
+        solution = ThreatSolver(max_nodes=3).solve(game.board, 'O')
+        self.assertFalse(solution.complete, "Memory bound reached")
+
+    def test_defences_and_hard_ai(self):
+        game = make_game([(7, 6), (7, 7), (7, 8)], [(0, 0), (0, 1)], to_move='O')
+        defences = game._get_threat_solver().defences(game.board, 'O')
+        self.assertEqual(set(defences), {(7, 5), (7, 9)}, "Blocking further out still allows an open four")
+        self.assertIsNone(game._get_threat_solver().defences(make_game([(7, 7)], []).board, 'O'))
+
+        game.SEARCH_DEPTH = 1
+        game.make_ai_move_hard()
+        self.assertIn(game.moves[-1], defences)
+        game = make_game([(7, 6), (7, 7), (7, 8)], [(0, 0), (0, 1)])
+        game.make_ai_move_hard()
+        self.assertIn(game.moves[-1], [(7, 5), (7, 9)], "A forced win is played without searching")
+
+
+if __name__ == '__main__':
+    unittest.main()
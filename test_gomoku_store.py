@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from gomoku import GomokuGame
+from gomoku_store import (MemoryGameStore, SQLiteGameStore, RedisGameStore, LocalRedis,
+                          GameNotFound, GameExists, VersionConflict, store_from_url)
+
+class GameStoreTests:
+    """Behaviour every backend must share; mixed into one TestCase per backend."""
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def test_round_trip(self):
+        game = GomokuGame(game_mode="1P", ai_difficulty="Hard")
+        game.make_move(7, 7)
+        game.switch_player()
+        game.make_move(7, 8)
+        game_id = self.store.create(game)
+        loaded = self.store.load(game_id)
+        self.assertEqual(loaded.board, game.board)
+        self.assertEqual(loaded.moves, game.moves)
+        self.assertEqual(loaded.current_player, 'O')
+        self.assertEqual(loaded.version, game.version)
+        self.assertEqual(loaded.game_mode, "1P")
+        self.assertEqual(loaded.ai_difficulty, "Hard")
+        self.assertFalse(loaded.game_over)
+
+    def test_undo_redo_round_trip(self):
+        game = GomokuGame()
+        for row, col in [(7, 7), (7, 8), (8, 8)]:
+            game.make_move(row, col)
+            game.switch_player()
+        game.undo_move()
+        game.undo_move()
+        game_id = self.store.create(game)
+        loaded = self.store.load(game_id)
+        self.assertEqual(loaded.undone_moves, [(8, 8, 'X'), (7, 8, 'O')])
+        loaded_version = loaded.version
+        self.assertEqual(loaded.redo_move(), (7, 8))
+        self.store.save(game_id, loaded, loaded_version)
+        loaded = self.store.load(game_id)
+        self.assertEqual((loaded.moves, loaded.current_player), ([(7, 7), (7, 8)], 'O'))
+        self.assertEqual(loaded.redo_move(), (8, 8), "The rest of the redo stack survives another save")
+
+    def test_missing_and_duplicate_ids(self):
+        with self.assertRaises(GameNotFound):
+            self.store.load("nope")
+        self.store.create(GomokuGame(), "g1")
+        with self.assertRaises(GameExists):
+            self.store.create(GomokuGame(), "g1")
+        self.assertEqual(self.store.count(), 1)
+        self.store.delete("g1")
+        self.assertEqual(self.store.count(), 0)
+
+    def test_optimistic_concurrency(self):
+        game_id = self.store.create(GomokuGame())
+        first = self.store.load(game_id)
+        second = self.store.load(game_id)
+        loaded_version = first.version
+        first.make_move(0, 0)
+        self.store.save(game_id, first, loaded_version)
+        second.make_move(1, 1)
+        with self.assertRaises(VersionConflict):
+            self.store.save(game_id, second, loaded_version)
+        self.assertEqual(self.store.load(game_id).board[0][0], 'X')
+        self.assertEqual(self.store.load(game_id).board[1][1], ' ')
+
+
+class TestMemoryGameStore(GameStoreTests, unittest.TestCase):
+    def make_store(self):
+        return MemoryGameStore()
+
+    def test_lru_eviction(self):
+        store = MemoryGameStore(max_games=2)
+        store.create(GomokuGame(), "a")
+        store.create(GomokuGame(), "b")
+        store.load("a") # "b" is now the least recently used
+        store.create(GomokuGame(), "c")
+        self.assertEqual(store.evictions, 1)
+        store.load("a")
+        with self.assertRaises(GameNotFound):
+            store.load("b")
+
+
+class TestSQLiteGameStore(GameStoreTests, unittest.TestCase):
+    def make_store(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "games.db")
+        return SQLiteGameStore(self.path)
+
+    def test_shared_between_store_instances(self):
+        # Two instances on one file stand in for two worker processes
+        other = SQLiteGameStore(self.path)
+        self.assertEqual(other.epoch, self.store.epoch)
+        game_id = self.store.create(GomokuGame())
+        game = other.load(game_id)
+        loaded_version = game.version
+        game.make_move(3, 3)
+        other.save(game_id, game, loaded_version)
+        self.assertEqual(self.store.load(game_id).board[3][3], 'X')
+        mode = self.store._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+
+class TestRedisGameStore(GameStoreTests, unittest.TestCase):
+    def make_store(self):
+        return RedisGameStore(LocalRedis())
+
+
+class TestStoreFromUrl(unittest.TestCase):
+    def test_urls(self):
+        self.assertIsInstance(store_from_url(None), MemoryGameStore)
+        self.assertIsInstance(store_from_url("memory://"), MemoryGameStore)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.assertIsInstance(store_from_url("sqlite:///" + os.path.join(tmpdir, "g.db")), SQLiteGameStore)
+        with self.assertRaises(ValueError):
+            store_from_url("ftp://example.com")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import gomoku_tournament
+from gomoku import GomokuGame
+
+class WeakEvaluationGame(GomokuGame):
+    def _evaluate_board_state(self, board_state, ai_player_symbol):
+        return 0
+
+class TestGomokuTournament(unittest.TestCase):
+    def test_parse_engine(self):
+        engine = gomoku_tournament.parse_engine("analyze:time=0.5,class=test_gomoku_tournament:WeakEvaluationGame")
+        self.assertEqual((engine["kind"], engine["time"]), ("analyze", 0.5))
+        self.assertIs(gomoku_tournament.engine_class(engine), WeakEvaluationGame)
+        self.assertEqual(gomoku_tournament.parse_engine("hard:depth=2")["depth"], 2)
+        for bad in ("medium", "hard:speed=3", "analyze"):
+            with self.assertRaises(ValueError):
+                gomoku_tournament.parse_engine(bad)
+
+    def test_sprt(self):
+        sprt = gomoku_tournament.SPRT(elo0=0, elo1=10)
+        self.assertIsNone(sprt.decision())
+        for _ in range(300):
+            sprt.add(1.0)
+            sprt.add(0.5)
+        self.assertEqual(sprt.decision(), "H1")
+        elo, margin = sprt.elo()
+        self.assertGreater(elo - margin, 0)
+
+        sprt = gomoku_tournament.SPRT(elo0=0, elo1=10)
+        for _ in range(4000):
+            sprt.add(1.0)
+            sprt.add(0.0)
+        self.assertEqual(sprt.decision(), "H0", "Equal engines do not pass")
+        self.assertAlmostEqual(sprt.elo()[0], 0.0)
+
+        sprt = gomoku_tournament.SPRT()
+        for _ in range(3):
+            sprt.add(1.0)
+        self.assertIsNone(sprt.decision(), "A few wins decide nothing")
+        self.assertTrue(0 < sprt.llr() < sprt.upper)
+
+    def test_paired_openings(self):
+        first = gomoku_tournament.play_match_game((0, True, gomoku_tournament.parse_engine("easy"),
+                                                   gomoku_tournament.parse_engine("normal"), 9, 4, 3))
+        self.assertEqual(first[:2], (0, True))
+        self.assertIn(first[2], (0.0, 0.5, 1.0))
+        self.assertEqual(gomoku_tournament.opening(3, 0, 9, 4), gomoku_tournament.opening(3, 0, 9, 4))
+        self.assertEqual(len(set(gomoku_tournament.opening(3, 1, 9, 4))), 4)
+
+    def test_run_match(self):
+        summary = gomoku_tournament.run_match("easy", "normal", max_games=4, workers=1, board_size=9, seed=2,
+                                              unequal_budgets=True)
+        self.assertEqual(summary["games"], 4)
+        self.assertEqual(summary["wins"] + summary["draws"] + summary["losses"], 4)
+        self.assertGreater(summary["avg_think_ms_b"], 0)
+        self.assertIn("Elo", gomoku_tournament.format_summary(summary))
+
+    def test_equal_budgets(self):
+        parse = gomoku_tournament.parse_engine
+        gomoku_tournament.check_budgets(parse("analyze:time=0.2,class=test_gomoku_tournament:WeakEvaluationGame"),
+                                        parse("analyze:time=0.2"))
+        for a, b in [("analyze:time=0.2", "analyze:time=0.4"), ("easy", "normal"), ("hard:depth=2", "hard:depth=2"),
+                     ("analyze:time=0.2,depth=2", "analyze:time=0.2")]:
+            with self.assertRaises(ValueError):
+                gomoku_tournament.check_budgets(parse(a), parse(b))
+        with self.assertRaises(ValueError):
+            gomoku_tournament.run_match("easy", "normal", max_games=2, workers=1, board_size=9)
+
+    def test_small_boards(self):
+        for stones in (1, 4, 25):
+            moves = gomoku_tournament.opening(1, 0, 5, stones)
+            self.assertEqual(len(set(moves)), stones)
+            self.assertTrue(all(0 <= r < 5 and 0 <= c < 5 for r, c in moves))
+        with self.assertRaises(ValueError):
+            gomoku_tournament.opening(1, 0, 5, 26)
+        result = gomoku_tournament.play_match_game((0, True, gomoku_tournament.parse_engine("easy"),
+                                                    gomoku_tournament.parse_engine("easy"), 5, 4, 1))
+        self.assertIn(result[2], (0.0, 0.5, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import unittest
+from gomoku import GomokuGame, SearchBudgetExceeded
+from gomoku_trace import SearchTracer
+
+class TestSearchTracer(unittest.TestCase):
+    def setUp(self):
+        self.game = GomokuGame(board_size=4, game_mode="1P", ai_difficulty="Hard")
+        self.game.SEARCH_DEPTH = 3
+        self.game.board[1][1] = 'O'
+        self.tracer = SearchTracer(max_depth=2)
+        self.assertTrue(self.game.make_ai_move_hard(tracer=self.tracer))
+
+    def test_tree_shape(self):
+        root = self.tracer.root
+        self.assertEqual(root.nodes, self.game.nodes_searched)
+        # One root move per class of moves mirrored by the diagonal through (1, 1), in each of the three iterations
+        self.assertEqual(len(root.children), 9 * 3)
+        self.assertEqual(sum(child.nodes for child in root.children), root.nodes)
+        depths = {len(path) for path, _ in self.tracer.spans()}
+        self.assertEqual(depths, {1, 2, 3}, "Spans stop at max_depth plies below the root")
+        first = root.children[-9] # The first move of the deepest iteration
+        self.assertEqual(first.player, 'X')
+        self.assertEqual(first.children[0].player, 'O')
+        self.assertIsNotNone(first.score)
+        self.assertIsNone(self.game._search_tracer)
+
+    def test_chrome_trace(self):
+        trace = json.loads(json.dumps(self.tracer.chrome_trace(), allow_nan=False))
+        events = trace["traceEvents"]
+        self.assertEqual(len(events), len(list(self.tracer.spans())))
+        self.assertEqual(events[0]["name"], "root")
+        self.assertEqual(events[1]["args"]["alpha"], "-inf")
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+
+    def test_collapsed_stacks(self):
+        lines = self.tracer.collapsed_stacks("nodes").splitlines()
+        total = sum(int(line.rsplit(" ", 1)[1]) for line in lines)
+        self.assertEqual(total, self.game.nodes_searched)
+        self.assertTrue(all(line.startswith("root;") for line in lines))
+        with self.assertRaises(ValueError):
+            self.tracer.collapsed_stacks("calls")
+
+    def test_stopped_search(self):
+        game = GomokuGame(board_size=7, game_mode="1P", ai_difficulty="Hard")
+        game.SEARCH_DEPTH = 3
+        game.SOLVER_NODES = 0
+        game.board[3][3] = 'O'
+        game.should_stop = lambda: game.nodes_searched > 100
+        tracer = SearchTracer(max_depth=3)
+        with self.assertRaises(SearchBudgetExceeded):
+            game.make_ai_move_hard(tracer=tracer)
+        self.assertEqual(tracer._stack, [], "Spans the search was inside are closed")
+        self.assertEqual(tracer.root.nodes, game.nodes_searched)
+        json.dumps(tracer.chrome_trace())
+
+
+if __name__ == '__main__':
+    unittest.main()
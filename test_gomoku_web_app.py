@@ -0,0 +1,378 @@
+import concurrent.futures
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+
+_history_dir = tempfile.TemporaryDirectory()
+os.environ["GOMOKU_HISTORY_DB"] = os.path.join(_history_dir.name, "history.db")
+os.environ["GOMOKU_SOLVED_DB"] = os.path.join(_history_dir.name, "solved.db")
+import gomoku_batch
+import gomoku_web_app
+from gomoku import GomokuGame
+from gomoku_ponder import Ponderer
+from gomoku_scheduler import AIScheduler, TierPolicy
+
+class TestGomokuWebApp(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(gomoku_web_app.app)
+        self.client.post("/api/new_game", json={"game_mode": "2P"})
+
+    def test_game_state_encodings(self):
+        self.client.post("/api/make_move", json={"row": 7, "col": 7})
+        full = self.client.get("/api/game_state").json()
+        self.assertEqual(full["board"][7][7], 'X')
+        compact = self.client.get("/api/game_state", params={"encoding": "compact"}).json()
+        self.assertEqual(compact["boardEncoding"], "compact")
+        self.assertEqual(len(compact["board"]), 15 * 15)
+        self.assertEqual(compact["board"][7 * 15 + 7], 'X')
+        moves = self.client.get("/api/game_state", params={"encoding": "moves"}).json()
+        self.assertEqual(moves["moves"], [7 * 15 + 7])
+        self.assertNotIn("board", moves)
+        self.assertEqual(self.client.get("/api/game_state", params={"encoding": "png"}).status_code, 422)
+
+    def test_game_state_etag(self):
+        first = self.client.get("/api/game_state")
+        etag = first.headers["etag"]
+        not_modified = self.client.get("/api/game_state", headers={"If-None-Match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+        # Each encoding is a separate representation with its own tag
+        other = self.client.get("/api/game_state", params={"encoding": "compact"}, headers={"If-None-Match": etag})
+        self.assertEqual(other.status_code, 200)
+        self.client.post("/api/make_move", json={"row": 0, "col": 0})
+        changed = self.client.get("/api/game_state", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+
+        # A game recreated under the same id starts its versions over, but not its tags
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "etag"})
+        etag = self.client.get("/api/game_state", params={"game_id": "etag"}).headers["etag"]
+        gomoku_web_app.store.delete("etag")
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "etag"})
+        recreated = self.client.get("/api/game_state", params={"game_id": "etag"}, headers={"If-None-Match": etag})
+        self.assertEqual(recreated.status_code, 200)
+
+    def test_ai_reply_in_1p_mode(self):
+        self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Easy"})
+        state = self.client.post("/api/make_move", json={"row": 7, "col": 7}).json()
+        self.assertTrue(state["moveSuccess"])
+        self.assertEqual(sum(row.count('O') for row in state["board"]), 1)
+        self.assertEqual(state["currentPlayer"], "Black")
+        self.assertNotIn("searchStats", state)
+
+    def test_search_stats_on_request(self):
+        self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Medium", "game_id": "stats"})
+        state = self.client.post("/api/make_move",
+                                 json={"row": 7, "col": 7, "game_id": "stats", "include_stats": True}).json()
+        self.assertGreater(state["searchStats"]["nodes"], 0)
+        self.assertIn("nodesByPly", state["searchStats"])
+
+    def test_overloaded_ai_returns_503(self):
+        saved = gomoku_web_app.ai_scheduler
+        gomoku_web_app.ai_scheduler = AIScheduler({"Easy": TierPolicy(max_concurrent=0, max_queue=0, queue_timeout=1.0)})
+        try:
+            self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Easy"})
+            response = self.client.post("/api/make_move", json={"row": 7, "col": 7})
+        finally:
+            gomoku_web_app.ai_scheduler = saved
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("retry-after", response.headers)
+        # The human's move must not have been applied
+        self.assertEqual(self.client.get("/api/game_state").json()["board"][7][7], ' ')
+
+    def test_pondering(self):
+        def shallow_hard(game, **options):
+            game.SEARCH_DEPTH = 1
+            return GomokuGame.make_ai_move_hard(game, **options)
+
+        ponderer = Ponderer(30.0, busy=lambda: gomoku_web_app.ai_scheduler.active() > 0)
+        self.addCleanup(ponderer.close)
+        with mock.patch.object(gomoku_web_app, "ponderer", ponderer), \
+             mock.patch.object(gomoku_web_app, "move_cache", None), \
+             mock.patch.dict(gomoku_web_app.AI_MOVES, {"Hard": shallow_hard}):
+            self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Hard", "game_id": "ponder"})
+            state = self.client.post("/api/make_move", json={"row": 7, "col": 7, "game_id": "ponder"}).json()
+            self.assertNotIn("aiPondered", state)
+            ponderer.wait_idle()
+
+            reply = gomoku_web_app.store.load("ponder").analyze(k=1, depth=1).lines[0][0]
+            state = self.client.post("/api/make_move", json={"row": reply[0], "col": reply[1], "game_id": "ponder"}).json()
+            self.assertTrue(state["aiPondered"])
+            self.assertEqual(sum(row.count('O') for row in state["board"]), 2)
+            self.assertEqual(ponderer.hits, 1)
+
+    def test_move_cache(self):
+        cache = gomoku_web_app.move_cache
+        hits = cache.hits
+        for game_id, (row, col) in [("cache-a", (3, 4)), ("cache-b", (4, 3))]: # Mirror images
+            self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Medium", "game_id": game_id})
+            state = self.client.post("/api/make_move", json={"row": row, "col": col, "game_id": game_id}).json()
+        self.assertEqual(cache.hits, hits + 1)
+        reply = [(r, c) for r in range(15) for c in range(15) if state["board"][r][c] == 'O']
+        self.assertEqual(len(reply), 1)
+        self.assertLessEqual(max(abs(reply[0][0] - 4), abs(reply[0][1] - 3)), 1)
+        metrics = self.client.get("/metrics").text
+        self.assertIn("gomoku_move_cache_hit_ratio", metrics)
+        self.assertIn("gomoku_move_cache_bytes", metrics)
+
+    def test_undo(self):
+        self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Medium", "game_id": "undo"})
+        self.client.post("/api/make_move", json={"row": 7, "col": 7, "game_id": "undo"})
+        before = self.client.post("/api/make_move", json={"row": 3, "col": 3, "game_id": "undo"}).json()
+        state = self.client.post("/api/undo", json={"game_id": "undo"}).json()
+        self.assertEqual(len(state["undoneMoves"]), 2, "The AI's reply goes with the human's move")
+        self.assertEqual(state["undoneMoves"][1], [3, 3])
+        self.assertEqual(state["currentPlayer"], "Black")
+        self.assertEqual(sum(row.count('X') + row.count('O') for row in state["board"]), 2)
+        gomoku_web_app.history.flush(timeout=5)
+        record = gomoku_web_app.history.latest_record("undo")
+        self.assertEqual(len(list(gomoku_web_app.history.iter_moves(record["recordId"]))), 2)
+
+        # Replaying the move is answered from the move cache
+        hits = gomoku_web_app.move_cache.hits
+        after = self.client.post("/api/make_move", json={"row": 3, "col": 3, "game_id": "undo"}).json()
+        self.assertEqual(gomoku_web_app.move_cache.hits, hits + 1)
+        self.assertEqual(sum(row.count('O') for row in after["board"]), sum(row.count('O') for row in before["board"]))
+
+        self.client.post("/api/make_move", json={"row": 0, "col": 0}) # Default 2P game: one move at a time
+        self.assertEqual(self.client.post("/api/undo", json={}).json()["undoneMoves"], [[0, 0]])
+        nothing = self.client.post("/api/undo", json={}).json()
+        self.assertEqual((nothing["undoneMoves"], nothing["message"]), ([], "No move to take back."))
+
+    def test_games_are_independent(self):
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "alice"})
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "bob"})
+        state = self.client.post("/api/make_move", json={"row": 1, "col": 1, "game_id": "alice"}).json()
+        self.assertEqual(state["gameId"], "alice")
+        bob = self.client.get("/api/game_state", params={"game_id": "bob"}).json()
+        self.assertEqual(bob["board"][1][1], ' ')
+        self.assertEqual(self.client.get("/api/game_state", params={"game_id": "carol"}).status_code, 404)
+        self.assertEqual(self.client.post("/api/make_move", json={"row": 0, "col": 0, "game_id": "bad id!"}).status_code, 422)
+
+    def test_concurrent_change_returns_409(self):
+        store = gomoku_web_app.store
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "race"})
+        real_load = store.load
+        def load_then_lose_race(game_id):
+            game = real_load(game_id)
+            other = real_load(game_id) # Another worker moves first
+            loaded_version = other.version
+            other.make_move(0, 0)
+            store.save(game_id, other, loaded_version)
+            return game
+        store.load = load_then_lose_race
+        try:
+            response = self.client.post("/api/make_move", json={"row": 5, "col": 5, "game_id": "race"})
+        finally:
+            del store.load
+        self.assertEqual(response.status_code, 409)
+        board = self.client.get("/api/game_state", params={"game_id": "race"}).json()["board"]
+        self.assertEqual(board[0][0], 'X')
+        self.assertEqual(board[5][5], ' ')
+
+    def test_history_replay_and_resume(self):
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "kept"})
+        for row, col in [(7, 7), (8, 8), (7, 8)]:
+            self.client.post("/api/make_move", json={"row": row, "col": col, "game_id": "kept"})
+        response = self.client.get("/api/history/kept/moves")
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([(m["row"], m["col"]) for m in lines], [(7, 7), (8, 8), (7, 8)])
+        self.assertEqual(lines[1]["player"], 'O')
+
+        gomoku_web_app.store.delete("kept") # As if the in-memory store was lost in a restart
+        self.assertEqual(self.client.get("/api/game_state", params={"game_id": "kept"}).status_code, 404)
+        state = self.client.post("/api/resume", json={"game_id": "kept"}).json()
+        self.assertEqual(state["board"][7][8], 'X')
+        self.assertEqual(state["currentPlayer"], "White")
+        self.client.post("/api/make_move", json={"row": 9, "col": 9, "game_id": "kept"})
+        records = self.client.get("/api/history/kept").json()["records"]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(self.client.post("/api/resume", json={"game_id": "nobody"}).status_code, 404)
+
+        with mock.patch.object(gomoku_web_app.history, "flush", return_value=False): # The writer is stuck
+            self.assertEqual(self.client.get("/api/history/kept").status_code, 503)
+            self.assertEqual(self.client.post("/api/resume", json={"game_id": "kept"}).status_code, 503)
+
+    def test_analyze(self):
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "hint"})
+        for row, col in [(7, 7), (0, 0), (7, 8), (0, 2), (7, 9), (0, 4), (7, 10)]:
+            self.client.post("/api/make_move", json={"row": row, "col": col, "game_id": "hint"})
+        before = self.client.get("/api/game_state", params={"game_id": "hint"}).json()
+        result = self.client.post("/api/analyze", json={"game_id": "hint", "k": 2, "depth": 1}).json()
+        self.assertEqual(len(result["moves"]), 2)
+        self.assertEqual({(m["row"], m["col"]) for m in result["moves"]}, {(7, 6), (7, 11)}, "Both blocks of the four")
+        self.assertEqual(result["currentPlayer"], "White")
+        self.assertEqual(self.client.get("/api/game_state", params={"game_id": "hint"}).json(), before)
+        again = self.client.post("/api/analyze", json={"game_id": "hint", "k": 2, "depth": 1}).json()
+        self.assertEqual(again["nodes"], 0, "A repeated hint is answered from the hash table")
+        self.assertEqual(again["moves"], result["moves"])
+        self.assertEqual(self.client.post("/api/analyze", json={"game_id": "hint", "k": 0}).status_code, 422)
+
+    def test_solve(self):
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "puzzle"})
+        for row, col in [(7, 6), (0, 0), (7, 7), (0, 2), (7, 8), (14, 14)]:
+            self.client.post("/api/make_move", json={"row": row, "col": col, "game_id": "puzzle"})
+        result = self.client.post("/api/solve", json={"game_id": "puzzle"}).json()
+        self.assertEqual(result["result"], "win")
+        self.assertIn((result["move"]["row"], result["move"]["col"]), [(7, 5), (7, 9)])
+        self.assertEqual(result["currentPlayer"], "Black")
+
+        board = "." * 12 + "OOOO" + "." * 65 # O to move with a four on a 9x9 board
+        result = self.client.post("/api/solve", json={"board": board, "to_move": "O", "node_budget": 10}).json()
+        self.assertEqual(result["result"], "win")
+        self.assertEqual(result["pv"], [[1, 2]])
+        self.assertEqual(self.client.post("/api/solve", json={"board": "." * 80}).status_code, 400)
+        self.assertEqual(self.client.post("/api/solve", json={"game_id": "puzzle", "time_budget": 60}).status_code, 422)
+
+    def test_analyze_batch(self):
+        board = "." * 40 + "X" + "." * 40
+        response = self.client.post("/api/analyze_batch", json={
+            "positions": [{"id": "a", "board": board}, {"id": "b", "moves": [40, 41], "board_size": 9}],
+            "depth": 1, "time_budget": 5.0})
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        results = {result["id"]: result for result in map(json.loads, response.text.splitlines())}
+        self.assertEqual(set(results), {"a", "b"})
+        self.assertEqual(results["a"]["toMove"], "O")
+        self.assertTrue(results["b"]["moves"])
+        too_slow = self.client.post("/api/analyze_batch", json={"positions": [{"board": board, "time_budget": 60}]})
+        self.assertEqual(too_slow.status_code, 422)
+        too_big = self.client.post("/api/analyze_batch", json={"positions": [{"moves": [0], "board_size": 26}]})
+        self.assertEqual(too_big.status_code, 422)
+        for small in ("", "." * 16):
+            response = self.client.post("/api/analyze_batch", json={"positions": [{"board": small}]})
+            self.assertEqual(response.status_code, 422)
+
+        # A position that cannot be analysed gets an error line; the others are still answered
+        response = self.client.post("/api/analyze_batch", json={"positions": [
+            {"id": "a", "board": board}, {"id": "full", "board": "XXOOXOOXXOXXOOXOOXXOXXOOX"},
+            {"id": "win", "board": "XXXX." + "." * 15 + "OOOO."}], "depth": 1, "time_budget": 5.0})
+        results = {result["id"]: result for result in map(json.loads, response.text.splitlines())}
+        self.assertEqual(set(results), {"a", "full", "win"})
+        self.assertEqual(results["full"]["moves"], [])
+        self.assertTrue(results["win"]["moves"])
+
+        analyze_position = gomoku_batch.analyze_position
+        def crashing_worker(index, item, defaults): # As if the worker process died on the second item
+            if index == 1:
+                raise RuntimeError("worker died")
+            return analyze_position(index, item, defaults)
+        with concurrent.futures.ThreadPoolExecutor(2) as pool, \
+             mock.patch.object(gomoku_web_app, "batch_pool", pool), \
+             mock.patch.object(gomoku_batch, "analyze_position", crashing_worker):
+            response = self.client.post("/api/analyze_batch", json={"positions": [
+                {"id": "a", "board": board}, {"id": "b", "board": board}, {"id": "c", "board": board}], "depth": 1})
+        results = {result["id"]: result for result in map(json.loads, response.text.splitlines())}
+        self.assertEqual(set(results), {"a", "b", "c"})
+        self.assertIn("worker died", results["b"]["error"])
+        self.assertTrue(results["a"]["moves"] and results["c"]["moves"])
+
+        # Positions go through the scheduler like AI moves do
+        saved = gomoku_web_app.ai_scheduler
+        gomoku_web_app.ai_scheduler = AIScheduler({"Batch": TierPolicy(max_concurrent=0, max_queue=0, queue_timeout=1.0)})
+        try:
+            response = self.client.post("/api/analyze_batch", json={"positions": [{"id": "a", "board": board}]})
+        finally:
+            gomoku_web_app.ai_scheduler = saved
+        result = json.loads(response.text)
+        self.assertEqual(result["id"], "a")
+        self.assertIn("overloaded", result["error"])
+
+    def test_bulk_moves(self):
+        self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Easy", "game_id": "bulk-a"})
+        self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Medium", "game_id": "bulk-b"})
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "bulk-c"})
+        response = self.client.post("/api/make_moves", json={"moves": [
+            {"row": 7, "col": 7, "game_id": "bulk-a"},
+            {"row": 7, "col": 7, "game_id": "bulk-b"},
+            {"row": 0, "col": 0, "game_id": "bulk-a"},
+            {"row": 7, "col": 7, "game_id": "bulk-c"},
+            {"row": 7, "col": 7, "game_id": "bulk-c"}, # Occupied: rejected like on /api/make_move
+            {"row": 0, "col": 0, "game_id": "bulk-c"},
+            {"row": 7, "col": 7, "game_id": "bulk-missing"},
+        ]})
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        results = {result["index"]: result for result in map(json.loads, response.text.splitlines())}
+        self.assertEqual(set(results), set(range(7)))
+        self.assertEqual([results[i]["status"] for i in range(7)], [200, 200, 200, 200, 200, 424, 404])
+        self.assertFalse(results[4]["moveSuccess"])
+        self.assertEqual(results[5]["gameId"], "bulk-c")
+
+        # Each game's moves were played in order, its AI replying to each
+        board = self.client.get("/api/game_state", params={"game_id": "bulk-a"}).json()["board"]
+        self.assertEqual((board[7][7], board[0][0]), ('X', 'X'))
+        self.assertEqual(sum(row.count('O') for row in board), 2)
+        self.assertEqual(results[2]["board"], board)
+        board = self.client.get("/api/game_state", params={"game_id": "bulk-b"}).json()["board"]
+        self.assertEqual(sum(row.count('O') for row in board), 1)
+        board = self.client.get("/api/game_state", params={"game_id": "bulk-c"}).json()["board"]
+        self.assertEqual(sum(row.count('X') + row.count('O') for row in board), 1)
+        self.assertEqual(self.client.post("/api/make_moves", json={"moves": []}).status_code, 422)
+
+        with mock.patch.object(gomoku_web_app, "load_game", side_effect=RuntimeError("boom")), \
+             self.assertLogs("gomoku_web_app", "ERROR") as logs:
+            response = self.client.post("/api/make_moves", json={"moves": [{"row": 1, "col": 1, "game_id": "bulk-a"}]})
+        self.assertEqual(json.loads(response.text)["status"], 500)
+        self.assertIn("RuntimeError: boom", logs.output[0], "Logged with its traceback")
+
+    def test_profiling(self):
+        self.assertEqual(self.client.get("/admin/profiles").status_code, 404, "Disabled without a token")
+        saved = gomoku_web_app.PROFILE_TOKEN
+        gomoku_web_app.PROFILE_TOKEN = "secret"
+        try:
+            self.assertEqual(self.client.get("/admin/profiles", headers={"X-Profile-Token": "wrong"}).status_code, 403)
+            self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Medium", "game_id": "prof"})
+            with mock.patch.object(gomoku_web_app, "move_cache", None): # The move has to be searched
+                response = self.client.post("/api/make_move", json={"row": 7, "col": 7, "game_id": "prof"},
+                                            headers={"X-Profile-Token": "secret"})
+            profile_id = response.headers["x-profile-id"]
+            listing = self.client.get("/admin/profiles", headers={"X-Profile-Token": "secret"}).json()
+            self.assertEqual(str(listing["profiles"][0]["profileId"]), profile_id)
+            text = self.client.get(f"/admin/profiles/{profile_id}", headers={"X-Profile-Token": "secret"}).text
+            self.assertIn("_make_ai_move_normal", text, "The AI's worker thread is profiled too")
+            download = self.client.get(f"/admin/profiles/{profile_id}", params={"format": "pstats"},
+                                       headers={"X-Profile-Token": "secret"})
+            self.assertEqual(download.headers["content-type"], "application/octet-stream")
+            self.assertNotIn("x-profile-id", self.client.get("/api/game_state").headers)
+        finally:
+            gomoku_web_app.PROFILE_TOKEN = saved
+
+    def test_metrics_endpoint(self):
+        self.client.post("/api/new_game", json={"game_mode": "1P", "ai_difficulty": "Medium", "game_id": "metered"})
+        self.client.post("/api/make_move", json={"row": 7, "col": 7, "game_id": "metered"})
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        text = response.text
+        self.assertIn('gomoku_http_request_duration_seconds_count{method="POST",route="/api/make_move",status="200"}', text)
+        self.assertIn('gomoku_ai_think_seconds_count{difficulty="Medium"}', text)
+        self.assertIn('gomoku_ai_nodes_searched_total{difficulty="Medium"}', text)
+        self.assertIn('gomoku_ai_queue_depth{difficulty="Hard"} 0', text)
+        self.assertIn('gomoku_ai_nodes_per_second_count{difficulty="Medium"}', text)
+        self.assertIn("gomoku_active_games", text)
+        self.assertIn("gomoku_stored_games", text)
+
+    def test_active_games_and_failed_requests(self):
+        self.client.post("/api/new_game", json={"game_mode": "2P", "game_id": "active"})
+        self.assertIn("active", gomoku_web_app.active_games)
+        for col in range(5): # X wins along row 0
+            self.client.post("/api/make_move", json={"row": 0, "col": col, "game_id": "active"})
+            self.client.post("/api/make_move", json={"row": 1, "col": col, "game_id": "active"})
+        self.assertNotIn("active", gomoku_web_app.active_games, "Finished games are not active")
+        gomoku_web_app.active_games["stale"] = 0.0
+        gomoku_web_app.active_games.move_to_end("stale", last=False) # Least recent first, as a real one would be
+        gomoku_web_app.count_active_games()
+        self.assertNotIn("stale", gomoku_web_app.active_games)
+
+        client = TestClient(gomoku_web_app.app, raise_server_exceptions=False)
+        with mock.patch.object(gomoku_web_app, "load_game", side_effect=RuntimeError("boom")):
+            self.assertEqual(client.get("/api/game_state").status_code, 500)
+        text = self.client.get("/metrics").text
+        self.assertIn('gomoku_http_request_duration_seconds_count{method="GET",route="/api/game_state",status="500"}', text)
+
+
+if __name__ == '__main__':
+    unittest.main()